@@ -8,7 +8,6 @@ sys.path.insert(0, str(parent_path))
 
 
 from app.services.auth_manager import AuthManager
-from app.data.users import User
 
 st.set_page_config(
     page_title="Login / Register",
@@ -24,9 +23,14 @@ if "role" not in st.session_state:
 
 st.title("🔐 Welcome")
 
+# The signed session token is the source of truth; logged_in / username /
+# role are kept in step for the rest of the app
+session = AuthManager.current_session(st.session_state.get("session_token"))
+st.session_state.logged_in = session is not None
+
 # If already logged in, go straight to dashboard (optional)
-if st.session_state.logged_in:
-    st.success(f"Logged in as **{st.session_state.username}**.")
+if session:
+    st.success(f"Logged in as **{session.username}**.")
     page_choice = st.selectbox(
         "Select Dashboard",
         [
@@ -44,7 +48,11 @@ if st.session_state.logged_in:
         elif page_choice == "IT Operations Dashboard":
             st.switch_page("pages/IT_Operations.py")
 
-
+    if st.button("Log out"):
+        AuthManager.logout(st.session_state.session_token)
+        st.session_state.session_token = None
+        st.session_state.logged_in = False
+        st.rerun()
 
     st.stop()  
 
@@ -61,13 +69,14 @@ with tab_login:
             st.error("Please enter both username and password.")
         else:
             
-            success, message = AuthManager.login_user(login_username, login_password)
+            success, message, token = AuthManager.login(login_username, login_password)
             if success:
-                # Fetch user data to get roles and other info
-                user = User.get_user_by_username(login_username)
+                # The session carries username and role; no second user lookup
+                session = AuthManager.current_session(token)
+                st.session_state.session_token = token
                 st.session_state.logged_in = True
-                st.session_state.username = user[1]  # username column
-                st.session_state.role = user[3]      # role column
+                st.session_state.username = session.username
+                st.session_state.role = session.role
                 st.rerun()
             else:
                 # Either username not found or wrong password
@@ -95,9 +104,9 @@ with tab_register:
                 if not ok:
                     st.error(msg)
                 else:
-                    existing = User.get_user_by_username(new_username)
-                    if existing: #not none
-                        st.error("Username already exists. Choose another username.")
+                    # register_user checks the username is free
+                    success, msg = AuthManager.register_user(new_username, new_password,new_role)
+                    if success:
+                        st.success("Account created! You can now log in.")
                     else:
-                        success, msg = AuthManager.register_user(new_username, new_password,new_role)
-                        st.success("Account created! You can now log in.")
\ No newline at end of file
+                        st.error(msg)
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""Persistent cache of AI analyses, addressed by content.
+
+An analysis is stored under the SHA-256 of everything that shapes the
+answer: the fields sent to the model, the prompt template and the model
+name, plus the subject it describes ('incident:42') (content_key).
+Looking at an unchanged incident again finds the stored answer; editing
+the incident, the prompt or the model gives a new key, so a stale
+analysis is never served.
+
+The subject is part of the key so that every entry belongs to exactly one
+record: two incidents with the same text get an analysis each instead of
+sharing one. That costs a request for the duplicate, but dropping the
+analyses of one record by hand (invalidate_analyses), or by deleting the
+incident through a trigger, can never take away an entry another record
+still uses. Entries older than
+AI_CACHE_TTL_DAYS are not served, and beyond AI_CACHE_MAX_ENTRIES the
+least recently used ones are evicted.
+
+Evict by hand or clear everything:
+    python -m app.data.ai_cache [--clear]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "5000"))
+AI_CACHE_TTL_DAYS = float(os.environ.get("AI_CACHE_TTL_DAYS", "30"))
+
+AI_CACHE_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS ai_analyses (
+        cache_key TEXT PRIMARY KEY,
+        subject TEXT NOT NULL,
+        model TEXT NOT NULL,
+        analysis TEXT NOT NULL,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hits INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_ai_analyses_subject ON ai_analyses (subject)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_analyses_last_used ON ai_analyses (last_used_at)",
+]
+
+AI_CACHE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS cyber_incidents_ai_analyses_ad AFTER DELETE ON cyber_incidents
+    BEGIN DELETE FROM ai_analyses WHERE subject = 'incident:' || OLD.id; END
+    """,
+]
+
+
+class CachedAnalysis:
+    """A stored analysis."""
+    def __init__(self, cache_key, subject, model, analysis, prompt_tokens, completion_tokens,
+                 created_at, last_used_at, hits):
+        self.cache_key = cache_key
+        self.subject = subject
+        self.model = model
+        self.analysis = analysis
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.created_at = created_at
+        self.last_used_at = last_used_at
+        self.hits = hits
+
+    def __str__(self):
+        return f"CachedAnalysis({self.subject}, model={self.model}, hits={self.hits}, key={self.cache_key[:12]})"
+
+
+def content_key(fields, template, model, subject=None):
+    """Cache key for an analysis of `fields` with a prompt template and model,
+    for one subject ('incident:42') when given."""
+    content = {"fields": fields, "template": template, "model": model}
+    if subject is not None:
+        content["subject"] = subject
+    payload = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_analysis(conn, cache_key, ttl_days=AI_CACHE_TTL_DAYS, count_hit=False):
+    """Return the CachedAnalysis stored under cache_key, or None.
+    With count_hit=True a hit is counted and refreshes the entry's place in
+    the LRU order. That is a write, so display-only lookups leave it off."""
+    row = conn.execute(
+        """
+        SELECT cache_key, subject, model, analysis, prompt_tokens, completion_tokens,
+               created_at, last_used_at, hits
+        FROM ai_analyses
+        WHERE cache_key = ? AND created_at >= ?
+        """,
+        (cache_key, time.time() - ttl_days * 86400)
+    ).fetchone()
+    if row is None:
+        return None
+    if count_hit:
+        conn.execute(
+            "UPDATE ai_analyses SET hits = hits + 1, last_used_at = ? WHERE cache_key = ?",
+            (time.time(), cache_key)
+        )
+        conn.commit()
+    return CachedAnalysis(*row)
+
+
+def put_analysis(conn, cache_key, subject, model, analysis, prompt_tokens=None, completion_tokens=None,
+                 max_entries=AI_CACHE_MAX_ENTRIES):
+    """Store an analysis (replacing any entry with the same key), then
+    evict the least recently used entries beyond max_entries."""
+    now = time.time()
+    conn.execute(
+        """
+        INSERT INTO ai_analyses (cache_key, subject, model, analysis, prompt_tokens,
+                                 completion_tokens, created_at, last_used_at, hits)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+        ON CONFLICT(cache_key) DO UPDATE SET
+            analysis = excluded.analysis,
+            prompt_tokens = excluded.prompt_tokens,
+            completion_tokens = excluded.completion_tokens,
+            created_at = excluded.created_at,
+            last_used_at = excluded.last_used_at,
+            hits = 0
+        """,
+        (cache_key, subject, model, analysis, prompt_tokens, completion_tokens, now, now)
+    )
+    _evict_lru(conn, max_entries)
+    conn.commit()
+
+
+def _evict_lru(conn, max_entries):
+    return conn.execute(
+        """
+        DELETE FROM ai_analyses WHERE cache_key IN (
+            SELECT cache_key FROM ai_analyses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        (max_entries,)
+    ).rowcount
+
+
+def evict_analyses(conn, max_entries=AI_CACHE_MAX_ENTRIES, ttl_days=AI_CACHE_TTL_DAYS):
+    """Delete expired entries and the least recently used ones beyond max_entries.
+    Returns:
+        Number of entries deleted"""
+    deleted = conn.execute(
+        "DELETE FROM ai_analyses WHERE created_at < ?", (time.time() - ttl_days * 86400,)
+    ).rowcount
+    deleted += _evict_lru(conn, max_entries)
+    conn.commit()
+    return deleted
+
+
+def invalidate_analyses(conn, subject=None):
+    """Delete the stored analyses of one subject ('incident:42'), or all of them.
+    Returns:
+        Number of entries deleted"""
+    if subject is None:
+        deleted = conn.execute("DELETE FROM ai_analyses").rowcount
+    else:
+        deleted = conn.execute("DELETE FROM ai_analyses WHERE subject = ?", (subject,)).rowcount
+    conn.commit()
+    return deleted
+
+
+def cache_stats(conn):
+    """Entries, hits and the tokens the hits did not have to spend."""
+    entries, hits, tokens_saved = conn.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(hits), 0),
+               COALESCE(SUM(hits * (COALESCE(prompt_tokens, 0) + COALESCE(completion_tokens, 0))), 0)
+        FROM ai_analyses
+        """
+    ).fetchone()
+    return {"entries": entries, "hits": hits, "tokens_saved": tokens_saved}
+
+
+def main():
+    # imported here because app.data.db applies migrations, which import this module
+    from app.data.db import borrow_connection
+
+    parser = argparse.ArgumentParser(description="Evict or clear the AI analysis cache.")
+    parser.add_argument("--clear", action="store_true", help="delete every stored analysis")
+    args = parser.parse_args()
+    with borrow_connection() as conn:
+        if args.clear:
+            print(f"🗑️ Deleted {invalidate_analyses(conn)} stored analyses")
+        else:
+            print(f"🧹 Evicted {evict_analyses(conn)} stored analyses")
+        print(f"📊 {cache_stats(conn)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Bulk updates and deletes, one transaction per call.
+
+Changing rows one id at a time costs one statement, one commit and one
+page rerun per row. These helpers change a whole selection at once:
+
+- by id list: one executemany of `... WHERE key = ?` over the ids
+- by filter: one set-based `UPDATE/DELETE ... WHERE <filters>`, built from
+  the same filters as the listing views (pagination.filter_conditions)
+
+Ids and filters can be combined (only the listed ids that match the
+filters change). Everything is committed once, or rolled back if anything
+fails. The summary, rollup, search and version triggers fire inside that
+transaction. The query cache for the table is invalidated once.
+
+Updates skip rows that already hold the new values, so the count returned
+is the number of rows that actually changed."""
+from app.data.cache import invalidate
+from app.data.pagination import filter_conditions
+
+
+def _selection(ids, key, equals, date_column, start_date, end_date):
+    where, params = filter_conditions(equals, date_column, start_date, end_date)
+    if ids is None and not where:
+        raise ValueError("A bulk change needs a list of ids or at least one filter.")
+    if ids is not None:
+        ids = list(dict.fromkeys(ids))  # drop duplicates, keep order
+    return ids, where, params
+
+
+def _execute(conn, table, statement, ids, before, after):
+    """Run statement once (filters) or once per id, in one transaction.
+    Runs inside the caller's transaction when there is one."""
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        if ids is None:
+            affected = conn.execute(statement, [*before, *after]).rowcount
+        else:
+            affected = conn.executemany(statement, ([*before, row_id, *after] for row_id in ids)).rowcount
+        if own_transaction:
+            conn.commit()
+    except BaseException:
+        if own_transaction:
+            conn.rollback()
+        raise
+    invalidate(table)
+    return affected
+
+
+def bulk_update(conn, table, values, ids=None, key="id", equals=None, date_column=None,
+                start_date=None, end_date=None):
+    """Set columns on many rows at once.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        table: table name
+        values: dict of column -> new value
+        ids: key values of the rows to change, or None to use the filters only
+        key: column the ids refer to
+        equals, date_column, start_date, end_date: filters, as in keyset_page
+    Returns:
+        Number of rows changed"""
+    ids, where, params = _selection(ids, key, equals, date_column, start_date, end_date)
+    if ids == [] or not values:
+        return 0
+    columns = list(values)
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    # leave rows that already hold the new values alone
+    changed = "(" + " OR ".join(f"{column} IS NOT ?" for column in columns) + ")"
+    conditions = ([f"{key} = ?"] if ids is not None else []) + where + [changed]
+    statement = f"UPDATE {table} SET {assignments} WHERE " + " AND ".join(conditions)
+    new_values = [values[column] for column in columns]
+    return _execute(conn, table, statement, ids, new_values, params + new_values)
+
+
+def bulk_delete(conn, table, ids=None, key="id", equals=None, date_column=None,
+                start_date=None, end_date=None):
+    """Delete many rows at once.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        table: table name
+        ids: key values of the rows to delete, or None to use the filters only
+        key: column the ids refer to
+        equals, date_column, start_date, end_date: filters, as in keyset_page
+    Returns:
+        Number of rows deleted"""
+    ids, where, params = _selection(ids, key, equals, date_column, start_date, end_date)
+    if ids == []:
+        return 0
+    conditions = ([f"{key} = ?"] if ids is not None else []) + where
+    statement = f"DELETE FROM {table} WHERE " + " AND ".join(conditions)
+    return _execute(conn, table, statement, ids, [], params)
+
+
+def count_matching(conn, table, equals=None, date_column=None, start_date=None, end_date=None):
+    """Number of rows the filters select (to confirm a bulk change before running it)."""
+    where, params = filter_conditions(equals, date_column, start_date, end_date)
+    query = f"SELECT COUNT(*) FROM {table}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    return conn.execute(query, params).fetchone()[0]
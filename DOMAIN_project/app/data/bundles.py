@@ -0,0 +1,152 @@
+"""Dashboard bundles: every query a page needs, run together.
+
+load_bundle() borrows one pooled connection, opens one read transaction and
+runs each query in it. Under WAL a read transaction sees one snapshot of
+the database, so the numbers on a page agree with each other even while
+another session is writing. The results are cached as a unit and expire
+when any table they read is written through the models.
+
+Each load is timed per query and in total. timing_report() summarises the
+loads per bundle."""
+import threading
+import time
+import pandas as pd
+from app.data.db import DB_PATH, borrow_connection
+from app.data.cache import query_cache, bypass_cache
+
+
+class Bundle:
+    """Results of one bundle load.
+    Values are available by name (bundle["metrics"] or bundle.metrics).
+    timings maps query name -> seconds; seconds is the whole load,
+    including the cache lookup. from_cache is True when nothing was queried."""
+    def __init__(self, name, values, timings, seconds, from_cache=False):
+        self.name = name
+        self.values = values
+        self.timings = timings
+        self.seconds = seconds
+        self.from_cache = from_cache
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __getattr__(self, key):
+        try:
+            return self.__dict__["values"][key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def timing_frame(self):
+        """Per-query timings in milliseconds, slowest first."""
+        frame = pd.DataFrame(
+            [(query, seconds * 1000) for query, seconds in self.timings.items()],
+            columns=["query", "ms"],
+        )
+        return frame.sort_values("ms", ascending=False, ignore_index=True)
+
+    def __str__(self):
+        source = "cache" if self.from_cache else "database"
+        return f"Bundle({self.name}, queries={len(self.values)}, {self.seconds * 1000:.1f} ms from {source})"
+
+
+class _Cached:
+    """What the query cache holds for a bundle (sized by its DataFrames)."""
+    def __init__(self, values, timings):
+        self.values = values
+        self.timings = timings
+
+    def memory_usage(self, deep=True):
+        return pd.Series([
+            int(v.memory_usage(deep=deep).sum()) if isinstance(v, pd.DataFrame) else 64
+            for v in self.values.values()
+        ], dtype="int64")
+
+
+def _run(queries, db_path):
+    values = {}
+    timings = {}
+    # every read, including cached methods called by the queries, must see
+    # the bundle's snapshot
+    with borrow_connection(db_path) as conn, bypass_cache():
+        # DEFERRED: the snapshot is taken at the first read and held until rollback
+        conn.execute("BEGIN")
+        try:
+            for name, query in queries.items():
+                started = time.perf_counter()
+                values[name] = query(conn)
+                timings[name] = time.perf_counter() - started
+        finally:
+            conn.rollback()
+    return values, timings
+
+
+def load_bundle(name, queries, tables, db_path=DB_PATH, use_cache=True):
+    """Run every query of a dashboard in one read transaction.
+    Args:
+        name (str): Bundle name, used for caching and the timing report.
+        queries (dict): result name -> callable taking a connection
+            (e.g. Incident.get_incidents_by_type_count).
+        tables: tables the queries read; a write to any of them makes the
+            cached bundle stale.
+        db_path: database to read.
+        use_cache (bool): set to False to always query.
+    Returns:
+        Bundle"""
+    started = time.perf_counter()
+    key = ("bundle", name, str(db_path), tuple(queries))
+    if use_cache:
+        found, cached = query_cache.get(key, tables)
+        if found:
+            bundle = Bundle(name, cached.values, cached.timings, time.perf_counter() - started, True)
+            record_bundle(bundle)
+            return bundle
+        generations = query_cache.generations_for(tables)
+
+    values, timings = _run(queries, db_path)
+    if use_cache:
+        query_cache.put(key, _Cached(values, timings), generations)
+    bundle = Bundle(name, values, timings, time.perf_counter() - started)
+    record_bundle(bundle)
+    return bundle
+
+
+class _TimingStats:
+    def __init__(self):
+        self.loads = 0
+        self.cache_hits = 0
+        self.total_seconds = 0.0
+        self.last_seconds = 0.0
+        self.slowest_seconds = 0.0
+
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def record_bundle(bundle):
+    """Add one load to the timing statistics of its bundle."""
+    with _timings_lock:
+        stats = _timings.setdefault(bundle.name, _TimingStats())
+        stats.loads += 1
+        stats.cache_hits += bundle.from_cache
+        stats.total_seconds += bundle.seconds
+        stats.last_seconds = bundle.seconds
+        stats.slowest_seconds = max(stats.slowest_seconds, bundle.seconds)
+
+
+def timing_report():
+    """Time spent loading each page's bundle.
+    Returns:
+        DataFrame with bundle, loads, cache_hits, last_ms, mean_ms and slowest_ms"""
+    with _timings_lock:
+        rows = [
+            (name, s.loads, s.cache_hits, s.last_seconds * 1000,
+             s.total_seconds * 1000 / s.loads, s.slowest_seconds * 1000)
+            for name, s in _timings.items()
+        ]
+    return pd.DataFrame(rows, columns=["bundle", "loads", "cache_hits", "last_ms", "mean_ms", "slowest_ms"])
+
+
+def reset_timing_report():
+    with _timings_lock:
+        _timings.clear()
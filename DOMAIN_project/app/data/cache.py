@@ -0,0 +1,209 @@
+"""Write-aware result cache for data-layer reads.
+
+Read methods decorated with @cached_query("table", ...) keep their result
+keyed by method, database file and arguments. Every write through the model
+classes calls invalidate(table), which bumps that table's generation
+counter. A cached entry is only served while the generations it was
+computed under are unchanged, so a form submit makes exactly the
+dependent entries stale. Entries are also bounded by count, total size
+(LRU eviction) and age (TTL), which covers writes made by other processes.
+
+Cached objects are shared between callers, so treat returned DataFrames
+as read-only."""
+import functools
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 300
+
+
+def estimate_size(value):
+    """Approximate memory held by a cached value, in bytes."""
+    rows = getattr(value, "rows", None)  # pagination.Page
+    if rows is not None:
+        value = rows
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            return int(memory_usage(deep=True).sum())
+        except TypeError:
+            pass
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class _Entry:
+    __slots__ = ("value", "generations", "expires_at", "size")
+
+    def __init__(self, value, generations, expires_at, size):
+        self.value = value
+        self.generations = generations
+        self.expires_at = expires_at
+        self.size = size
+
+
+class QueryCache:
+    """Thread-safe LRU + TTL cache with per-table generation counters."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._listeners = []
+
+    def subscribe(self, callback):
+        """Call callback(tables) after every bump, e.g. to refresh
+        precomputed results that read those tables."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def generation(self, table):
+        with self._lock:
+            return self._generations.get(table, 0)
+
+    def _snapshot(self, tables):
+        return tuple(self._generations.get(t, 0) for t in tables)
+
+    def get(self, key, tables):
+        """Return (True, value) for a fresh entry, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.generations == self._snapshot(tables) and entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry.value
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def generations_for(self, tables):
+        """Generation snapshot to pass to put(); take it before running the query."""
+        with self._lock:
+            return self._snapshot(tables)
+
+    def put(self, key, value, generations):
+        """Store value computed under `generations` (from generations_for)."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, generations, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def bump(self, *tables):
+        """Mark tables as written; entries that read them become stale."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self.invalidations += 1
+            listeners = list(self._listeners)
+        for callback in listeners:
+            callback(tables)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+# Shared cache used by the model classes
+query_cache = QueryCache()
+
+
+def invalidate(*tables):
+    """Call after writing to tables so dependent cached reads are recomputed."""
+    query_cache.bump(*tables)
+
+
+_bypass = threading.local()
+
+
+@contextmanager
+def bypass_cache():
+    """Within this block (on this thread) cached reads always query the
+    database and leave the cache untouched. Used when several reads must
+    come from the same transaction."""
+    outer = getattr(_bypass, "active", False)
+    _bypass.active = True
+    try:
+        yield
+    finally:
+        _bypass.active = outer
+
+
+def _database_key(args):
+    """Identify the database a read goes to (the file behind a connection
+    argument, or the default database for methods that borrow their own)."""
+    if args and isinstance(args[0], sqlite3.Connection):
+        return args[0].execute("PRAGMA database_list").fetchone()[2]
+    return None
+
+
+def cached_query(*tables, cache=None):
+    """Decorator for read methods whose result depends only on their
+    arguments and the contents of `tables`. A sqlite3.Connection first
+    argument is replaced by its database file in the cache key."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_bypass, "active", False):
+                return func(*args, **kwargs)
+            target = cache or query_cache
+            key_args = args[1:] if args and isinstance(args[0], sqlite3.Connection) else args
+            key = (func.__qualname__, _database_key(args), key_args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)  # unhashable arguments: don't cache
+
+            found, value = target.get(key, tables)
+            if found:
+                return value
+            generations = target.generations_for(tables)
+            value = func(*args, **kwargs)
+            target.put(key, value, generations)
+            return value
+        wrapper.cache_tables = tables
+        return wrapper
+    return decorator
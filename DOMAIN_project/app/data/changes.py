@@ -0,0 +1,36 @@
+"""Change counters for tables that are exported elsewhere.
+
+table_versions holds one counter per table. Triggers bump it whenever a
+row of that table is updated or deleted. A consumer that has copied the
+table notes the counter; if it is unchanged later, the rows copied so far
+are still exactly what the table holds, and only rows inserted since
+then need copying. New rows are found by id and need no counter."""
+
+TRACKED_TABLES = ("cyber_incidents", "it_tickets", "datasets_metadata")
+
+TABLE_VERSIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+
+def _triggers(table):
+    bump = (
+        f"INSERT INTO table_versions (table_name, version) VALUES ('{table}', 1) "
+        f"ON CONFLICT(table_name) DO UPDATE SET version = version + 1;"
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_au AFTER UPDATE ON {table} BEGIN {bump} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_ad AFTER DELETE ON {table} BEGIN {bump} END",
+    ]
+
+
+CHANGE_TRIGGERS_SQL = [sql for table in TRACKED_TABLES for sql in _triggers(table)]
+
+
+def table_version(conn, table):
+    """Number of updates and deletes seen on table so far."""
+    row = conn.execute("SELECT version FROM table_versions WHERE table_name = ?", (table,)).fetchone()
+    return row[0] if row else 0
@@ -0,0 +1,162 @@
+"""Stored chat conversations for the AI assistants.
+
+One conversation per user and assistant. Messages are kept with their
+token count, counted once when they are added. An assistant message also
+records how many tokens were sent to produce it. The rolling summary of
+older turns is stored on the conversation, with the id of the last
+message it covers. Messages up to that id are only sent to the model
+through the summary.
+"""
+import time
+
+CONVERSATION_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        owner TEXT NOT NULL,
+        assistant TEXT NOT NULL,
+        summary TEXT NOT NULL DEFAULT '',
+        summary_tokens INTEGER NOT NULL DEFAULT 0,
+        summarized_through INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (owner, assistant)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id INTEGER NOT NULL REFERENCES conversations (id),
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        tokens INTEGER NOT NULL,
+        sent_tokens INTEGER,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation ON conversation_messages (conversation_id, id)",
+]
+
+
+class Conversation:
+    """A conversation and its rolling summary."""
+    def __init__(self, id, owner, assistant, summary, summary_tokens, summarized_through):
+        self.id = id
+        self.owner = owner
+        self.assistant = assistant
+        self.summary = summary
+        self.summary_tokens = summary_tokens
+        self.summarized_through = summarized_through
+
+    def __str__(self):
+        return f"Conversation(id={self.id}, owner={self.owner}, assistant={self.assistant}, summarized_through={self.summarized_through})"
+
+
+class Message:
+    """One stored message."""
+    def __init__(self, id, role, content, tokens, sent_tokens=None):
+        self.id = id
+        self.role = role
+        self.content = content
+        self.tokens = tokens
+        self.sent_tokens = sent_tokens
+
+    def as_chat(self):
+        """The message as the chat API expects it."""
+        return {"role": self.role, "content": self.content}
+
+    def __str__(self):
+        return f"Message(id={self.id}, role={self.role}, tokens={self.tokens})"
+
+
+def get_conversation(conn, owner, assistant):
+    """Return the user's conversation with an assistant, creating it if needed."""
+    now = time.time()
+    conn.execute(
+        "INSERT OR IGNORE INTO conversations (owner, assistant, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        (owner, assistant, now, now)
+    )
+    conn.commit()
+    row = conn.execute(
+        """
+        SELECT id, owner, assistant, summary, summary_tokens, summarized_through
+        FROM conversations WHERE owner = ? AND assistant = ?
+        """,
+        (owner, assistant)
+    ).fetchone()
+    return Conversation(*row)
+
+
+def add_message(conn, conversation_id, role, content, tokens, sent_tokens=None):
+    """Append a message.
+    Returns:
+        The new message id"""
+    now = time.time()
+    cursor = conn.execute(
+        """
+        INSERT INTO conversation_messages (conversation_id, role, content, tokens, sent_tokens, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (conversation_id, role, content, tokens, sent_tokens, now)
+    )
+    conn.execute("UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def get_messages(conn, conversation_id, after_id=0, limit=None):
+    """Messages with an id above after_id, oldest first; with limit, only
+    the newest `limit` of them."""
+    query = """
+        SELECT id, role, content, tokens, sent_tokens FROM conversation_messages
+        WHERE conversation_id = ? AND id > ?
+        ORDER BY id DESC
+    """
+    params = [conversation_id, after_id]
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return [Message(*row) for row in reversed(conn.execute(query, params).fetchall())]
+
+
+def save_summary(conn, conversation_id, summary, summary_tokens, summarized_through):
+    """Store the rolling summary covering every message up to summarized_through."""
+    conn.execute(
+        """
+        UPDATE conversations
+        SET summary = ?, summary_tokens = ?, summarized_through = ?, updated_at = ?
+        WHERE id = ?
+        """,
+        (summary, summary_tokens, summarized_through, time.time(), conversation_id)
+    )
+    conn.commit()
+
+
+def clear_conversation(conn, conversation_id):
+    """Delete every message and the summary of a conversation.
+    Returns:
+        Number of messages deleted"""
+    deleted = conn.execute(
+        "DELETE FROM conversation_messages WHERE conversation_id = ?", (conversation_id,)
+    ).rowcount
+    conn.execute(
+        "UPDATE conversations SET summary = '', summary_tokens = 0, summarized_through = 0, updated_at = ? WHERE id = ?",
+        (time.time(), conversation_id)
+    )
+    conn.commit()
+    return deleted
+
+
+def turn_tokens(conn, conversation_id, limit=50):
+    """Tokens sent to the model for each of the last `limit` answers, oldest first.
+    Returns:
+        List of (message id, sent_tokens)"""
+    rows = conn.execute(
+        """
+        SELECT id, sent_tokens FROM conversation_messages
+        WHERE conversation_id = ? AND role = 'assistant' AND sent_tokens IS NOT NULL
+        ORDER BY id DESC LIMIT ?
+        """,
+        (conversation_id, limit)
+    ).fetchall()
+    return rows[::-1]
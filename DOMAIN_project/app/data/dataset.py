@@ -1,5 +1,13 @@
-import pandas as pd
-from app.data.db import connect_database
+from app.data.db import borrow_connection
+from app.data.dates import to_iso_date
+from app.data.cache import cached_query, invalidate
+from app.data.frames import read_frame, memory_tracked, DATASET_COLUMNS
+from app.data.pagination import keyset_page
+from app.data.bundles import load_bundle
+from app.data.bulk import bulk_update, bulk_delete, count_matching
+
+# Columns list_datasets can sort by
+DATASET_SORT_COLUMNS = ("id", "last_updated", "category", "source", "record_count", "file_size_mb")
 
 class Dataset:
     """ Contains all dataset-related data.
@@ -21,31 +29,55 @@ class Dataset:
     # CRUD Methods
 
     @staticmethod
+    @cached_query("datasets_metadata")
+    @memory_tracked
     def get_all_datasets(conn):
         """Get all datasets as DataFrame.
         """
-        df = pd.read_sql_query(
-            "SELECT * FROM datasets_metadata ORDER BY id DESC",
+        df = read_frame(
+            f"SELECT {DATASET_COLUMNS} FROM datasets_metadata ORDER BY id DESC",
             conn
         )
-        #conn.close()
         return df
 
 
+    @staticmethod
+    @cached_query("datasets_metadata")
+    @memory_tracked
+    def list_datasets(conn, page_size=50, cursor=None, sort_by="id", descending=True,
+                      category=None, source=None, start_date=None, end_date=None):
+        """Get one page of datasets, filtered and sorted in SQL.
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            page_size = Rows per page
+            cursor = next_cursor from the previous page, or None for the first page
+            sort_by = One of DATASET_SORT_COLUMNS
+            category / source = Optional equality filters
+            start_date / end_date = Optional inclusive last_updated range
+        Returns:
+            Page (rows DataFrame plus next_cursor)"""
+        return keyset_page(
+            conn, "datasets_metadata", DATASET_COLUMNS,
+            equals={"category": category, "source": source},
+            date_column="last_updated", start_date=start_date, end_date=end_date,
+            sort_by=sort_by, sortable=DATASET_SORT_COLUMNS, descending=descending,
+            cursor=cursor, page_size=page_size,
+        )
+
     def insert_dataset(self):
-        """Insert new dataset into database.
+        """Insert new dataset into database. last_updated is stored as 'YYYY-MM-DD'.
         Returns:
             ID of the newly inserted dataset"""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO datasets_metadata 
-            (dataset_name, category, source, last_updated, record_count, file_size_mb)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (self.dataset_name, self.category, self.source, self.last_updated, self.record_count, self.file_size_mb))
-        conn.commit()
-        dataset_id = cursor.lastrowid # Get the ID of the newly inserted dataset
-        conn.close()
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO datasets_metadata 
+                (dataset_name, category, source, last_updated, record_count, file_size_mb)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (self.dataset_name, self.category, self.source, to_iso_date(self.last_updated), self.record_count, self.file_size_mb))
+            conn.commit()
+            invalidate("datasets_metadata")
+            dataset_id = cursor.lastrowid # Get the ID of the newly inserted dataset
         return dataset_id
 
     @staticmethod
@@ -54,16 +86,16 @@ class Dataset:
         Args:
             conn (sqlite3.Connection): Open database connection.
             dataset_id = ID of the dataset to be updated
-            new_last_updated = New last updated date in 'YYYY-MM-DD' format
+            new_last_updated = New last updated date (date object, 'YYYY-MM-DD' or 'm/d/Y')
         Returns:
             Number of rows that were updated"""
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE datasets_metadata SET last_updated = ? WHERE id = ?",
-            (new_last_updated, dataset_id)
+            (to_iso_date(new_last_updated), dataset_id)
         )
         conn.commit()
-        conn.close()
+        invalidate("datasets_metadata")
         return cursor.rowcount
 
     @staticmethod
@@ -80,44 +112,114 @@ class Dataset:
             (id,)
         )
         conn.commit()
-        conn.close()
+        invalidate("datasets_metadata")
         return cursor.rowcount
 
+    @staticmethod
+    def bulk_update_last_updated(conn, new_last_updated, dataset_ids=None, category=None,
+                                 source=None, start_date=None, end_date=None):
+        """Set the last_updated date of many datasets in one transaction.
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            new_last_updated = New last updated date (date object, 'YYYY-MM-DD' or 'm/d/Y')
+            dataset_ids = IDs to change, or None to change every dataset the filters match
+            category / source / start_date / end_date = filters, as in list_datasets
+        Returns:
+            Number of datasets that changed"""
+        return bulk_update(
+            conn, "datasets_metadata", {"last_updated": to_iso_date(new_last_updated)}, ids=dataset_ids,
+            equals={"category": category, "source": source},
+            date_column="last_updated", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    def bulk_delete_datasets(conn, dataset_ids=None, category=None, source=None, start_date=None, end_date=None):
+        """Delete many datasets in one transaction (by ID, by filters, or both).
+        Returns:
+            Number of datasets that were deleted"""
+        return bulk_delete(
+            conn, "datasets_metadata", ids=dataset_ids,
+            equals={"category": category, "source": source},
+            date_column="last_updated", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    def count_datasets(conn, category=None, source=None, start_date=None, end_date=None):
+        """Number of datasets the filters match."""
+        return count_matching(
+            conn, "datasets_metadata",
+            equals={"category": category, "source": source},
+            date_column="last_updated", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    @cached_query("datasets_metadata")
+    @memory_tracked
+    def get_datasets_updated_between(conn, start_date, end_date):
+        """Get datasets whose last_updated falls in [start_date, end_date].
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            start_date, end_date: date objects or 'YYYY-MM-DD' / 'm/d/Y' strings
+        Returns:
+            DataFrame ordered by last_updated"""
+        query = f"""
+        SELECT {DATASET_COLUMNS} FROM datasets_metadata
+        WHERE last_updated BETWEEN ? AND ?
+        ORDER BY last_updated ASC, id ASC
+        """
+        return read_frame(query, conn, params=(to_iso_date(start_date), to_iso_date(end_date)))
+
     # Analytics Methods
 
     @staticmethod
+    @cached_query("datasets_metadata")
+    @memory_tracked
     def get_resource_consumption_by_category(conn):
         """
         Analyze total resource consumption (size and record count) by category.
         Identifies which categories consume the most resources.
-        Uses: SELECT, FROM, GROUP BY, SUM, ORDER BY
+        Reads the trigger-maintained dataset_category_summary table (one row per category).
+        Uses: SELECT, FROM, ROUND, ORDER BY
         """
         query = """
         SELECT 
-            category,
-            COUNT(*) as dataset_count,
-            SUM(record_count) as total_records,
-            ROUND(SUM(file_size_mb), 2) as total_size_mb
-        FROM datasets_metadata
-        GROUP BY category
+            NULLIF(category, '') as category,
+            dataset_count,
+            total_records,
+            ROUND(total_size_mb, 2) as total_size_mb
+        FROM dataset_category_summary
         ORDER BY total_size_mb DESC
         """
-        df = pd.read_sql_query(query, conn)
+        df = read_frame(query, conn)
         return df
     
     @staticmethod
+    @cached_query("datasets_metadata")
+    @memory_tracked
     def get_datasets_by_source_count(conn):
         """
         Count datasets by source (internal, external, public, partner).
         Helps understand data source dependency.
-        Uses: SELECT, FROM, GROUP BY, ORDER BY
+        Reads the trigger-maintained dataset_source_summary table (one row per source).
+        Uses: SELECT, FROM, ORDER BY
         """
         query = """
-        SELECT source, COUNT(*) as count
-        FROM datasets_metadata
-        GROUP BY source
+        SELECT NULLIF(source, '') as source, count
+        FROM dataset_source_summary
         ORDER BY count DESC
         """
-        df = pd.read_sql_query(query, conn)
+        df = read_frame(query, conn)
         return df
 
+    @staticmethod
+    def get_analytics_bundle(use_cache=True):
+        """
+        Everything the Data Science analytics tab shows, read in one
+        transaction on one pooled connection.
+        Returns:
+            Bundle with resource_by_category and by_source
+        """
+        return load_bundle("data_science_analytics", {
+            "resource_by_category": Dataset.get_resource_consumption_by_category,
+            "by_source": Dataset.get_datasets_by_source_count,
+        }, tables=("datasets_metadata",), use_cache=use_cache)
@@ -0,0 +1,55 @@
+"""Date handling for the data layer.
+
+Dates are stored as ISO-8601 'YYYY-MM-DD' TEXT. That format sorts
+chronologically as plain text, so ORDER BY and BETWEEN work on an index.
+Older data (the CSV exports and rows written before migration 6) used
+'m/d/Y', which to_iso_date() still accepts."""
+import datetime
+
+# Date columns per table, converted on write and by the data migration
+DATE_COLUMNS = {
+    "cyber_incidents": ["date"],
+    "it_tickets": ["created_date", "resolved_date"],
+    "datasets_metadata": ["last_updated"],
+}
+
+
+def to_iso_date(value):
+    """Convert a date, datetime, 'm/d/Y' or 'YYYY-MM-DD' value to 'YYYY-MM-DD'.
+    Returns None for empty values.
+    Raises:
+        ValueError if the value is not a recognisable date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float) and value != value:  # NaN from pandas
+        return None
+
+    text = str(value).strip()
+    if not text:
+        return None
+    if "/" in text:
+        month, day, year = text.split(" ")[0].split("/")
+        return datetime.date(int(year), int(month), int(day)).isoformat()
+    return datetime.date.fromisoformat(text[:10]).isoformat()
+
+
+def migrate_dates_to_iso(conn):
+    """Rewrite every 'm/d/Y' value in DATE_COLUMNS as 'YYYY-MM-DD'.
+    Values that can't be parsed are left as they are and reported.
+    Used as a migration step, so it runs inside the caller's transaction."""
+    for table, columns in DATE_COLUMNS.items():
+        for column in columns:
+            rows = conn.execute(
+                f"SELECT id, {column} FROM {table} WHERE {column} LIKE '%/%'"
+            ).fetchall()
+            updates = []
+            for row_id, value in rows:
+                try:
+                    updates.append((to_iso_date(value), row_id))
+                except ValueError:
+                    print(f"⚠️ Left unparseable date {value!r} in {table}.{column} (id {row_id})")
+            conn.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
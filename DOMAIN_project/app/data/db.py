@@ -1,5 +1,8 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
+from app.data.migrations import apply_migrations
 
 # BASE_DIR = project root (week 8)
 BASE_DIR = Path(__file__).resolve().parents[2]
@@ -11,9 +14,140 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 # Database path
 DB_PATH = DATA_DIR / "intelligence_platform.db"
 
+# Per-connection tuning applied to every connection we hand out.
+# WAL lets the dashboards read while a form submit is writing.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,  # 256 MB
+    "cache_size": -64 * 1024,         # negative = KiB, so 64 MB
+    "busy_timeout": 5000,             # ms
+}
+
+
+def configure_connection(conn):
+    """Apply the PRAGMAs in PRAGMAS to an open connection."""
+    for pragma, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
 # DATABASE CONNECTION
 def connect_database(db_path=DB_PATH):
-    return sqlite3.connect(str(db_path))
+    """Open a new, tuned connection.
+
+    Prefer borrow_connection() inside the app so connections are reused;
+    this is kept for scripts that manage a connection themselves."""
+    conn = sqlite3.connect(str(db_path), check_same_thread=False)
+    return configure_connection(conn)
+
+
+class ConnectionPool:
+    """Thread-safe pool of tuned SQLite connections for one database file.
+
+    Connections are created lazily up to max_size and handed back to the
+    pool on release instead of being closed."""
+
+    def __init__(self, db_path=DB_PATH, max_size=8, timeout=30.0):
+        self.db_path = Path(db_path).resolve()
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if there is room.
+        Blocks up to self.timeout seconds when every connection is in use."""
+        with self._available:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed.")
+            while not self._idle and self._created >= self.max_size:
+                if not self._available.wait(self.timeout):
+                    raise TimeoutError(
+                        f"No database connection available after {self.timeout}s "
+                        f"(pool size {self.max_size})."
+                    )
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+
+        # Open outside the lock so a slow open doesn't block other borrowers
+        try:
+            return connect_database(self.db_path)
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool. Any open transaction is rolled back."""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._available:
+            if self._closed:
+                conn.close()
+                self._created -= 1
+                return
+            self._idle.append(conn)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block.
+
+        Commits on normal exit and rolls back if the block raises."""
+        conn = self.acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close idle connections and refuse new borrows.
+        Connections still in use are closed when they are released."""
+        with self._available:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+            self._available.notify_all()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH):
+    """Return the shared pool for db_path, creating it on first use.
+    A new pool brings the schema up to date before it is handed out."""
+    key = str(Path(db_path).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(key)
+            with pool.connection() as conn:
+                apply_migrations(conn)
+            _pools[key] = pool
+        return pool
 
 
+@contextmanager
+def borrow_connection(db_path=DB_PATH):
+    """Borrow a pooled connection to db_path.
 
+    Usage:
+        with borrow_connection() as conn:
+            conn.execute(...)
+    """
+    with get_pool(db_path).connection() as conn:
+        yield conn
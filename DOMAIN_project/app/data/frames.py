@@ -0,0 +1,135 @@
+"""Compact, typed DataFrames for the data layer.
+
+pd.read_sql_query hands back object columns for every TEXT column and
+int64 for every INTEGER one. compact_frame() converts
+- low-cardinality text (status, severity, category, ...) to category
+- ISO date columns to datetime64, when every value in them parses (a
+  column holding a value that doesn't stays text, so it isn't hidden as NaT)
+- integers to the smallest integer type that holds them
+Floats are left at float64 so values like file sizes display exactly.
+
+@memory_tracked records how large each data-layer method's frames are;
+memory_report() summarises that per method."""
+import functools
+import threading
+import pandas as pd
+
+CATEGORICAL_COLUMNS = {
+    "status", "severity", "incident_type", "category", "source",
+    "assigned_to", "reported_by", "role",
+}
+DATE_COLUMNS = {"date", "created_date", "resolved_date", "last_updated"}
+
+# Explicit column lists used instead of SELECT *
+INCIDENT_COLUMNS = "id, date, incident_type, severity, status, description, reported_by, created_at"
+TICKET_COLUMNS = ("id, ticket_id, status, category, subject, descripton, created_date, "
+                  "resolved_date, assigned_to, created_at")
+DATASET_COLUMNS = ("id, dataset_name, category, source, last_updated, record_count, "
+                   "file_size_mb, created_at")
+
+# Also measure each frame before compaction (costs a deep memory scan)
+MEASURE_SAVINGS = False
+
+
+def frame_bytes(df):
+    """Deep memory footprint of a DataFrame in bytes."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _is_text(dtype):
+    # object on pandas < 3, the str dtype on pandas >= 3
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+
+def compact_frame(df):
+    """Convert df's columns to compact dtypes in place and return it."""
+    for column in df.columns:
+        series = df[column]
+        if column in CATEGORICAL_COLUMNS and _is_text(series.dtype):
+            df[column] = series.astype("category")
+        elif column in DATE_COLUMNS and _is_text(series.dtype):
+            dates = pd.to_datetime(series, format="%Y-%m-%d", errors="coerce")
+            if dates.isna().sum() == series.isna().sum():
+                df[column] = dates
+        elif pd.api.types.is_integer_dtype(series.dtype):
+            df[column] = pd.to_numeric(series, downcast="integer")
+    return df
+
+
+# Raw (pre-compaction) bytes read by the method currently being tracked
+_current = threading.local()
+
+
+def read_frame(query, conn, params=None):
+    """pd.read_sql_query followed by compact_frame."""
+    df = pd.read_sql_query(query, conn, params=params)
+    if MEASURE_SAVINGS and getattr(_current, "raw_bytes", None) is not None:
+        _current.raw_bytes += frame_bytes(df)
+    return compact_frame(df)
+
+
+class _MemoryStats:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.last_bytes = 0
+        self.peak_bytes = 0
+        self.uncompacted_bytes = None
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record_frame(name, df, uncompacted_bytes=None):
+    """Add one frame to the memory statistics for method `name`."""
+    size = frame_bytes(df)
+    with _stats_lock:
+        stats = _stats.setdefault(name, _MemoryStats())
+        stats.calls += 1
+        stats.rows = len(df)
+        stats.last_bytes = size
+        stats.peak_bytes = max(stats.peak_bytes, size)
+        if uncompacted_bytes is not None:
+            stats.uncompacted_bytes = uncompacted_bytes
+
+
+def memory_tracked(func):
+    """Decorator recording the footprint of the DataFrame (or Page.rows) a
+    method returns. With MEASURE_SAVINGS set, the frames it read through
+    read_frame() are also measured before compaction, for comparison."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_current, "raw_bytes", None)
+        _current.raw_bytes = 0
+        try:
+            result = func(*args, **kwargs)
+            raw_bytes = _current.raw_bytes
+        finally:
+            _current.raw_bytes = outer
+        df = getattr(result, "rows", result)
+        if isinstance(df, pd.DataFrame):
+            record_frame(name, df, raw_bytes if MEASURE_SAVINGS else None)
+        return result
+    return wrapper
+
+
+def memory_report():
+    """Per-method frame sizes, largest first.
+    Returns:
+        DataFrame with method, calls, rows, last_bytes, peak_bytes and
+        uncompacted_bytes (only filled in when MEASURE_SAVINGS is on)"""
+    with _stats_lock:
+        rows = [
+            (name, s.calls, s.rows, s.last_bytes, s.peak_bytes, s.uncompacted_bytes)
+            for name, s in _stats.items()
+        ]
+    report = pd.DataFrame(rows, columns=["method", "calls", "rows", "last_bytes", "peak_bytes", "uncompacted_bytes"])
+    return report.sort_values("peak_bytes", ascending=False, ignore_index=True)
+
+
+def reset_memory_report():
+    with _stats_lock:
+        _stats.clear()
@@ -1,9 +1,41 @@
 import pandas as pd
-from app.data.db import connect_database
+from typing import NamedTuple
+from app.data.db import borrow_connection
+from app.data.dates import to_iso_date
+from app.data.cache import cached_query, invalidate
+from app.data.frames import read_frame, compact_frame, memory_tracked, INCIDENT_COLUMNS
+from app.data.kpis import KpiEngine, KpiDefinition
+from app.data.rollups import incident_series
+from app.data.pagination import keyset_page
+from app.data.search import fts_query, ranked_search_sql
+from app.data.bundles import load_bundle
+from app.data.bulk import bulk_update, bulk_delete, count_matching
+
+
+class IncidentMetrics(NamedTuple):
+    """Headline incident counters (unpacks like the old 4-tuple)."""
+    total: int
+    open_count: int
+    critical: int
+    phishing_total: int
+
+
+# Columns list_incidents can sort by
+INCIDENT_SORT_COLUMNS = ("id", "date", "severity", "status", "incident_type")
+
 
 class Incident:
     """Class representing a cyber incident."""
 
+    # KPIs computed in one pass by compute_kpis(); callers can register more,
+    # e.g. Incident.KPIS.register_counts_by("severity", ["low", "high"])
+    KPIS = KpiEngine("cyber_incidents", [
+        KpiDefinition("total"),
+        KpiDefinition("open_count", "status = ?", ["open"]),
+        KpiDefinition("critical", "severity = ?", ["critical"]),
+        KpiDefinition("phishing_total", "incident_type = ?", ["phishing"]),
+    ])
+
     def __init__(self, id=None, date=None, incident_type=None, severity=None, status=None, description=None, reported_by=None):
         self.id = id
         self.date = date
@@ -19,113 +51,252 @@ class Incident:
 # CRUD Methods
 
     def insert_incident(self):
-        """Insert new incident."""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO cyber_incidents 
-            (date, incident_type, severity, status, description, reported_by)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (self.date, self.incident_type, self.severity, self.status, self.description, self.reported_by))
-        conn.commit()
-        incident_id = cursor.lastrowid # Get the ID of the inserted incident
-        conn.close()
+        """Insert new incident. The date is stored as 'YYYY-MM-DD'."""
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO cyber_incidents 
+                (date, incident_type, severity, status, description, reported_by)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (to_iso_date(self.date), self.incident_type, self.severity, self.status, self.description, self.reported_by))
+            conn.commit()
+            invalidate("cyber_incidents")
+            incident_id = cursor.lastrowid # Get the ID of the inserted incident
         return incident_id
 
     @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
     def get_all_incidents():
         """Get all incidents as DataFrame."""
-        conn = connect_database()
-        df = pd.read_sql_query(
-            "SELECT * FROM cyber_incidents ORDER BY id DESC",
-            conn
-        )
-        conn.close()
+        with borrow_connection() as conn:
+            df = read_frame(
+                f"SELECT {INCIDENT_COLUMNS} FROM cyber_incidents ORDER BY id DESC",
+                conn
+            )
         return df
 
+    @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
+    def list_incidents(conn, page_size=50, cursor=None, sort_by="id", descending=True,
+                       status=None, severity=None, incident_type=None, start_date=None, end_date=None):
+        """Get one page of incidents, filtered and sorted in SQL.
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            page_size (int): Rows per page.
+            cursor: next_cursor from the previous page, or None for the first page.
+            sort_by (str): One of INCIDENT_SORT_COLUMNS.
+            status / severity / incident_type: optional equality filters.
+            start_date / end_date: optional inclusive date range.
+        Returns:
+            Page (rows DataFrame plus next_cursor)"""
+        return keyset_page(
+            conn, "cyber_incidents", INCIDENT_COLUMNS,
+            equals={"status": status, "severity": severity, "incident_type": incident_type},
+            date_column="date", start_date=start_date, end_date=end_date,
+            sort_by=sort_by, sortable=INCIDENT_SORT_COLUMNS, descending=descending,
+            cursor=cursor, page_size=page_size,
+        )
+
     @staticmethod
     def update_incident_status(incident_id, new_status):
         """Update the status of an incident."""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE cyber_incidents
-            SET status = ?
-            WHERE id = ?
-        """, (new_status, incident_id))
-        conn.commit()
-        affected_rows = cursor.rowcount
-        conn.close()
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE cyber_incidents
+                SET status = ?
+                WHERE id = ?
+            """, (new_status, incident_id))
+            conn.commit()
+            invalidate("cyber_incidents")
+            affected_rows = cursor.rowcount
         return affected_rows
 
     @staticmethod
     def delete_incident(incident_id):
         """Delete an incident by ID."""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute("""
-            DELETE FROM cyber_incidents
-            WHERE id = ?
-        """, (incident_id,))
-        conn.commit()
-        affected_rows = cursor.rowcount
-        conn.close()
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM cyber_incidents
+                WHERE id = ?
+            """, (incident_id,))
+            conn.commit()
+            invalidate("cyber_incidents")
+            affected_rows = cursor.rowcount
         return affected_rows
 
+    @staticmethod
+    def bulk_update_status(conn, new_status, incident_ids=None, status=None, severity=None,
+                           incident_type=None, start_date=None, end_date=None):
+        """Set the status of many incidents in one transaction.
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            new_status (str): Status to set.
+            incident_ids: ids to change, or None to change every incident the filters match.
+            status / severity / incident_type / start_date / end_date: filters, as in list_incidents.
+        Returns:
+            Number of incidents whose status changed"""
+        return bulk_update(
+            conn, "cyber_incidents", {"status": new_status}, ids=incident_ids,
+            equals={"status": status, "severity": severity, "incident_type": incident_type},
+            date_column="date", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    def bulk_delete_incidents(conn, incident_ids=None, status=None, severity=None,
+                              incident_type=None, start_date=None, end_date=None):
+        """Delete many incidents in one transaction (by id, by filters, or both).
+        Returns:
+            Number of incidents deleted"""
+        return bulk_delete(
+            conn, "cyber_incidents", ids=incident_ids,
+            equals={"status": status, "severity": severity, "incident_type": incident_type},
+            date_column="date", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    def count_incidents(conn, status=None, severity=None, incident_type=None, start_date=None, end_date=None):
+        """Number of incidents the filters match."""
+        return count_matching(
+            conn, "cyber_incidents",
+            equals={"status": status, "severity": severity, "incident_type": incident_type},
+            date_column="date", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
+    def get_incidents_between(conn, start_date, end_date):
+        """Get incidents whose date falls in [start_date, end_date].
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            start_date, end_date: date objects or 'YYYY-MM-DD' / 'm/d/Y' strings
+        Returns:
+            DataFrame ordered by date (an index range scan on idx_cyber_incidents_date)"""
+        query = f"""
+        SELECT {INCIDENT_COLUMNS} FROM cyber_incidents
+        WHERE date BETWEEN ? AND ?
+        ORDER BY date ASC, id ASC
+        """
+        return read_frame(query, conn, params=(to_iso_date(start_date), to_iso_date(end_date)))
+
+    @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
+    def search_incidents(conn, text, limit=20):
+        """Full-text search over incident descriptions.
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            text (str): Words to look for; the last word may be a prefix.
+            limit (int): Number of hits to return.
+        Returns:
+            DataFrame of the best matches, best first, with a 'relevance' column"""
+        match = fts_query(text)
+        if match is None:
+            return read_frame(f"SELECT {INCIDENT_COLUMNS}, 0.0 AS relevance FROM cyber_incidents LIMIT 0", conn)
+        query = ranked_search_sql("incidents_fts", "cyber_incidents", INCIDENT_COLUMNS)
+        return read_frame(query, conn, params=(match, limit))
+
+    @staticmethod
+    @cached_query("cyber_incidents", "incident_triage")
+    @memory_tracked
+    def get_triage_results(conn, priority=None, limit=500):
+        """Stored AI triage results with their incidents, most urgent first.
+        Args:
+            conn (sqlite3.Connection): Open database connection.
+            priority (str): optional filter, one of triage.PRIORITIES.
+            limit (int): Number of rows to return.
+        Returns:
+            DataFrame with the incident columns plus priority, summary, actions and triaged_at"""
+        query = f"""
+        SELECT {", ".join("i." + c.strip() for c in INCIDENT_COLUMNS.split(","))},
+               t.priority, t.summary, t.actions, datetime(t.triaged_at, 'unixepoch') AS triaged_at
+        FROM incident_triage t
+        JOIN cyber_incidents i ON i.id = t.incident_id
+        {"WHERE t.priority = ?" if priority else ""}
+        ORDER BY CASE t.priority WHEN 'critical' THEN 0 WHEN 'high' THEN 1 WHEN 'medium' THEN 2 ELSE 3 END,
+                 t.triaged_at DESC
+        LIMIT ?
+        """
+        params = (priority, limit) if priority else (limit,)
+        return read_frame(query, conn, params=params)
+
     # Analytics Methods
     @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
     def get_incidents_by_type_count(conn):
         """
         Count incidents by type.
-        Uses: SELECT, FROM, GROUP BY, ORDER BY
+        Reads the trigger-maintained incident_type_summary table (one row per type).
+        Uses: SELECT, FROM, ORDER BY
         """
         query = """
-        SELECT incident_type, COUNT(*) as count
-        FROM cyber_incidents
-        GROUP BY incident_type
+        SELECT NULLIF(incident_type, '') as incident_type, count
+        FROM incident_type_summary
         ORDER BY count DESC
         """
-        df = pd.read_sql_query(query, conn)
+        df = read_frame(query, conn)
         return df
 
     @staticmethod
-    def compute_incident_metrics(conn):
+    def compute_kpis(conn):
         """
-        Compute key incident metrics.
-        Uses: SELECT, FROM, WHERE, COUNT
+        Compute every KPI registered on Incident.KPIS in a single pass.
+        Uses: SELECT, FROM, COUNT, SUM(CASE WHEN ...)
+        Returns:
+            KpiResult
         """
-        cursor = conn.cursor()
+        return Incident.KPIS.compute(conn)
 
-        # Total incidents
-        cursor.execute("SELECT COUNT(*) FROM cyber_incidents")
-        total = cursor.fetchone()[0]
-
-        # Open incidents
-        cursor.execute("SELECT COUNT(*) FROM cyber_incidents WHERE status = 'open'")
-        open_count = cursor.fetchone()[0]
-
-        # Critical incidents
-        cursor.execute("SELECT COUNT(*) FROM cyber_incidents WHERE severity = 'critical'")
-        critical = cursor.fetchone()[0]
-
-        # Phishing incidents
-        cursor.execute("SELECT COUNT(*) FROM cyber_incidents WHERE incident_type = 'phishing'")
-        phishing_total = cursor.fetchone()[0]
+    @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
+    def compute_incident_metrics(conn):
+        """
+        Compute key incident metrics (one scan of cyber_incidents).
+        Returns:
+            IncidentMetrics(total, open_count, critical, phishing_total)
+        """
+        kpis = Incident.compute_kpis(conn)
+        return IncidentMetrics(kpis.total, kpis.open_count, kpis.critical, kpis.phishing_total)
 
-        return total, open_count, critical, phishing_total
+    @staticmethod
+    @cached_query("cyber_incidents")
+    @memory_tracked
+    def get_incident_timeseries(conn, grain="day", incident_type=None, severity=None, status=None,
+                                start_date=None, end_date=None):
+        """
+        Incident counts per day, week or month, read from the trigger-maintained
+        incident_rollups table. Filter by at most one of incident_type, severity
+        or status. Empty buckets are included with a count of 0.
+        Returns:
+            DataFrame with 'date' (bucket start, 'YYYY-MM-DD') and 'count' columns
+        """
+        rows = incident_series(conn, grain, start_date, end_date,
+                               incident_type=incident_type, severity=severity, status=status)
+        return compact_frame(pd.DataFrame(rows, columns=["date", "count"]))
 
     @staticmethod
     def get_daily_phishing_count(conn):
         """
-        Get daily counts of phishing incidents.
-        Uses: SELECT, FROM, WHERE, GROUP BY, ORDER BY
+        Get daily counts of phishing incidents (dense, oldest first).
         """
-        query = """
-        SELECT date, COUNT(*) as count
-        FROM cyber_incidents
-        WHERE incident_type = 'phishing'
-        GROUP BY date
-        ORDER BY date ASC
+        return Incident.get_incident_timeseries(conn, "day", incident_type="phishing")
+
+    @staticmethod
+    def get_analytics_bundle(use_cache=True):
         """
-        df = pd.read_sql_query(query, conn)
-        return df
+        Everything the Cybersecurity analytics tab shows, read in one
+        transaction on one pooled connection.
+        Returns:
+            Bundle with metrics (IncidentMetrics), by_type and phishing_trend
+        """
+        return load_bundle("cybersecurity_analytics", {
+            "metrics": Incident.compute_incident_metrics,
+            "by_type": Incident.get_incidents_by_type_count,
+            "phishing_trend": Incident.get_daily_phishing_count,
+        }, tables=("cyber_incidents",), use_cache=use_cache)
@@ -0,0 +1,301 @@
+"""Streaming CSV ingest.
+
+Rows are read with the csv module in fixed-size chunks, and each chunk is
+written with executemany inside its own transaction. Rows are upserted on
+the table's natural key, so re-running a load updates rows instead of
+duplicating them. Memory use is bounded by chunk_size, not by file size."""
+import csv
+import hashlib
+import time
+from pathlib import Path
+from app.data.dates import DATE_COLUMNS, to_iso_date
+from app.data.cache import invalidate
+
+# Natural key used for upserts. it_tickets is keyed on ticket_id
+# (unique index from migration 3), so its CSV id column is ignored.
+NATURAL_KEYS = {
+    "cyber_incidents": "id",
+    "datasets_metadata": "id",
+    "it_tickets": "ticket_id",
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Bytes hashed at the start of a file and just before the high-water mark
+FINGERPRINT_WINDOW = 64 * 1024
+
+
+class IngestResult:
+    """Outcome of loading one CSV file.
+    mode is 'full', 'append' (only new rows were read) or 'unchanged'."""
+    def __init__(self, table, rows=0, skipped=0, seconds=0.0, end_offset=0, mode="full", last_key=None):
+        self.table = table
+        self.rows = rows
+        self.skipped = skipped
+        self.seconds = seconds
+        self.end_offset = end_offset
+        self.mode = mode
+        self.last_key = last_key
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return f"IngestResult(table={self.table}, mode={self.mode}, rows={self.rows}, skipped={self.skipped}, seconds={self.seconds:.2f}, rows_per_second={self.rows_per_second:,.0f})"
+
+
+def print_progress(table, rows, seconds):
+    """Default progress reporter."""
+    rate = rows / seconds if seconds else 0.0
+    print(f"   {table}: {rows:,} rows ({rate:,.0f} rows/s)")
+
+
+def get_table_columns(conn, table_name):
+    """Return the column names of table_name in declaration order."""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+
+def read_header(csv_path):
+    """Return (header, byte offset of the first data row)."""
+    with open(csv_path, "rb") as file:
+        line = file.readline()
+        header = next(csv.reader([line.decode("utf-8-sig")]))
+        return header, file.tell()
+
+
+def iter_csv_records(csv_path, start_offset, end_offset=None, strict=False, complete_only=False):
+    """Yield (record, offset just past the record) from a CSV file, starting
+    at byte start_offset and stopping at end_offset (end of file if None).
+    Offsets always fall on record boundaries, so they can be stored and used
+    as start_offset for a later call. With strict=True malformed quoting,
+    including a quoted field still open at end_offset, raises csv.Error.
+    With complete_only=True a last record that may still be being written
+    (no final newline, or a quoted field still open) is not yielded, so the
+    last offset stays in front of it."""
+    with open(csv_path, "rb") as file:
+        file.seek(start_offset)
+        position = start_offset
+        record_lines = []
+
+        def lines():
+            nonlocal position
+            while end_offset is None or position < end_offset:
+                line = file.readline()
+                if not line or (complete_only and not line.endswith(b"\n")):
+                    return
+                position += len(line)
+                record_lines.append(line)
+                yield line.decode("utf-8")
+
+        # csv.reader pulls lines one record at a time, so after each record
+        # position points exactly at the start of the next one
+        for record in csv.reader(lines(), strict=strict):
+            # balanced quotes close every quoted field; an odd count means
+            # the reader ran out of lines inside one
+            if complete_only and sum(line.count(b'"') for line in record_lines) % 2:
+                return
+            record_lines.clear()
+            yield record, position
+
+
+def build_upsert_sql(table_name, columns, key):
+    """INSERT ... ON CONFLICT(key) DO UPDATE for the given columns."""
+    placeholders = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != key)
+    action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return (
+        f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders}) "
+        f"ON CONFLICT({key}) {action}"
+    )
+
+
+class RowConverter:
+    """Turns raw CSV records into parameter tuples for one table."""
+    def __init__(self, header, table_name, table_columns):
+        key = NATURAL_KEYS.get(table_name, "id")
+        wanted = [c for c in header if c in table_columns and not (c == "id" and key != "id")]
+        self.table_name = table_name
+        self.key = key
+        self.columns = wanted
+        self.width = len(header)
+        self.key_index = wanted.index(key) if key in wanted else None
+        self._positions = [header.index(c) for c in wanted]
+        self._date_positions = {
+            i for i, c in enumerate(wanted) if c in DATE_COLUMNS.get(table_name, [])
+        }
+
+    def convert(self, record):
+        """Return a parameter tuple, or None if the record is malformed."""
+        if len(record) != self.width:
+            return None
+        values = []
+        for i, position in enumerate(self._positions):
+            value = record[position].strip()
+            if value == "":
+                value = None
+            elif i in self._date_positions:
+                try:
+                    value = to_iso_date(value)
+                except ValueError:
+                    return None
+            values.append(value)
+        return tuple(values)
+
+
+def write_batch(conn, sql, batch):
+    """Write one batch with executemany inside a single transaction."""
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(sql, batch)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def stream_csv_to_table(conn, csv_path, table_name, chunk_size=DEFAULT_CHUNK_SIZE,
+                        start_offset=None, progress=print_progress, complete_only=False):
+    """Upsert every row of csv_path into table_name, chunk by chunk.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        csv_path: CSV file with a header row naming table columns
+        table_name: target table (see NATURAL_KEYS for the upsert key)
+        chunk_size: rows per executemany / transaction
+        start_offset: byte offset to resume from (defaults to the first data row)
+        progress: callable(table, rows, seconds) called after each chunk, or None
+        complete_only: leave a half-written last record for a later run
+            (see iter_csv_records); end_offset stops in front of it
+    Returns:
+        IngestResult"""
+    csv_path = Path(csv_path)
+    if conn.in_transaction:
+        conn.commit()
+
+    header, data_offset = read_header(csv_path)
+    converter = RowConverter(header, table_name, get_table_columns(conn, table_name))
+    sql = build_upsert_sql(table_name, converter.columns, converter.key)
+
+    result = IngestResult(table_name, end_offset=start_offset or data_offset)
+    started = time.perf_counter()
+    batch = []
+    for record, offset in iter_csv_records(csv_path, start_offset or data_offset, complete_only=complete_only):
+        if not record:
+            result.end_offset = offset
+            continue
+        params = converter.convert(record)
+        if params is None:
+            result.skipped += 1
+        else:
+            batch.append(params)
+            if converter.key_index is not None:
+                result.last_key = params[converter.key_index]
+        result.end_offset = offset
+
+        if len(batch) >= chunk_size:
+            write_batch(conn, sql, batch)
+            result.rows += len(batch)
+            batch = []
+            if progress:
+                progress(table_name, result.rows, time.perf_counter() - started)
+
+    if batch:
+        write_batch(conn, sql, batch)
+        result.rows += len(batch)
+    invalidate(table_name)
+    result.seconds = time.perf_counter() - started
+    if progress:
+        progress(table_name, result.rows, result.seconds)
+    return result
+
+
+def file_fingerprint(csv_path, offset):
+    """Hash the first FINGERPRINT_WINDOW bytes and the FINGERPRINT_WINDOW
+    bytes before offset. Cheap to compute, and any rewrite of the file
+    (as opposed to an append past offset) almost always changes it.
+    Returns:
+        (head_hash, tail_hash)"""
+    with open(csv_path, "rb") as file:
+        head = file.read(min(FINGERPRINT_WINDOW, offset))
+        tail_start = max(0, offset - FINGERPRINT_WINDOW)
+        file.seek(tail_start)
+        tail = file.read(offset - tail_start)
+    return hashlib.sha256(head).hexdigest(), hashlib.sha256(tail).hexdigest()
+
+
+def get_ingest_state(conn, source):
+    """Return the stored ingest_state row for source as a dict, or None."""
+    row = conn.execute(
+        "SELECT file_size, byte_offset, head_hash, tail_hash, rows_ingested, last_key "
+        "FROM ingest_state WHERE source = ?",
+        (source,)
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ["file_size", "byte_offset", "head_hash", "tail_hash", "rows_ingested", "last_key"]
+    return dict(zip(keys, row))
+
+
+def save_ingest_state(conn, source, table_name, file_size, byte_offset, rows_ingested, last_key):
+    """Record the high-water mark and fingerprint for source."""
+    head_hash, tail_hash = file_fingerprint(source, byte_offset)
+    conn.execute("""
+        INSERT INTO ingest_state
+            (source, table_name, file_size, byte_offset, head_hash, tail_hash, rows_ingested, last_key, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(source) DO UPDATE SET
+            table_name = excluded.table_name,
+            file_size = excluded.file_size,
+            byte_offset = excluded.byte_offset,
+            head_hash = excluded.head_hash,
+            tail_hash = excluded.tail_hash,
+            rows_ingested = excluded.rows_ingested,
+            last_key = excluded.last_key,
+            updated_at = CURRENT_TIMESTAMP
+    """, (source, table_name, file_size, byte_offset, head_hash, tail_hash, rows_ingested, last_key))
+    conn.commit()
+
+
+def incremental_csv_to_table(conn, csv_path, table_name, chunk_size=DEFAULT_CHUNK_SIZE,
+                             progress=print_progress):
+    """Load only what changed in csv_path since the last incremental load.
+
+    - unchanged file (same size and fingerprint): nothing is read
+    - appended file (old content intact, new bytes after the mark):
+      only the bytes after the stored offset are parsed
+    - anything else (rewritten, truncated, first load): full reload, which
+      is still safe because rows are upserted
+    The file may still be being appended to, so a last line without a
+    newline (or with a quoted field still open) is left for the next run
+    instead of being loaded cut off and stepped over.
+    Returns:
+        IngestResult"""
+    source = str(Path(csv_path).resolve())
+    file_size = Path(source).stat().st_size
+    state = get_ingest_state(conn, source)
+
+    start_offset = None
+    previous_rows = 0
+    if state and file_size >= state["byte_offset"]:
+        unchanged_prefix = file_fingerprint(source, state["byte_offset"]) == (
+            state["head_hash"], state["tail_hash"]
+        )
+        if unchanged_prefix and file_size == state["byte_offset"]:
+            return IngestResult(table_name, end_offset=file_size, mode="unchanged",
+                                last_key=state["last_key"])
+        if unchanged_prefix:
+            start_offset = state["byte_offset"]
+            previous_rows = state["rows_ingested"]
+
+    result = stream_csv_to_table(conn, source, table_name, chunk_size=chunk_size,
+                                 start_offset=start_offset, progress=progress, complete_only=True)
+    if start_offset is not None:
+        result.mode = "append"
+        if result.last_key is None:
+            result.last_key = state["last_key"]
+
+    save_ingest_state(conn, source, table_name, file_size=Path(source).stat().st_size,
+                      byte_offset=result.end_offset,
+                      rows_ingested=previous_rows + result.rows,
+                      last_key=None if result.last_key is None else str(result.last_key))
+    return result
@@ -1,8 +1,41 @@
+import sqlite3
 import pandas as pd
-from app.data.db import connect_database
+from typing import NamedTuple
+from app.data.db import borrow_connection
+from app.data.dates import to_iso_date
+from app.data.cache import cached_query, invalidate
+from app.data.frames import read_frame, compact_frame, memory_tracked, TICKET_COLUMNS
+from app.data.kpis import KpiEngine, KpiDefinition
+from app.data.rollups import ticket_series
+from app.data.pagination import keyset_page
+from app.data.search import fts_query, ranked_search_sql
+from app.data.bundles import load_bundle
+from app.data.bulk import bulk_update, bulk_delete, count_matching
+from app.data.ticket_analytics import TicketAnalytics
+
+
+class TicketKpis(NamedTuple):
+    """Headline ticket counters (unpacks like the old 3-tuple)."""
+    total: int
+    open_count: int
+    unresolved: int
+
+
+# Columns list_tickets can sort by
+TICKET_SORT_COLUMNS = ("id", "ticket_id", "created_date", "status", "category", "assigned_to")
+
 
 class Tickets:
     """ IT Tickets Data Model and Operations """
+
+    # KPIs computed in one pass by compute_kpis(); callers can register more,
+    # e.g. Tickets.KPIS.register_counts_by("category", ["hardware", "network"])
+    KPIS = KpiEngine("it_tickets", [
+        KpiDefinition("total"),
+        KpiDefinition("open_count", "status = ?", ["open"]),
+        KpiDefinition("unresolved", "resolved_date IS NULL"),
+    ])
+
     def __init__(self, ticket_id, status, category, subject, description, created_date, resolved_date, assigned_to, id=None, created_at=None):
         self.id = id
         self.ticket_id = ticket_id
@@ -19,30 +52,59 @@ class Tickets:
         return f"ticket_id={self.ticket_id}, status={self.status}, category={self.category}, subject={self.subject}, assigned_to={self.assigned_to}, created_date={self.created_date}, resolved_date={self.resolved_date}, description={self.description}"
     
     @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
     def get_all_tickets(conn):
         """Get all tickets as DataFrame."""
-        df = pd.read_sql_query(
-            "SELECT * FROM it_tickets ORDER BY ticket_id DESC",
+        df = read_frame(
+            f"SELECT {TICKET_COLUMNS} FROM it_tickets ORDER BY ticket_id DESC",
             conn
         )
         return df
 
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def list_tickets(conn, page_size=50, cursor=None, sort_by="ticket_id", descending=True,
+                     status=None, category=None, assigned_to=None, start_date=None, end_date=None):
+        """Get one page of tickets, filtered and sorted in SQL.
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            page_size (int): Rows per page.
+            cursor: next_cursor from the previous page, or None for the first page.
+            sort_by (str): One of TICKET_SORT_COLUMNS.
+            status / category / assigned_to: optional equality filters.
+            start_date / end_date: optional inclusive created_date range.
+        Returns:
+            Page (rows DataFrame plus next_cursor)"""
+        return keyset_page(
+            conn, "it_tickets", TICKET_COLUMNS,
+            equals={"status": status, "category": category, "assigned_to": assigned_to},
+            date_column="created_date", start_date=start_date, end_date=end_date,
+            sort_by=sort_by, sortable=TICKET_SORT_COLUMNS, descending=descending,
+            cursor=cursor, page_size=page_size,
+        )
+
     # CRUD methods
 
     def insert_ticket(self):
-        """Insert new ticket to the database.
+        """Insert new ticket to the database. Dates are stored as 'YYYY-MM-DD'.
         Returns:
-            ID of the ticket that was inserted to the database"""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO it_tickets 
-            (ticket_id, status, category, subject, descripton, created_date, resolved_date, assigned_to)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (self.ticket_id, self.status, self.category, self.subject, self.description, self.created_date, self.resolved_date, self.assigned_to))
-        conn.commit()
-        ticket_id = cursor.lastrowid # Get the ID of the inserted ticket
-        conn.close()
+            ID of the ticket that was inserted to the database, or False if
+            the ticket_id is already taken"""
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    INSERT INTO it_tickets 
+                    (ticket_id, status, category, subject, descripton, created_date, resolved_date, assigned_to)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (self.ticket_id, self.status, self.category, self.subject, self.description, to_iso_date(self.created_date), to_iso_date(self.resolved_date), self.assigned_to))
+            except sqlite3.IntegrityError:  # UNIQUE(ticket_id)
+                return False
+            conn.commit()
+            invalidate("it_tickets")
+            ticket_id = cursor.lastrowid # Get the ID of the inserted ticket
         return ticket_id
 
     @staticmethod
@@ -60,7 +122,7 @@ class Tickets:
             (new_status, ticket_id)
         )
         conn.commit()
-        conn.close()
+        invalidate("it_tickets")
         return cursor.rowcount
 
     @staticmethod
@@ -77,40 +139,164 @@ class Tickets:
             (ticket_id,)
         )
         conn.commit()
-        conn.close()
+        invalidate("it_tickets")
         return cursor.rowcount
 
+    @staticmethod
+    def bulk_update_status(conn, new_status, ticket_ids=None, status=None, category=None,
+                           assigned_to=None, start_date=None, end_date=None):
+        """Set the status of many tickets in one transaction.
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            new_status (str): Status to set.
+            ticket_ids: ticket IDs ('TCK-...') to change, or None to change every ticket the filters match.
+            status / category / assigned_to / start_date / end_date: filters, as in list_tickets.
+        Returns:
+            Number of tickets whose status changed."""
+        return bulk_update(
+            conn, "it_tickets", {"status": new_status}, ids=ticket_ids, key="ticket_id",
+            equals={"status": status, "category": category, "assigned_to": assigned_to},
+            date_column="created_date", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    def bulk_delete_tickets(conn, ticket_ids=None, status=None, category=None,
+                            assigned_to=None, start_date=None, end_date=None):
+        """Delete many tickets in one transaction (by ticket ID, by filters, or both).
+        Returns:
+            Number of tickets deleted."""
+        return bulk_delete(
+            conn, "it_tickets", ids=ticket_ids, key="ticket_id",
+            equals={"status": status, "category": category, "assigned_to": assigned_to},
+            date_column="created_date", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    def count_tickets(conn, status=None, category=None, assigned_to=None, start_date=None, end_date=None):
+        """Number of tickets the filters match."""
+        return count_matching(
+            conn, "it_tickets",
+            equals={"status": status, "category": category, "assigned_to": assigned_to},
+            date_column="created_date", start_date=start_date, end_date=end_date,
+        )
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def get_tickets_created_between(conn, start_date, end_date):
+        """Get tickets created in [start_date, end_date].
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            start_date, end_date: date objects or 'YYYY-MM-DD' / 'm/d/Y' strings
+        Returns:
+            DataFrame ordered by created_date."""
+        query = f"""
+        SELECT {TICKET_COLUMNS} FROM it_tickets
+        WHERE created_date BETWEEN ? AND ?
+        ORDER BY created_date ASC, id ASC
+        """
+        return read_frame(query, conn, params=(to_iso_date(start_date), to_iso_date(end_date)))
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def get_tickets_resolved_between(conn, start_date, end_date):
+        """Get tickets resolved in [start_date, end_date].
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            start_date, end_date: date objects or 'YYYY-MM-DD' / 'm/d/Y' strings
+        Returns:
+            DataFrame ordered by resolved_date."""
+        query = f"""
+        SELECT {TICKET_COLUMNS} FROM it_tickets
+        WHERE resolved_date BETWEEN ? AND ?
+        ORDER BY resolved_date ASC, id ASC
+        """
+        return read_frame(query, conn, params=(to_iso_date(start_date), to_iso_date(end_date)))
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def search_tickets(conn, text, limit=20):
+        """Full-text search over ticket subjects and descriptions.
+        A match in the subject counts twice as much as one in the description.
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            text (str): Words to look for; the last word may be a prefix.
+            limit (int): Number of hits to return.
+        Returns:
+            DataFrame of the best matches, best first, with a 'relevance' column"""
+        match = fts_query(text)
+        if match is None:
+            return read_frame(f"SELECT {TICKET_COLUMNS}, 0.0 AS relevance FROM it_tickets LIMIT 0", conn)
+        query = ranked_search_sql("tickets_fts", "it_tickets", TICKET_COLUMNS, weights=(2.0, 1.0))
+        return read_frame(query, conn, params=(match, limit))
+
     # Analytics methods
 
     @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
     def get_tickets_resolved_by_staff(conn):
-        """Simple version - counts tickets per staff member"""
+        """Counts tickets per staff member.
+        Reads the trigger-maintained ticket_staff_summary table (one row per assignee)."""
         query = """
-        SELECT 
-            assigned_to,
-            COUNT(*) as total_tickets,
-            SUM(CASE WHEN status = 'resolved' OR status = 'closed' THEN 1 ELSE 0 END) as resolved_tickets
-        FROM it_tickets
-        WHERE assigned_to IS NOT NULL
-        GROUP BY assigned_to
+        SELECT assigned_to, total_tickets, resolved_tickets
+        FROM ticket_staff_summary
         ORDER BY resolved_tickets DESC
         """
-        return pd.read_sql_query(query, conn)
+        return read_frame(query, conn)
+
 
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def get_ticket_timeseries(conn, event="created", grain="day", status=None, category=None,
+                              assigned_to=None, start_date=None, end_date=None):
+        """Tickets created or resolved per day, week or month, read from the
+        trigger-maintained ticket_rollups table.
+        Args:
+            event (str): 'created' or 'resolved'
+            grain (str): 'day', 'week' or 'month'
+            status / category / assigned_to: optional filter (at most one)
+        Returns:
+            DataFrame with 'date' (bucket start) and 'count' columns, empty buckets as 0."""
+        rows = ticket_series(conn, event, grain, start_date, end_date,
+                             status=status, category=category, assigned_to=assigned_to)
+        return compact_frame(pd.DataFrame(rows, columns=["date", "count"]))
+
+    @staticmethod
+    def compute_kpis(conn):
+        """Compute every KPI registered on Tickets.KPIS in a single pass.
+        Returns:
+            KpiResult"""
+        return Tickets.KPIS.compute(conn)
 
     @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
     def get_ticket_kpis(conn):
-        """Get key performance indicators"""
-        cursor = conn.cursor()
-        
-        # Total tickets
-        total = cursor.execute("SELECT COUNT(*) FROM it_tickets").fetchone()[0]
-        
-        # Open tickets
-        open_count = cursor.execute("SELECT COUNT(*) FROM it_tickets WHERE status = 'open'").fetchone()[0]
-        
-        # Unresolved tickets
-        unresolved = cursor.execute(
-            "SELECT COUNT(*) FROM it_tickets WHERE resolved_date IS NULL"
-        ).fetchone()[0]
-        return total, open_count, unresolved
\ No newline at end of file
+        """Get key performance indicators (one scan of it_tickets).
+        Returns:
+            TicketKpis(total, open_count, unresolved)"""
+        kpis = Tickets.compute_kpis(conn)
+        return TicketKpis(kpis.total, kpis.open_count, kpis.unresolved)
+
+    @staticmethod
+    def get_analytics_bundle(breakdown="assigned_to", use_cache=True):
+        """Everything the IT Operations analytics tab shows, read in one
+        transaction on one pooled connection.
+        Args:
+            breakdown (str): 'assigned_to' or 'category' for the resolution
+                time and backlog tables.
+        Returns:
+            Bundle with kpis (TicketKpis), staff_performance, resolution,
+            overall_resolution, backlog and throughput"""
+        return load_bundle(f"it_operations_analytics:{breakdown}", {
+            "kpis": Tickets.get_ticket_kpis,
+            "staff_performance": Tickets.get_tickets_resolved_by_staff,
+            "resolution": lambda conn: TicketAnalytics.resolution_times(conn, by=breakdown),
+            "overall_resolution": lambda conn: TicketAnalytics.resolution_times(conn, by=None),
+            "backlog": lambda conn: TicketAnalytics.backlog_age(conn, by=breakdown),
+            "throughput": TicketAnalytics.weekly_throughput,
+        }, tables=("it_tickets",), use_cache=use_cache)
@@ -0,0 +1,114 @@
+"""Single-pass KPI aggregation.
+
+A KpiEngine holds the counters for one table and computes all of them in
+a single SELECT with conditional aggregation:
+
+    SELECT COUNT(*), SUM(CASE WHEN status = ? THEN 1 ELSE 0 END), ...
+
+Registering another KPI adds one more column to that SELECT, not one
+more scan of the table."""
+import threading
+
+
+class KpiDefinition:
+    """One counter: rows matching `condition` (an SQL boolean expression
+    using ? placeholders for params), or all rows when condition is None."""
+    def __init__(self, name, condition=None, params=()):
+        self.name = name
+        self.condition = condition
+        self.params = tuple(params)
+
+    def to_sql(self):
+        if self.condition is None:
+            return "COUNT(*)"
+        return f"COALESCE(SUM(CASE WHEN {self.condition} THEN 1 ELSE 0 END), 0)"
+
+    def __str__(self):
+        return f"KpiDefinition(name={self.name}, condition={self.condition}, params={self.params})"
+
+
+class KpiResult:
+    """Values computed by a KpiEngine, readable as result["name"] or result.name."""
+    def __init__(self, table, values):
+        self.table = table
+        self.values = dict(values)
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def as_dict(self):
+        return dict(self.values)
+
+    def __str__(self):
+        return f"KpiResult(table={self.table}, values={self.values})"
+
+
+class KpiEngine:
+    """Registry of KPI definitions for one table."""
+    def __init__(self, table, definitions=()):
+        self.table = table
+        self._definitions = {}
+        self._lock = threading.Lock()
+        for definition in definitions:
+            self.add(definition)
+
+    def add(self, definition):
+        """Add or replace a KpiDefinition."""
+        with self._lock:
+            self._definitions[definition.name] = definition
+        return definition
+
+    def register(self, name, condition=None, params=()):
+        """Register a counter, e.g. register("open", "status = ?", ["open"])."""
+        return self.add(KpiDefinition(name, condition, params))
+
+    def register_counts_by(self, column, values, prefix=None):
+        """Register one counter per value of column, named '<prefix>_<value>'
+        (prefix defaults to the column name).
+        Returns:
+            List of the registered names"""
+        prefix = prefix or column
+        names = []
+        for value in values:
+            name = f"{prefix}_{value}"
+            self.register(name, f"{column} = ?", [value])
+            names.append(name)
+        return names
+
+    def unregister(self, name):
+        with self._lock:
+            self._definitions.pop(name, None)
+
+    @property
+    def names(self):
+        with self._lock:
+            return list(self._definitions)
+
+    def compute(self, conn):
+        """Compute every registered KPI in one pass over the table.
+        Returns:
+            KpiResult"""
+        with self._lock:
+            definitions = list(self._definitions.values())
+        if not definitions:
+            return KpiResult(self.table, {})
+
+        columns = ",\n            ".join(d.to_sql() for d in definitions)
+        params = [p for d in definitions for p in d.params]
+        row = conn.execute(
+            f"SELECT\n            {columns}\n        FROM {self.table}",
+            params
+        ).fetchone()
+        return KpiResult(self.table, zip((d.name for d in definitions), row))
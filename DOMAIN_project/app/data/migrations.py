@@ -0,0 +1,161 @@
+"""Versioned schema migrations.
+
+Each migration is a (version, name, steps) entry in MIGRATIONS. A step is
+either an SQL string or a callable that takes the connection. Applied
+versions are recorded in the schema_migrations table, so apply_migrations()
+is safe to call on every startup."""
+from app.data.schema import BASE_TABLES_SQL
+from app.data.dates import migrate_dates_to_iso
+from app.data.summaries import SUMMARY_TABLES_SQL, SUMMARY_TRIGGERS_SQL, rebuild_summaries
+from app.data.rollups import ROLLUP_TABLES_SQL, ROLLUP_TRIGGERS_SQL, rebuild_rollups
+from app.data.search import SEARCH_TABLES_SQL, SEARCH_TRIGGERS_SQL, rebuild_search
+from app.data.changes import TABLE_VERSIONS_SQL, CHANGE_TRIGGERS_SQL
+from app.data.ai_cache import AI_CACHE_TABLES_SQL, AI_CACHE_TRIGGERS_SQL
+from app.data.triage import TRIAGE_TABLES_SQL, TRIAGE_TRIGGERS_SQL
+from app.data.conversations import CONVERSATION_TABLES_SQL
+
+
+def _dedupe_ticket_ids(conn):
+    """Keep the first row for every ticket_id so a unique index can be built.
+    Older databases never had one because of a typo in the table definition.
+    The other rows are copied to it_tickets_duplicates before they are deleted."""
+    duplicates = """
+        FROM it_tickets
+        WHERE id NOT IN (SELECT MIN(id) FROM it_tickets GROUP BY ticket_id)
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS it_tickets_duplicates AS SELECT * FROM it_tickets WHERE 0")
+    conn.execute(f"INSERT INTO it_tickets_duplicates SELECT * {duplicates}")
+    ticket_ids = [row[0] for row in conn.execute(f"SELECT DISTINCT ticket_id {duplicates} ORDER BY ticket_id")]
+    removed = conn.execute(f"DELETE {duplicates}").rowcount
+    if removed:
+        print(f"⚠️ Moved {removed} duplicate ticket rows to it_tickets_duplicates "
+              f"(ticket_id: {', '.join(map(str, ticket_ids))})")
+
+
+# Indexes mirror the WHERE / GROUP BY clauses in incidents.py,
+# it_operations.py and dataset.py. Where possible they include every
+# column a query touches, so SQLite can answer from the index alone.
+MIGRATIONS = [
+    (1, "base_tables", BASE_TABLES_SQL),
+    (2, "incident_indexes", [
+        # get_incidents_by_type_count, get_daily_phishing_count, phishing KPI
+        "CREATE INDEX IF NOT EXISTS idx_cyber_incidents_type_date ON cyber_incidents (incident_type, date)",
+        # open incidents KPI
+        "CREATE INDEX IF NOT EXISTS idx_cyber_incidents_status ON cyber_incidents (status)",
+        # critical incidents KPI
+        "CREATE INDEX IF NOT EXISTS idx_cyber_incidents_severity ON cyber_incidents (severity)",
+    ]),
+    (3, "ticket_indexes", [
+        _dedupe_ticket_ids,
+        # per-ticket_id UPDATE / DELETE, and the natural key for upserts
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_it_tickets_ticket_id ON it_tickets (ticket_id)",
+        # get_tickets_resolved_by_staff
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_assigned_status ON it_tickets (assigned_to, status)",
+        # open tickets KPI
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_status ON it_tickets (status)",
+        # unresolved tickets KPI
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_resolved_date ON it_tickets (resolved_date)",
+    ]),
+    (4, "dataset_indexes", [
+        # get_resource_consumption_by_category
+        "CREATE INDEX IF NOT EXISTS idx_datasets_category_usage ON datasets_metadata (category, record_count, file_size_mb)",
+        # get_datasets_by_source_count
+        "CREATE INDEX IF NOT EXISTS idx_datasets_source ON datasets_metadata (source)",
+    ]),
+    (5, "analyze", ["ANALYZE"]),
+    (6, "iso_dates", [
+        migrate_dates_to_iso,
+        # date range scans (get_incidents_between and friends)
+        "CREATE INDEX IF NOT EXISTS idx_cyber_incidents_date ON cyber_incidents (date)",
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_created_date ON it_tickets (created_date)",
+        "CREATE INDEX IF NOT EXISTS idx_datasets_last_updated ON datasets_metadata (last_updated)",
+        "ANALYZE",
+    ]),
+    (7, "ingest_state", ["""
+        CREATE TABLE IF NOT EXISTS ingest_state (
+            source TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            head_hash TEXT NOT NULL,
+            tail_hash TEXT NOT NULL,
+            rows_ingested INTEGER NOT NULL DEFAULT 0,
+            last_key TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """]),
+    (8, "summary_tables", SUMMARY_TABLES_SQL + SUMMARY_TRIGGERS_SQL + [rebuild_summaries]),
+    (9, "time_rollups", ROLLUP_TABLES_SQL + ROLLUP_TRIGGERS_SQL + [rebuild_rollups]),
+    (10, "listing_indexes", [
+        # keyset pagination: filter column first, then the sort column
+        # (the rowid/id tie-breaker is implicit in every index)
+        "CREATE INDEX IF NOT EXISTS idx_cyber_incidents_status_date ON cyber_incidents (status, date)",
+        "CREATE INDEX IF NOT EXISTS idx_cyber_incidents_severity_date ON cyber_incidents (severity, date)",
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_status_created ON it_tickets (status, created_date)",
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_category_created ON it_tickets (category, created_date)",
+        "CREATE INDEX IF NOT EXISTS idx_it_tickets_assigned_created ON it_tickets (assigned_to, created_date)",
+        "CREATE INDEX IF NOT EXISTS idx_datasets_category_updated ON datasets_metadata (category, last_updated)",
+        "CREATE INDEX IF NOT EXISTS idx_datasets_source_updated ON datasets_metadata (source, last_updated)",
+    ]),
+    # full-text search over incident descriptions and ticket subjects
+    (11, "search_indexes", SEARCH_TABLES_SQL + SEARCH_TRIGGERS_SQL + [rebuild_search]),
+    # update/delete counters read by the snapshot exporter
+    (12, "table_versions", [TABLE_VERSIONS_SQL] + CHANGE_TRIGGERS_SQL),
+    # content-addressed cache of AI incident analyses
+    (13, "ai_analysis_cache", AI_CACHE_TABLES_SQL + AI_CACHE_TRIGGERS_SQL),
+    # structured results of AI batch triage
+    (14, "incident_triage", TRIAGE_TABLES_SQL + TRIAGE_TRIGGERS_SQL),
+    # chat assistant conversations and their rolling summaries
+    (15, "conversations", CONVERSATION_TABLES_SQL),
+]
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    """Apply every migration newer than the current schema version, in order.
+    Each migration runs in its own transaction together with its bookkeeping row.
+    Returns:
+        List of versions that were applied"""
+    if conn.in_transaction:
+        conn.commit()
+
+    applied = []
+    for version, name, steps in sorted(migrations, key=lambda m: m[0]):
+        if version <= get_schema_version(conn):
+            continue
+
+        # IMMEDIATE takes the write lock up front, so two processes starting
+        # together can't both apply the same migration
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+                (version, name)
+            )
+            conn.commit()
+        except Exception:
+            # a failing step (SQL or Python) must not leave the migration half applied
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
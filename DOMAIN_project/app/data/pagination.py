@@ -0,0 +1,135 @@
+"""Keyset (seek) pagination for the listing views.
+
+Instead of SELECT * or LIMIT/OFFSET, each page continues from the last row
+of the previous one:
+
+    WHERE <filters> AND (sort_col, id) < (:last_sort_value, :last_id)
+    ORDER BY sort_col DESC, id DESC
+    LIMIT :page_size + 1
+
+With an index on the filter and sort columns every page costs the same,
+however deep the user pages.
+
+Rows where sort_col is NULL are listed too, where SQLite sorts NULLs: after
+every value when descending, before them when ascending. The cursor then
+holds None as the sort value and the seek condition switches accordingly.
+"""
+import pandas as pd
+from app.data.dates import to_iso_date
+from app.data.frames import read_frame
+
+
+class Page:
+    """One page of a listing.
+    next_cursor is passed back as `cursor` to get the following page
+    (None on the last page)."""
+    def __init__(self, rows, next_cursor, page_size, sort_by, descending):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+        self.sort_by = sort_by
+        self.descending = descending
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __str__(self):
+        return f"Page(rows={len(self.rows)}, sort_by={self.sort_by}, descending={self.descending}, next_cursor={self.next_cursor})"
+
+
+def filter_conditions(equals=None, date_column=None, start_date=None, end_date=None):
+    """WHERE conditions for the listing filters.
+    Args:
+        equals: dict of column -> value equality filters (None values are ignored)
+        date_column, start_date, end_date: optional inclusive date range filter
+    Returns:
+        (list of SQL conditions to AND together, list of parameters)"""
+    where = []
+    params = []
+    for column, value in (equals or {}).items():
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if date_column and start_date is not None:
+        where.append(f"{date_column} >= ?")
+        params.append(to_iso_date(start_date))
+    if date_column and end_date is not None:
+        where.append(f"{date_column} <= ?")
+        params.append(to_iso_date(end_date))
+    return where, params
+
+
+def keyset_page(conn, table, columns="*", equals=None, date_column=None, start_date=None,
+                end_date=None, sort_by="id", sortable=("id",), descending=True, cursor=None,
+                page_size=50):
+    """Fetch one page of table.
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        table: table name
+        columns: SELECT list (must include id and sort_by)
+        equals: dict of column -> value equality filters (None values are ignored)
+        date_column, start_date, end_date: optional inclusive date range filter
+        sort_by: column to order by, one of sortable; ties are broken by id.
+        descending: sort direction
+        cursor: next_cursor of the previous page, or None for the first page
+        page_size: rows per page
+    Returns:
+        Page"""
+    if sort_by not in sortable:
+        raise ValueError(f"Cannot sort by '{sort_by}'; choose one of {', '.join(sortable)}.")
+
+    where, params = filter_conditions(equals, date_column, start_date, end_date)
+
+    direction = "DESC" if descending else "ASC"
+    comparison = "<" if descending else ">"
+    if sort_by == "id":
+        order_by = f"id {direction}"
+        if cursor is not None:
+            where.append(f"id {comparison} ?")
+            params.append(cursor[-1])
+    else:
+        order_by = f"{sort_by} {direction}, id {direction}"
+        if cursor is not None:
+            last_value, last_id = cursor
+            if last_value is None and descending:
+                # only NULL rows are left, they come last
+                where.append(f"({sort_by} IS NULL AND id < ?)")
+                params.append(last_id)
+            elif last_value is None:
+                # the rest of the NULL rows, then every value
+                where.append(f"({sort_by} IS NULL AND id > ? OR {sort_by} IS NOT NULL)")
+                params.append(last_id)
+            elif descending:
+                # smaller values, then the NULL rows
+                where.append(f"(({sort_by}, id) < (?, ?) OR {sort_by} IS NULL)")
+                params.extend(cursor)
+            else:
+                # NULL rows sort first, so they are behind us already
+                where.append(f"({sort_by}, id) > (?, ?)")
+                params.extend(cursor)
+
+    query = f"SELECT {columns} FROM {table}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {order_by} LIMIT ?"
+    params.append(page_size + 1)
+
+    df = read_frame(query, conn, params=params)
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        last_value = last[sort_by]
+        # back to the values sqlite stores: NULL, ISO date text, plain Python numbers
+        if pd.isna(last_value):
+            last_value = None
+        elif isinstance(last_value, pd.Timestamp):
+            last_value = last_value.date().isoformat()
+        elif hasattr(last_value, "item"):
+            last_value = last_value.item()
+        next_cursor = (int(last["id"]),) if sort_by == "id" else (last_value, int(last["id"]))
+    return Page(df, next_cursor, page_size, sort_by, descending)
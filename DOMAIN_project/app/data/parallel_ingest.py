@@ -0,0 +1,147 @@
+"""Parallel multi-source CSV ingest.
+
+Files are cut into byte ranges on line boundaries. The ranges are parsed
+and validated in a process pool, and every parsed batch goes back to the
+calling process, which is the only writer. That keeps to SQLite's
+one-writer rule while parsing scales with the number of cores."""
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from app.data.cache import invalidate
+from app.data.ingest import (
+    IngestResult, RowConverter, build_upsert_sql, get_table_columns,
+    iter_csv_records, print_progress, read_header, stream_csv_to_table, write_batch,
+)
+
+DEFAULT_RANGE_BYTES = 8 * 1024 * 1024
+
+
+def split_ranges(csv_path, data_offset, range_bytes=DEFAULT_RANGE_BYTES):
+    """Split a file into [start, end) byte ranges of about range_bytes, each
+    ending just after a newline."""
+    size = Path(csv_path).stat().st_size
+    ranges = []
+    with open(csv_path, "rb") as file:
+        start = data_offset
+        while start < size:
+            end = min(start + range_bytes, size)
+            if end < size:
+                file.seek(end)
+                file.readline()  # move to the end of the current line
+                end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(csv_path, table_name, header, table_columns, start, end):
+    """Worker: parse and validate one byte range.
+    Returns:
+        (rows, skipped), or None if a quoted field crosses the range
+        boundary and the file has to be parsed serially. The range is read
+        strictly: a non-strict reader would return the cut-off field as a
+        record instead of failing."""
+    converter = RowConverter(header, table_name, table_columns)
+    rows = []
+    skipped = 0
+    try:
+        for record, _ in iter_csv_records(csv_path, start, end, strict=True):
+            if not record:
+                continue
+            params = converter.convert(record)
+            if params is None:
+                skipped += 1
+            else:
+                rows.append(params)
+    except csv.Error:
+        return None
+    return rows, skipped
+
+
+def parallel_load_csvs(conn, sources, workers=None, range_bytes=DEFAULT_RANGE_BYTES,
+                       progress=print_progress):
+    """Load several CSV files with parsing spread over a process pool.
+    Args:
+        conn (sqlite3.Connection): Open database connection, used as the single writer.
+        sources: list of (csv_path, table_name)
+        workers: process count (defaults to os.cpu_count())
+        range_bytes: approximate size of the byte range each task parses
+        progress: callable(table, rows, seconds) called after each batch, or None
+    Returns:
+        List of IngestResult, one per source, in the order given"""
+    workers = workers or os.cpu_count() or 1
+    if conn.in_transaction:
+        conn.commit()
+
+    # Prepare every file first so ranges from all of them share the pool
+    plans = []
+    for csv_path, table_name in sources:
+        header, data_offset = read_header(csv_path)
+        table_columns = get_table_columns(conn, table_name)
+        converter = RowConverter(header, table_name, table_columns)
+        plans.append({
+            "csv_path": str(csv_path),
+            "table": table_name,
+            "header": header,
+            "table_columns": table_columns,
+            "sql": build_upsert_sql(table_name, converter.columns, converter.key),
+            "ranges": split_ranges(csv_path, data_offset, range_bytes),
+            "result": IngestResult(table_name),
+            "serial": False,
+        })
+
+    tasks = [(plan, start, end) for plan in plans for start, end in plan["ranges"]]
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        task_iter = iter(tasks)
+
+        def submit_next():
+            task = next(task_iter, None)
+            if task is None:
+                return
+            plan, start, end = task
+            future = pool.submit(parse_range, plan["csv_path"], plan["table"], plan["header"],
+                                 plan["table_columns"], start, end)
+            pending.append((plan, end, future))
+
+        # Bound the batches held in memory to a couple per worker
+        for _ in range(workers * 2):
+            submit_next()
+
+        # Write in submission order so a later duplicate key still wins
+        while pending:
+            plan, end, future = pending.popleft()
+            parsed = future.result()
+            submit_next()
+            if plan["serial"]:
+                continue
+            if parsed is None:
+                plan["serial"] = True
+                continue
+            rows, skipped = parsed
+            if rows:
+                write_batch(conn, plan["sql"], rows)
+            result = plan["result"]
+            result.rows += len(rows)
+            result.skipped += skipped
+            result.end_offset = end
+            if progress:
+                progress(plan["table"], result.rows, time.perf_counter() - started)
+
+    invalidate(*(plan["table"] for plan in plans))
+    results = []
+    for plan in plans:
+        if plan["serial"]:
+            # A quoted field spans lines across a range boundary; the
+            # batches already written are re-applied harmlessly by the upsert
+            result = stream_csv_to_table(conn, plan["csv_path"], plan["table"], progress=progress)
+        else:
+            result = plan["result"]
+            result.seconds = time.perf_counter() - started
+        results.append(result)
+    return results
@@ -0,0 +1,236 @@
+"""Time-bucketed rollups for incidents and tickets.
+
+incident_rollups and ticket_rollups hold a count per (grain, dimension,
+value, bucket). grain is 'day', 'week' (bucket = the Monday) or 'month'
+(bucket = the 1st). dimension is 'all' or one of the filter columns.
+Triggers on the base tables update the counts as rows are written, so a
+time series for e.g. phishing incidents per week is one primary-key range
+read. Missing buckets are filled with zeros so the series is ready to chart.
+
+Rebuild from scratch:
+    python -m app.data.rollups
+"""
+import datetime
+from app.data.dates import to_iso_date
+
+GRAINS = ("day", "week", "month")
+INCIDENT_DIMENSIONS = ("incident_type", "severity", "status")
+TICKET_DIMENSIONS = ("status", "category", "assigned_to")
+TICKET_EVENTS = {"created": "created_date", "resolved": "resolved_date"}
+
+ROLLUP_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS incident_rollups (
+        grain TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (grain, dimension, value, bucket)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ticket_rollups (
+        event TEXT NOT NULL,
+        grain TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (event, grain, dimension, value, bucket)
+    ) WITHOUT ROWID
+    """,
+]
+
+
+def _bucket_sql(date_expr):
+    return (
+        f"CASE g.grain WHEN 'day' THEN date({date_expr}) "
+        f"WHEN 'week' THEN date({date_expr}, 'weekday 0', '-6 days') "
+        f"ELSE strftime('%Y-%m-01', {date_expr}) END"
+    )
+
+
+def _rollup_keys_sql(row, date_column, dimensions, event=None):
+    """SELECT producing one (…, grain, dimension, value, bucket) key per grain
+    and dimension for a row. `row` is NEW, OLD or a table alias."""
+    grains = " UNION ALL ".join(f"SELECT '{g}' AS grain" for g in GRAINS)
+    dims = " UNION ALL ".join(f"SELECT '{d}' AS dimension" for d in ("all",) + dimensions)
+    value = "CASE d.dimension WHEN 'all' THEN '' " + " ".join(
+        f"WHEN '{d}' THEN IFNULL({row}.{d}, '')" for d in dimensions
+    ) + " END"
+    event_column = f"'{event}' AS event, " if event else ""
+    return (
+        f"SELECT {event_column}g.grain AS grain, d.dimension AS dimension, "
+        f"{value} AS value, {_bucket_sql(f'{row}.{date_column}')} AS bucket "
+        f"FROM ({grains}) g, ({dims}) d"
+    )
+
+
+def _trigger_sql(prefix, table, rollup_table, date_column, dimensions, event=None):
+    key_columns = ("event, " if event else "") + "grain, dimension, value, bucket"
+
+    def add(row):
+        return (
+            f"INSERT INTO {rollup_table} ({key_columns}, count) "
+            f"SELECT {key_columns}, 1 FROM ({_rollup_keys_sql(row, date_column, dimensions, event)}) "
+            f"WHERE bucket IS NOT NULL "
+            f"ON CONFLICT({key_columns}) DO UPDATE SET count = count + 1;"
+        )
+
+    def remove(row):
+        keys = f"SELECT {key_columns} FROM ({_rollup_keys_sql(row, date_column, dimensions, event)})"
+        return (
+            f"UPDATE {rollup_table} SET count = count - 1 WHERE ({key_columns}) IN ({keys}); "
+            f"DELETE FROM {rollup_table} WHERE count <= 0 AND ({key_columns}) IN ({keys});"
+        )
+
+    columns = ", ".join((date_column,) + dimensions)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_ai AFTER INSERT ON {table} "
+        f"WHEN NEW.{date_column} IS NOT NULL BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_ad AFTER DELETE ON {table} "
+        f"WHEN OLD.{date_column} IS NOT NULL BEGIN {remove('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_au AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {remove('OLD')} {add('NEW')} END",
+    ]
+
+
+ROLLUP_TRIGGERS_SQL = _trigger_sql(
+    "incident_rollups", "cyber_incidents", "incident_rollups", "date", INCIDENT_DIMENSIONS
+)
+for _event, _column in TICKET_EVENTS.items():
+    ROLLUP_TRIGGERS_SQL += _trigger_sql(
+        f"ticket_rollups_{_event}", "it_tickets", "ticket_rollups", _column, TICKET_DIMENSIONS, _event
+    )
+
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the base tables.
+    Runs inside the caller's transaction when there is one."""
+    conn.execute("DELETE FROM incident_rollups")
+    conn.execute(f"""
+        INSERT INTO incident_rollups (grain, dimension, value, bucket, count)
+        SELECT grain, dimension, value, bucket, COUNT(*)
+        FROM ({_rollup_keys_sql('t', 'date', INCIDENT_DIMENSIONS)}, cyber_incidents t)
+        WHERE bucket IS NOT NULL
+        GROUP BY grain, dimension, value, bucket
+    """)
+    conn.execute("DELETE FROM ticket_rollups")
+    for event, column in TICKET_EVENTS.items():
+        conn.execute(f"""
+            INSERT INTO ticket_rollups (event, grain, dimension, value, bucket, count)
+            SELECT event, grain, dimension, value, bucket, COUNT(*)
+            FROM ({_rollup_keys_sql('t', column, TICKET_DIMENSIONS, event)}, it_tickets t)
+            WHERE bucket IS NOT NULL
+            GROUP BY event, grain, dimension, value, bucket
+        """)
+
+
+def _next_bucket(day, grain):
+    if grain == "day":
+        return day + datetime.timedelta(days=1)
+    if grain == "week":
+        return day + datetime.timedelta(days=7)
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def bucket_start(value, grain):
+    """First day of the bucket containing value."""
+    day = datetime.date.fromisoformat(to_iso_date(value))
+    if grain == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+def dense_series(rows, grain, start=None, end=None):
+    """Fill missing buckets between start and end (default: the first and
+    last bucket in rows) with zero counts.
+    Args:
+        rows: list of (bucket, count) sorted by bucket
+    Returns:
+        List of (bucket, count) with one entry per bucket"""
+    if not rows and (start is None or end is None):
+        return []
+    first = bucket_start(start if start is not None else rows[0][0], grain)
+    last = bucket_start(end if end is not None else rows[-1][0], grain)
+
+    counts = dict(rows)
+    series = []
+    day = first
+    while day <= last:
+        bucket = day.isoformat()
+        series.append((bucket, counts.get(bucket, 0)))
+        day = _next_bucket(day, grain)
+    return series
+
+
+def _single_filter(filters, allowed):
+    """Turn keyword filters into (dimension, value); at most one may be set."""
+    chosen = [(k, v) for k, v in filters.items() if v is not None]
+    if len(chosen) > 1:
+        raise ValueError(f"Filter on at most one of {', '.join(allowed)} (got {len(chosen)}).")
+    if not chosen:
+        return "all", ""
+    dimension, value = chosen[0]
+    if dimension not in allowed:
+        raise ValueError(f"Unknown dimension '{dimension}'.")
+    return dimension, value
+
+
+def _bucket_range(grain, start, end):
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {GRAINS}, got '{grain}'.")
+    low = bucket_start(start, grain).isoformat() if start else ""
+    high = to_iso_date(end) if end else "9999-12-31"
+    return low, high
+
+
+def incident_series(conn, grain="day", start=None, end=None, dense=True, **filters):
+    """Incident counts per bucket, optionally filtered by one of
+    incident_type, severity or status.
+    Returns:
+        List of (bucket, count), oldest first"""
+    dimension, value = _single_filter(filters, INCIDENT_DIMENSIONS)
+    low, high = _bucket_range(grain, start, end)
+    rows = conn.execute("""
+        SELECT bucket, count
+        FROM incident_rollups
+        WHERE grain = ? AND dimension = ? AND value = ? AND bucket BETWEEN ? AND ?
+        ORDER BY bucket ASC
+    """, (grain, dimension, value, low, high)).fetchall()
+    return dense_series(rows, grain, start, end) if dense else rows
+
+
+def ticket_series(conn, event="created", grain="day", start=None, end=None, dense=True, **filters):
+    """Tickets created (event='created') or resolved (event='resolved') per
+    bucket, optionally filtered by one of status, category or assigned_to.
+    Returns:
+        List of (bucket, count), oldest first"""
+    if event not in TICKET_EVENTS:
+        raise ValueError(f"event must be one of {tuple(TICKET_EVENTS)}, got '{event}'.")
+    dimension, value = _single_filter(filters, TICKET_DIMENSIONS)
+    low, high = _bucket_range(grain, start, end)
+    rows = conn.execute("""
+        SELECT bucket, count
+        FROM ticket_rollups
+        WHERE event = ? AND grain = ? AND dimension = ? AND value = ? AND bucket BETWEEN ? AND ?
+        ORDER BY bucket ASC
+    """, (event, grain, dimension, value, low, high)).fetchall()
+    return dense_series(rows, grain, start, end) if dense else rows
+
+
+def main():
+    # imported here because app.data.db applies migrations, which import this module
+    from app.data.db import borrow_connection
+
+    with borrow_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rebuild_rollups(conn)
+    print("✅ Rollup tables rebuilt")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,93 @@
 import sqlite3
 
+USERS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    role TEXT DEFAULT 'user'
+);
+"""
+
+CYBER_INCIDENTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS cyber_incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT,
+    incident_type TEXT,
+    severity TEXT NOT NULL,
+    status TEXT DEFAULT 'open',
+    description TEXT,
+    reported_by TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+DATASETS_METADATA_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS datasets_metadata (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataset_name TEXT NOT NULL,
+    category TEXT,
+    source TEXT,
+    last_updated TEXT,
+    record_count INTEGER,
+    file_size_mb REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# ticket_id uniqueness is enforced by the idx_it_tickets_ticket_id index
+# (see app/data/migrations.py)
+IT_TICKETS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS it_tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticket_id TEXT NOT NULL,
+    status TEXT,
+    category TEXT,
+    subject TEXT NOT NULL,
+    descripton TEXT,
+    created_date TEXT,
+    resolved_date TEXT,
+    assigned_to TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+BASE_TABLES_SQL = [
+    USERS_TABLE_SQL,
+    CYBER_INCIDENTS_TABLE_SQL,
+    DATASETS_METADATA_TABLE_SQL,
+    IT_TICKETS_TABLE_SQL,
+]
+
+
 def create_users_table(conn):
     """
     Create the users table if it doesn't exist.
-    
+
     Args:
         conn: Database connection object
     """
-    create_table_sql = """
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT NOT NULL UNIQUE,
-        password_hash TEXT NOT NULL,
-        role TEXT DEFAULT 'user'
-    );
-    """
-    
     cursor = conn.cursor()
-    cursor.execute(create_table_sql)
+    cursor.execute(USERS_TABLE_SQL)
     conn.commit()
     print("Users table created")
 
 
 def create_cyber_incidents_table(conn):
     cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS cyber_incidents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT,
-        incident_type TEXT,
-        severity TEXT NOT NULL,
-        status TEXT DEFAULT 'open',
-        description TEXT,
-        reported_by TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+    cursor.execute(CYBER_INCIDENTS_TABLE_SQL)
     conn.commit()
     print("Cyber incidents table created")
 
 def create_datasets_metadata_table(conn):
    cursor = conn.cursor()
-   cursor.execute("""
-    CREATE TABLE IF NOT EXISTS datasets_metadata (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        dataset_name TEXT NOT NULL,
-        category TEXT,
-        source TEXT,
-        last_updated TEXT,
-        record_count INTEGER,
-        file_size_mb REAL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+   cursor.execute(DATASETS_METADATA_TABLE_SQL)
    conn.commit()
    print("Datasets metadata table created")
 
 def create_it_tickets_table(conn):
     cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS it_tickets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        ticket_id TEXT UNQIUE NOT NULL,
-        status TEXT,
-        category TEXT,
-        subject TEXT NOT NULL,
-        descripton TEXT,
-        created_date TEXT,
-        resolved_date TEXT,
-        assigned_to TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+    cursor.execute(IT_TICKETS_TABLE_SQL)
     conn.commit()
     print(" IT tickets table created")
 
@@ -83,4 +99,4 @@ def create_all_tables(conn):
     create_cyber_incidents_table(conn)
     create_datasets_metadata_table(conn)
     create_it_tickets_table(conn)
-    print("\n🎉 All tables created successfully!")
+    print("\n🎉 All tables created successfully!")
\ No newline at end of file
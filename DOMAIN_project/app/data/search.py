@@ -0,0 +1,116 @@
+"""FTS5 full-text search over incident descriptions and ticket text.
+
+incidents_fts indexes cyber_incidents.description and tickets_fts indexes
+it_tickets.subject and descripton. Both are external-content tables: they
+store only the index and read the text from the base table through its id,
+so the text isn't kept twice. Triggers on the base tables keep the index in
+step on INSERT, UPDATE and DELETE.
+
+A search is a MATCH on the index ranked by bm25 and cut to the top hits
+before the base table is touched, so it costs the same on a thousand rows
+or a few million.
+
+Rebuild the indexes from scratch:
+    python -m app.data.search
+"""
+import re
+
+SEARCH_TABLES_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS incidents_fts USING fts5(
+        description,
+        content='cyber_incidents', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+        subject, descripton,
+        content='it_tickets', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+]
+
+
+def _triggers(fts_table, table, columns):
+    """CREATE TRIGGER statements keeping an external-content index in step
+    with table. A row is removed from the index with the special 'delete'
+    command, which needs the values that were indexed."""
+    names = ", ".join(columns)
+    new_values = ", ".join(f"NEW.{c}" for c in columns)
+    old_values = ", ".join(f"OLD.{c}" for c in columns)
+    add = f"INSERT INTO {fts_table} (rowid, {names}) VALUES (NEW.id, {new_values});"
+    remove = (
+        f"INSERT INTO {fts_table} ({fts_table}, rowid, {names}) "
+        f"VALUES ('delete', OLD.id, {old_values});"
+    )
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN {remove} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {names} ON {table} "
+        f"BEGIN {remove} {add} END",
+    ]
+
+
+SEARCH_TRIGGERS_SQL = (
+    _triggers("incidents_fts", "cyber_incidents", ("description",))
+    + _triggers("tickets_fts", "it_tickets", ("subject", "descripton"))
+)
+
+SEARCH_TABLES = ("incidents_fts", "tickets_fts")
+
+
+def rebuild_search(conn):
+    """Re-index every row of the base tables.
+    Runs inside the caller's transaction when there is one."""
+    for fts_table in SEARCH_TABLES:
+        conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+
+def fts_query(text):
+    """Turn what a user typed into an FTS5 query: every word must appear,
+    and the last one may be a prefix ("phish" finds "phishing").
+    Quoting each word keeps FTS5 operators and punctuation in the input
+    from being parsed as query syntax.
+    Returns:
+        The MATCH string, or None if text has no words"""
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def ranked_search_sql(fts_table, table, columns, weights=None):
+    """SELECT returning `columns` of table for the best matches, best first,
+    with a `relevance` column (higher is better).
+    Parameters: (match, limit)."""
+    weight_args = "".join(f", {w}" for w in (weights or ()))
+    return f"""
+        SELECT {columns}, relevance
+        FROM (
+            SELECT rowid AS hit_id, -bm25({fts_table}{weight_args}) AS relevance
+            FROM {fts_table}
+            WHERE {fts_table} MATCH ?
+            ORDER BY bm25({fts_table}{weight_args})
+            LIMIT ?
+        ) AS hits
+        JOIN {table} ON {table}.id = hits.hit_id
+        ORDER BY relevance DESC
+    """
+
+
+def main():
+    # imported here because app.data.db applies migrations, which import this module
+    from app.data.db import borrow_connection
+
+    with borrow_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rebuild_search(conn)
+    print("✅ Search indexes rebuilt")
+
+
+if __name__ == "__main__":
+    main()
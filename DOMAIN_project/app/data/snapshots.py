@@ -0,0 +1,269 @@
+"""Columnar snapshots of the main tables for heavy analysis.
+
+refresh_snapshots() copies cyber_incidents, it_tickets and
+datasets_metadata to Arrow IPC files under DATA/snapshots/<table>/.
+load_snapshot() memory-maps them, so large analyses read column data
+straight from the page cache. They never query the live database or
+compete with its writers.
+
+Refreshes are incremental. A snapshot is a list of part files ordered by
+id, plus manifest.json. When the table's update/delete counter
+(table_versions) is unchanged and no row was inserted below the last
+exported id, only rows with a larger id are read, and they are written
+as one new part. Otherwise the table is exported again in full. A full
+export also happens once a snapshot has MAX_PARTS parts. Each refresh
+reads the table in one read transaction, and the manifest is replaced
+atomically after the parts are written.
+
+Needs pyarrow (pip install pyarrow).
+
+Refresh from the command line:
+    python -m app.data.snapshots [--full]
+"""
+import argparse
+import datetime
+import json
+import os
+import time
+from app.data.db import DATA_DIR, DB_PATH, borrow_connection
+from app.data.changes import table_version
+from app.data.frames import INCIDENT_COLUMNS, TICKET_COLUMNS, DATASET_COLUMNS, DATE_COLUMNS, compact_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+except ImportError:  # optional: only the snapshot functions need it
+    pa = None
+
+SNAPSHOT_DIR = DATA_DIR / "snapshots"
+SNAPSHOT_TABLES = {
+    "cyber_incidents": INCIDENT_COLUMNS,
+    "it_tickets": TICKET_COLUMNS,
+    "datasets_metadata": DATASET_COLUMNS,
+}
+BATCH_ROWS = 65536
+MAX_PARTS = 32
+MANIFEST = "manifest.json"
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Snapshots need pyarrow: pip install pyarrow")
+
+
+class SnapshotResult:
+    """Outcome of refreshing one table's snapshot.
+    mode is 'full', 'append' or 'unchanged'."""
+    def __init__(self, table, mode, rows_written, total_rows, parts, seconds):
+        self.table = table
+        self.mode = mode
+        self.rows_written = rows_written
+        self.total_rows = total_rows
+        self.parts = parts
+        self.seconds = seconds
+
+    def __str__(self):
+        return f"SnapshotResult(table={self.table}, mode={self.mode}, rows_written={self.rows_written}, total_rows={self.total_rows}, parts={self.parts}, seconds={self.seconds:.2f})"
+
+
+def _column_names(columns):
+    return [c.strip() for c in columns.split(",")]
+
+
+def _arrow_schema(conn, table, names):
+    """Arrow types from the declared SQLite types; ISO date columns become date32."""
+    declared = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+    fields = []
+    for name in names:
+        if name in DATE_COLUMNS:
+            arrow_type = pa.date32()
+        elif "INT" in declared[name]:
+            arrow_type = pa.int64()
+        elif any(t in declared[name] for t in ("REAL", "FLOA", "DOUB")):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _record_batch(rows, schema):
+    arrays = []
+    for field, values in zip(schema, zip(*rows)):
+        if field.type == pa.date32():
+            text = pa.array(values, type=pa.string())
+            parsed = pc.strptime(text, format="%Y-%m-%d", unit="s", error_is_null=True)
+            arrays.append(parsed.cast(pa.date32()))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _write_part(path, schema, cursor, id_index):
+    """Stream cursor into an Arrow IPC file at path.
+    Returns:
+        Manifest entry for the part (file, rows, first_id, last_id)"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    rows_written = 0
+    first_id = last_id = None
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        while True:
+            rows = cursor.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            writer.write_batch(_record_batch(rows, schema))
+            rows_written += len(rows)
+            if first_id is None:
+                first_id = rows[0][id_index]
+            last_id = rows[-1][id_index]
+    os.replace(tmp_path, path)
+    return {"file": path.name, "rows": rows_written, "first_id": first_id, "last_id": last_id}
+
+
+def _read_manifest(directory):
+    path = directory / MANIFEST
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(directory, manifest):
+    tmp_path = directory / (MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, directory / MANIFEST)
+
+
+def refresh_snapshot(table, full=False, snapshot_dir=SNAPSHOT_DIR, db_path=DB_PATH):
+    """Bring the snapshot of one table up to date.
+    Args:
+        table (str): One of SNAPSHOT_TABLES.
+        full (bool): Export every row even if an append would do.
+        snapshot_dir: Directory holding one sub-directory per table.
+        db_path: Database to read.
+    Returns:
+        SnapshotResult"""
+    _require_pyarrow()
+    if table not in SNAPSHOT_TABLES:
+        raise ValueError(f"No snapshot for '{table}'; choose one of {', '.join(SNAPSHOT_TABLES)}.")
+    started = time.perf_counter()
+    columns = SNAPSHOT_TABLES[table]
+    names = _column_names(columns)
+    directory = snapshot_dir / table
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(directory)
+
+    with borrow_connection(db_path) as conn:
+        # one read transaction: the checks and the copy see the same rows
+        conn.execute("BEGIN")
+        try:
+            version = table_version(conn, table)
+            schema = _arrow_schema(conn, table, names)
+            append = (
+                manifest is not None and not full
+                and manifest["version"] == version
+                and manifest["columns"] == names
+                and len(manifest["parts"]) < MAX_PARTS
+                and conn.execute(f"SELECT COUNT(*) FROM {table} WHERE id <= ?",
+                                 (manifest["last_id"],)).fetchone()[0] == manifest["rows"]
+            )
+            if append:
+                generation, parts = manifest["generation"], list(manifest["parts"])
+                after_id = manifest["last_id"]  # None if the snapshot is empty
+            else:
+                generation, parts = (manifest["generation"] + 1 if manifest else 1), []
+                after_id = None
+            query, params = f"SELECT {columns} FROM {table}", ()
+            if after_id is not None:
+                query, params = query + " WHERE id > ?", (after_id,)
+            cursor = conn.execute(query + " ORDER BY id", params)
+
+            path = directory / f"g{generation:04d}-part-{len(parts):05d}.arrow"
+            part = _write_part(path, schema, cursor, names.index("id"))
+        finally:
+            conn.rollback()
+
+    if append and part["rows"] == 0:
+        path.unlink()
+        return SnapshotResult(table, "unchanged", 0, manifest["rows"], len(parts), time.perf_counter() - started)
+
+    parts.append(part)
+    last_ids = [p["last_id"] for p in parts if p["last_id"] is not None]
+    _write_manifest(directory, {
+        "table": table,
+        "generation": generation,
+        "version": version,
+        "columns": names,
+        "rows": sum(p["rows"] for p in parts),
+        "last_id": max(last_ids) if last_ids else None,
+        "parts": parts,
+        "refreshed_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    })
+    # parts of earlier generations are no longer referenced
+    keep = {p["file"] for p in parts}
+    for stale in directory.glob("*.arrow"):
+        if stale.name not in keep:
+            stale.unlink()
+
+    return SnapshotResult(table, "append" if append else "full", part["rows"],
+                          sum(p["rows"] for p in parts), len(parts), time.perf_counter() - started)
+
+
+def refresh_snapshots(tables=None, full=False, snapshot_dir=SNAPSHOT_DIR, db_path=DB_PATH):
+    """Refresh the snapshots of several tables (default: all of them).
+    Returns:
+        List of SnapshotResult"""
+    results = []
+    for table in tables or SNAPSHOT_TABLES:
+        result = refresh_snapshot(table, full, snapshot_dir, db_path)
+        print(f"✅ {table}: {result.mode}, {result.rows_written:,} rows written "
+              f"({result.total_rows:,} rows in {result.parts} parts, {result.seconds:.2f}s)")
+        results.append(result)
+    return results
+
+
+def load_snapshot(table, columns=None, snapshot_dir=SNAPSHOT_DIR):
+    """Open a table's snapshot without copying it into memory.
+    Args:
+        table (str): One of SNAPSHOT_TABLES.
+        columns (list): Optional subset of columns.
+    Returns:
+        pyarrow.Table backed by memory-mapped files (one chunk per part)"""
+    _require_pyarrow()
+    directory = snapshot_dir / table
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        raise FileNotFoundError(f"No snapshot of {table}; run: python -m app.data.snapshots")
+    chunks = [
+        pa.ipc.open_file(pa.memory_map(str(directory / part["file"]), "r")).read_all()
+        for part in manifest["parts"]
+    ]
+    snapshot = pa.concat_tables(chunks)
+    return snapshot.select(columns) if columns else snapshot
+
+
+def load_snapshot_frame(table, columns=None, snapshot_dir=SNAPSHOT_DIR):
+    """A snapshot as a compact pandas DataFrame (see frames.compact_frame).
+    Columns are converted to pandas, so pass `columns` to load only what
+    the analysis needs."""
+    snapshot = load_snapshot(table, columns, snapshot_dir)
+    return compact_frame(snapshot.to_pandas(date_as_object=False))
+
+
+def snapshot_manifest(table, snapshot_dir=SNAPSHOT_DIR):
+    """The manifest of a table's snapshot (rows, parts, refreshed_at, ...), or None."""
+    return _read_manifest(snapshot_dir / table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the columnar snapshots in DATA/snapshots.")
+    parser.add_argument("tables", nargs="*", help="tables to refresh (default: all)")
+    parser.add_argument("--full", action="store_true", help="export every row again")
+    args = parser.parse_args()
+    refresh_snapshots(args.tables or None, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Trigger-maintained summary tables for the dashboard aggregates.
+
+Each summary table holds one row per group (incident type, staff member,
+dataset category, dataset source). Triggers on the base tables keep them
+current on INSERT, UPDATE and DELETE, so dashboard reads are O(groups)
+instead of a GROUP BY over every row.
+
+NULL group keys are stored as '' because a NULL primary key never
+conflicts; readers turn them back into NULL with NULLIF.
+
+Rebuild from scratch (e.g. after editing the database by hand):
+    python -m app.data.summaries
+"""
+SUMMARY_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS incident_type_summary (
+        incident_type TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ticket_staff_summary (
+        assigned_to TEXT PRIMARY KEY,
+        total_tickets INTEGER NOT NULL DEFAULT 0,
+        resolved_tickets INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dataset_category_summary (
+        category TEXT PRIMARY KEY,
+        dataset_count INTEGER NOT NULL DEFAULT 0,
+        total_records INTEGER NOT NULL DEFAULT 0,
+        total_size_mb REAL NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS dataset_source_summary (
+        source TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+# Statements run for a row entering (NEW) or leaving (OLD) a group.
+# They are combined into INSERT / DELETE / UPDATE triggers below.
+_INCIDENT_ADD = """
+    INSERT INTO incident_type_summary (incident_type, count)
+    VALUES (IFNULL(NEW.incident_type, ''), 1)
+    ON CONFLICT(incident_type) DO UPDATE SET count = count + 1;
+"""
+_INCIDENT_REMOVE = """
+    UPDATE incident_type_summary SET count = count - 1
+    WHERE incident_type = IFNULL(OLD.incident_type, '');
+    DELETE FROM incident_type_summary
+    WHERE incident_type = IFNULL(OLD.incident_type, '') AND count <= 0;
+"""
+
+_RESOLVED = "IN ('resolved', 'closed')"
+_STAFF_ADD = f"""
+    INSERT INTO ticket_staff_summary (assigned_to, total_tickets, resolved_tickets)
+    SELECT NEW.assigned_to, 1, NEW.status {_RESOLVED}
+    WHERE NEW.assigned_to IS NOT NULL
+    ON CONFLICT(assigned_to) DO UPDATE SET
+        total_tickets = total_tickets + 1,
+        resolved_tickets = resolved_tickets + excluded.resolved_tickets;
+"""
+_STAFF_REMOVE = f"""
+    UPDATE ticket_staff_summary SET
+        total_tickets = total_tickets - 1,
+        resolved_tickets = resolved_tickets - (OLD.status {_RESOLVED})
+    WHERE assigned_to = OLD.assigned_to;
+    DELETE FROM ticket_staff_summary
+    WHERE assigned_to = OLD.assigned_to AND total_tickets <= 0;
+"""
+
+_CATEGORY_ADD = """
+    INSERT INTO dataset_category_summary (category, dataset_count, total_records, total_size_mb)
+    VALUES (IFNULL(NEW.category, ''), 1, IFNULL(NEW.record_count, 0), IFNULL(NEW.file_size_mb, 0))
+    ON CONFLICT(category) DO UPDATE SET
+        dataset_count = dataset_count + 1,
+        total_records = total_records + excluded.total_records,
+        total_size_mb = total_size_mb + excluded.total_size_mb;
+    INSERT INTO dataset_source_summary (source, count)
+    VALUES (IFNULL(NEW.source, ''), 1)
+    ON CONFLICT(source) DO UPDATE SET count = count + 1;
+"""
+_CATEGORY_REMOVE = """
+    UPDATE dataset_category_summary SET
+        dataset_count = dataset_count - 1,
+        total_records = total_records - IFNULL(OLD.record_count, 0),
+        total_size_mb = total_size_mb - IFNULL(OLD.file_size_mb, 0)
+    WHERE category = IFNULL(OLD.category, '');
+    DELETE FROM dataset_category_summary
+    WHERE category = IFNULL(OLD.category, '') AND dataset_count <= 0;
+    UPDATE dataset_source_summary SET count = count - 1
+    WHERE source = IFNULL(OLD.source, '');
+    DELETE FROM dataset_source_summary
+    WHERE source = IFNULL(OLD.source, '') AND count <= 0;
+"""
+
+
+def _triggers(prefix, table, add, remove, update_columns):
+    """CREATE TRIGGER statements keeping a summary in step with table."""
+    columns = ", ".join(update_columns)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_ai AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_ad AFTER DELETE ON {table} BEGIN {remove} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_au AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {remove} {add} END",
+    ]
+
+
+SUMMARY_TRIGGERS_SQL = (
+    _triggers("incident_type_summary", "cyber_incidents", _INCIDENT_ADD, _INCIDENT_REMOVE,
+              ["incident_type"])
+    + _triggers("ticket_staff_summary", "it_tickets", _STAFF_ADD, _STAFF_REMOVE,
+                ["assigned_to", "status"])
+    + _triggers("dataset_summary", "datasets_metadata", _CATEGORY_ADD, _CATEGORY_REMOVE,
+                ["category", "source", "record_count", "file_size_mb"])
+)
+
+_REBUILD_SQL = [
+    "DELETE FROM incident_type_summary",
+    """
+    INSERT INTO incident_type_summary (incident_type, count)
+    SELECT IFNULL(incident_type, ''), COUNT(*)
+    FROM cyber_incidents
+    GROUP BY IFNULL(incident_type, '')
+    """,
+    "DELETE FROM ticket_staff_summary",
+    f"""
+    INSERT INTO ticket_staff_summary (assigned_to, total_tickets, resolved_tickets)
+    SELECT assigned_to, COUNT(*), SUM(status {_RESOLVED})
+    FROM it_tickets
+    WHERE assigned_to IS NOT NULL
+    GROUP BY assigned_to
+    """,
+    "DELETE FROM dataset_category_summary",
+    """
+    INSERT INTO dataset_category_summary (category, dataset_count, total_records, total_size_mb)
+    SELECT IFNULL(category, ''), COUNT(*), TOTAL(record_count), TOTAL(file_size_mb)
+    FROM datasets_metadata
+    GROUP BY IFNULL(category, '')
+    """,
+    "DELETE FROM dataset_source_summary",
+    """
+    INSERT INTO dataset_source_summary (source, count)
+    SELECT IFNULL(source, ''), COUNT(*)
+    FROM datasets_metadata
+    GROUP BY IFNULL(source, '')
+    """,
+]
+
+
+def rebuild_summaries(conn):
+    """Recompute every summary table from its base table.
+    Runs inside the caller's transaction when there is one."""
+    for statement in _REBUILD_SQL:
+        conn.execute(statement)
+
+
+def main():
+    # imported here because app.data.db applies migrations, which import this module
+    from app.data.db import borrow_connection
+
+    with borrow_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rebuild_summaries(conn)
+    print("✅ Summary tables rebuilt")
+
+
+if __name__ == "__main__":
+    main()
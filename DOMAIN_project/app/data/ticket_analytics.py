@@ -0,0 +1,139 @@
+"""Resolution-time analytics for IT tickets.
+
+Dates are stored as 'YYYY-MM-DD', so a resolution time or backlog age is a
+whole number of days. SQLite computes it with julianday() and returns a
+histogram: one (group, days, tickets) row per distinct duration. Tickets
+are never loaded row by row into Python. Percentiles come from the
+cumulative histogram (nearest rank), computed with vectorised pandas
+operations. They are exact, and the histogram stays small however many
+tickets there are.
+
+Weekly throughput reads the trigger-maintained ticket_rollups table."""
+import datetime
+import numpy as np
+import pandas as pd
+from app.data.cache import cached_query
+from app.data.dates import to_iso_date
+from app.data.frames import compact_frame, memory_tracked
+from app.data.rollups import ticket_series
+
+# Columns the distributions can be broken down by (None = all tickets)
+GROUP_COLUMNS = ("assigned_to", "category")
+PERCENTILES = (0.5, 0.9, 0.99)
+
+_RESOLVED = "resolved_date IS NOT NULL AND resolved_date >= created_date"
+_BACKLOG = "resolved_date IS NULL AND status NOT IN ('resolved', 'closed')"
+
+
+def _group_expr(by):
+    if by is None:
+        return "'all'"
+    if by not in GROUP_COLUMNS:
+        raise ValueError(f"Cannot group by '{by}'; choose one of {', '.join(GROUP_COLUMNS)} or None.")
+    return f"IFNULL({by}, '(none)')"
+
+
+def _histogram(conn, days_expr, where, by, params=()):
+    """(group, days, tickets) rows, one per distinct duration per group."""
+    query = f"""
+        SELECT {_group_expr(by)} AS grp,
+               CAST({days_expr} AS INTEGER) AS days,
+               COUNT(*) AS tickets
+        FROM it_tickets
+        WHERE {where}
+        GROUP BY grp, days
+        ORDER BY grp, days
+    """
+    return pd.read_sql_query(query, conn, params=params)
+
+
+def histogram_percentiles(hist, percentiles=PERCENTILES):
+    """Summarise a (grp, days, tickets) histogram sorted by grp and days.
+    Returns:
+        DataFrame with one row per group: tickets, mean_days, max_days and
+        p50_days / p90_days / ... (nearest-rank percentiles)"""
+    grouped = hist.groupby("grp", sort=True)
+    summary = pd.DataFrame({
+        "tickets": grouped["tickets"].sum(),
+        "mean_days": (hist["days"] * hist["tickets"]).groupby(hist["grp"]).sum() / grouped["tickets"].sum(),
+        "max_days": grouped["days"].max(),
+    })
+    cumulative = grouped["tickets"].cumsum()
+    totals = grouped["tickets"].transform("sum")
+    for q in percentiles:
+        # first duration whose cumulative count reaches rank ceil(q * n)
+        reached = hist[cumulative >= np.ceil(q * totals)]
+        summary[f"p{round(q * 100)}_days"] = reached.groupby("grp")["days"].first()
+    summary["mean_days"] = summary["mean_days"].round(2)
+    return summary.reset_index()
+
+
+class TicketAnalytics:
+    """Resolution-time distributions, backlog age and throughput."""
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def resolution_histogram(conn, by=None):
+        """Resolved tickets per whole number of days taken.
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            by (str): 'assigned_to', 'category' or None for all tickets.
+        Returns:
+            DataFrame with grp, days and tickets columns"""
+        return compact_frame(_histogram(
+            conn, "julianday(resolved_date) - julianday(created_date)", _RESOLVED, by
+        ))
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def resolution_times(conn, by="assigned_to"):
+        """Resolution-time distribution of resolved tickets.
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            by (str): 'assigned_to', 'category' or None for all tickets.
+        Returns:
+            DataFrame with one row per group: tickets, mean_days, max_days,
+            p50_days, p90_days and p99_days"""
+        hist = _histogram(conn, "julianday(resolved_date) - julianday(created_date)", _RESOLVED, by)
+        return compact_frame(histogram_percentiles(hist).rename(columns={"grp": by or "scope"}))
+
+    @staticmethod
+    def backlog_age(conn, by="category", as_of=None):
+        """Age of the tickets still waiting to be resolved.
+        Args:
+            conn (sqlite3.Connection): Database connection.
+            by (str): 'assigned_to', 'category' or None for all tickets.
+            as_of: date the ages are measured at (default today).
+        Returns:
+            DataFrame with one row per group: tickets, mean_days, max_days
+            (the oldest ticket), p50_days, p90_days and p99_days"""
+        # resolved here so the date is part of the cache key: ages change
+        # from one day to the next without any write to it_tickets
+        return TicketAnalytics._backlog_age(conn, by, to_iso_date(as_of or datetime.date.today()))
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def _backlog_age(conn, by, as_of):
+        hist = _histogram(conn, "julianday(?) - julianday(created_date)",
+                          f"{_BACKLOG} AND created_date IS NOT NULL", by, params=(as_of,))
+        return compact_frame(histogram_percentiles(hist).rename(columns={"grp": by or "scope"}))
+
+    @staticmethod
+    @cached_query("it_tickets")
+    @memory_tracked
+    def weekly_throughput(conn, start_date=None, end_date=None):
+        """Tickets created and resolved per week (weeks start on Monday).
+        Returns:
+            DataFrame with week, created, resolved and net (created - resolved)"""
+        created = pd.DataFrame(ticket_series(conn, "created", "week", start_date, end_date),
+                               columns=["week", "created"])
+        resolved = pd.DataFrame(ticket_series(conn, "resolved", "week", start_date, end_date),
+                                columns=["week", "resolved"])
+        weeks = created.merge(resolved, on="week", how="outer").fillna(0).sort_values("week", ignore_index=True)
+        weeks[["created", "resolved"]] = weeks[["created", "resolved"]].astype("int64")
+        weeks["net"] = weeks["created"] - weeks["resolved"]
+        weeks["week"] = pd.to_datetime(weeks["week"], format="%Y-%m-%d")
+        return compact_frame(weeks)
@@ -0,0 +1,105 @@
+"""Stored results of AI batch triage, one row per incident.
+
+incident_triage sits next to cyber_incidents (same id) and holds the
+structured answer: priority, a one-line summary and the recommended
+actions (a JSON list). content_hash identifies the incident fields the
+answer was based on, so a later batch can skip incidents that haven't
+changed since. Deleting an incident deletes its triage row.
+"""
+import json
+import time
+
+PRIORITIES = ("critical", "high", "medium", "low")
+
+TRIAGE_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS incident_triage (
+        incident_id INTEGER PRIMARY KEY,
+        priority TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        actions TEXT NOT NULL,
+        model TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 1,
+        triaged_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_incident_triage_priority ON incident_triage (priority)",
+]
+
+TRIAGE_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS cyber_incidents_triage_ad AFTER DELETE ON cyber_incidents
+    BEGIN DELETE FROM incident_triage WHERE incident_id = OLD.id; END
+    """,
+]
+
+
+class TriageResult:
+    """Structured triage of one incident."""
+    def __init__(self, incident_id, priority, summary, actions, model, content_hash, attempts=1):
+        self.incident_id = incident_id
+        self.priority = priority
+        self.summary = summary
+        self.actions = actions
+        self.model = model
+        self.content_hash = content_hash
+        self.attempts = attempts
+
+    def __str__(self):
+        return f"TriageResult(incident={self.incident_id}, priority={self.priority}, actions={len(self.actions)})"
+
+
+def triaged_hashes(conn, incident_ids):
+    """content_hash of the stored triage of each incident that has one.
+    Returns:
+        dict incident_id -> content_hash"""
+    hashes = {}
+    incident_ids = list(incident_ids)
+    for start in range(0, len(incident_ids), 500):
+        batch = incident_ids[start:start + 500]
+        placeholders = ", ".join("?" * len(batch))
+        hashes.update(conn.execute(
+            f"SELECT incident_id, content_hash FROM incident_triage WHERE incident_id IN ({placeholders})",
+            batch
+        ))
+    return hashes
+
+
+def store_triage(conn, results):
+    """Insert or replace the triage of many incidents in one transaction.
+    Runs inside the caller's transaction when there is one.
+    Returns:
+        Number of rows written"""
+    results = list(results)
+    if not results:
+        return 0
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        conn.executemany(
+            """
+            INSERT INTO incident_triage (incident_id, priority, summary, actions, model,
+                                         content_hash, attempts, triaged_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(incident_id) DO UPDATE SET
+                priority = excluded.priority,
+                summary = excluded.summary,
+                actions = excluded.actions,
+                model = excluded.model,
+                content_hash = excluded.content_hash,
+                attempts = excluded.attempts,
+                triaged_at = excluded.triaged_at
+            """,
+            [(r.incident_id, r.priority, r.summary, json.dumps(r.actions), r.model,
+              r.content_hash, r.attempts, now) for r in results]
+        )
+        if own_transaction:
+            conn.commit()
+    except BaseException:
+        if own_transaction:
+            conn.rollback()
+        raise
+    return len(results)
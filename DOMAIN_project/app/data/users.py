@@ -1,4 +1,16 @@
-from app.data.db import connect_database
+import sqlite3
+from app.data.db import borrow_connection
+from app.data.cache import QueryCache, cached_query
+
+# Bounded cache of user records for logins and registration checks.
+# Every write below bumps it, so a cached record is never out of date.
+user_cache = QueryCache(max_entries=1024, max_bytes=4 * 1024 * 1024)
+
+
+def invalidate_users():
+    """Call after writing to the users table."""
+    user_cache.bump("users")
+
 
 class User:
     """User data model."""
@@ -12,24 +24,43 @@ class User:
         return f"User(id={self.id}, username={self.username}, role={self.role})"
 
     @staticmethod # static method allows calling without instantiating the class
+    @cached_query("users", cache=user_cache)
     def get_user_by_username(username):
-        """Retrieve user by username."""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM users WHERE username = ?",(username,) )
-        user = cursor.fetchone()
-        conn.close()
+        """Retrieve user by username (cached; None when there is no such user)."""
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM users WHERE username = ?",(username,) )
+            user = cursor.fetchone()
         return user
 
     @staticmethod
     def insert_user(username, password_hash, role='user'):
-        """Insert new user."""
-        conn = connect_database()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-            (username, password_hash, role)
-        )
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        """Insert new user.
+        Returns:
+            True, or False if the username is already taken"""
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                    (username, password_hash, role)
+                )
+            except sqlite3.IntegrityError:  # UNIQUE(username)
+                return False
+            conn.commit()
+        invalidate_users()
+        return True
+
+    @staticmethod
+    def update_password_hash(username, password_hash):
+        """Replace a user's stored password hash."""
+        with borrow_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET password_hash = ? WHERE username = ?",
+                (password_hash, username)
+            )
+            conn.commit()
+        invalidate_users()
+        return cursor.rowcount
@@ -0,0 +1,244 @@
+"""Background precompute for the dashboard analytics.
+
+The analytics sections used to run their bundle of queries while the user
+waited. The scheduler runs them on a background thread instead and
+publishes the results; a page render just reads the latest result.
+
+A job is refreshed:
+- every `interval` seconds (ANALYTICS_REFRESH_SECONDS, default 300), which
+  also picks up writes made by other processes, and
+- shortly after a write to one of its tables. Writes through the models
+  call invalidate(table); the scheduler listens to those and refreshes the
+  affected jobs once writes have paused for `debounce` seconds
+  (ANALYTICS_DEBOUNCE_SECONDS, default 2), so a bulk change costs one
+  refresh, not one per row.
+
+A job that fails keeps its previous result, the error is shown in status(),
+and it is retried after RETRY_SECONDS.
+
+Usage:
+    scheduler = get_analytics_scheduler()   # started, with the dashboard jobs
+    bundle = scheduler.latest("cybersecurity_analytics")
+"""
+import os
+import threading
+import time
+from app.data.cache import query_cache
+from app.data.incidents import Incident
+from app.data.it_operations import Tickets
+from app.data.dataset import Dataset
+
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get("ANALYTICS_REFRESH_SECONDS", "300"))
+ANALYTICS_DEBOUNCE_SECONDS = float(os.environ.get("ANALYTICS_DEBOUNCE_SECONDS", "2"))
+RETRY_SECONDS = 30.0
+
+
+class JobStatus:
+    """Last refresh of one job.
+    refreshed_at is a time.time() timestamp (None before the first run);
+    seconds is how long that run took; stale is True while a write to the
+    job's tables is waiting to be picked up."""
+    def __init__(self, name, tables, interval, runs, refreshed_at, seconds, error, stale):
+        self.name = name
+        self.tables = tables
+        self.interval = interval
+        self.runs = runs
+        self.refreshed_at = refreshed_at
+        self.seconds = seconds
+        self.error = error
+        self.stale = stale
+
+    @property
+    def age(self):
+        """Seconds since the last refresh, or None."""
+        return None if self.refreshed_at is None else time.time() - self.refreshed_at
+
+    def __str__(self):
+        return f"JobStatus({self.name}, runs={self.runs}, seconds={self.seconds:.3f}, stale={self.stale}, error={self.error})"
+
+
+class _Job:
+    def __init__(self, name, func, tables, interval):
+        self.name = name
+        self.func = func
+        self.tables = tuple(tables)
+        self.interval = interval
+        self.lock = threading.Lock()  # one refresh of a job at a time
+        self.value = None
+        self.has_value = False
+        self.runs = 0
+        self.refreshed_at = None
+        self.seconds = 0.0
+        self.error = None
+        self.next_run = 0.0         # time.monotonic() of the next scheduled refresh
+        self.writes = 0             # writes to self.tables seen so far
+        self.writes_applied = 0     # writes included in the published value
+        self.last_write = 0.0
+
+
+class AnalyticsScheduler:
+    """Refreshes registered analytics jobs on a background thread."""
+
+    def __init__(self, interval=ANALYTICS_REFRESH_SECONDS, debounce=ANALYTICS_DEBOUNCE_SECONDS, tick=0.5):
+        self.interval = interval
+        self.debounce = debounce
+        self.tick = tick
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def register(self, name, func, tables=(), interval=None):
+        """Add a job.
+        Args:
+            name (str): Name the result is published under.
+            func: callable without arguments that computes the result.
+            tables: tables the result reads; writes to them trigger a refresh.
+            interval (float): seconds between refreshes (default: the scheduler's).
+        """
+        with self._lock:
+            self._jobs[name] = _Job(name, func, tables, interval or self.interval)
+        self._wake.set()
+
+    def start(self):
+        """Start the background thread and listen for writes."""
+        if self._thread is not None:
+            return
+        query_cache.subscribe(self.tables_written)
+        self._thread = threading.Thread(target=self._loop, name="analytics-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stopped.set()
+        self._wake.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+
+    def tables_written(self, tables):
+        """Mark the jobs that read any of tables as stale."""
+        now = time.monotonic()
+        with self._lock:
+            for job in self._jobs.values():
+                if set(tables) & set(job.tables):
+                    job.writes += 1
+                    job.last_write = now
+
+    def refresh(self, name):
+        """Recompute one job now, in the calling thread, and publish it.
+        Returns:
+            The new result (or the previous one if the job failed)"""
+        job = self._jobs[name]
+        with job.lock:
+            return self._run(job)
+
+    def latest(self, name):
+        """The published result of a job. Computed here if the job has
+        not run yet (raises RuntimeError if that fails)."""
+        job = self._jobs[name]
+        with self._lock:
+            if job.has_value:
+                return job.value
+        with job.lock:
+            # the background thread may have finished it while we waited
+            if job.has_value:
+                return job.value
+            self._run(job)
+            if not job.has_value:
+                raise RuntimeError(f"Analytics job {name} failed: {job.error}")
+            return job.value
+
+    def _run(self, job):
+        """Compute and publish one job; the caller holds job.lock."""
+        with self._lock:
+            writes = job.writes
+        started = time.perf_counter()
+        try:
+            value = job.func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Analytics job {job.name} failed: {error}")
+        else:
+            error = None
+        seconds = time.perf_counter() - started
+        with self._lock:
+            if error is None:
+                job.value = value
+                job.has_value = True
+                job.refreshed_at = time.time()
+                job.writes_applied = writes
+            job.error = error
+            job.runs += 1
+            job.seconds = seconds
+            job.next_run = time.monotonic() + (job.interval if error is None else min(job.interval, RETRY_SECONDS))
+        return job.value
+
+    def status(self, name=None):
+        """JobStatus of one job, or a list of all of them."""
+        with self._lock:
+            statuses = [
+                JobStatus(job.name, job.tables, job.interval, job.runs, job.refreshed_at,
+                          job.seconds, job.error, job.writes != job.writes_applied)
+                for job in self._jobs.values() if name in (None, job.name)
+            ]
+        return statuses[0] if name else statuses
+
+    def status_rows(self):
+        """status() as plain rows for st.dataframe."""
+        return [
+            {
+                "job": s.name,
+                "runs": s.runs,
+                "last_ms": round(s.seconds * 1000, 1),
+                "age_s": None if s.age is None else round(s.age),
+                "stale": s.stale,
+                "error": s.error,
+            }
+            for s in self.status()
+        ]
+
+    def _due(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                job.name for job in self._jobs.values()
+                if now >= job.next_run
+                # a failed job waits for its retry instead of rerunning on every tick
+                or (job.writes != job.writes_applied and job.error is None
+                    and now - job.last_write >= self.debounce)
+            ]
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            for name in self._due():
+                if self._stopped.is_set():
+                    return
+                self.refresh(name)
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+
+def register_dashboard_jobs(scheduler):
+    """The analytics bundles shown on the dashboard pages."""
+    scheduler.register("cybersecurity_analytics",
+                       lambda: Incident.get_analytics_bundle(use_cache=False), ("cyber_incidents",))
+    for breakdown in ("assigned_to", "category"):
+        scheduler.register(f"it_operations_analytics:{breakdown}",
+                           lambda b=breakdown: Tickets.get_analytics_bundle(b, use_cache=False), ("it_tickets",))
+    scheduler.register("data_science_analytics",
+                       lambda: Dataset.get_analytics_bundle(use_cache=False), ("datasets_metadata",))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_analytics_scheduler():
+    """Return the shared scheduler with the dashboard jobs, starting it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = AnalyticsScheduler()
+            register_dashboard_jobs(_scheduler)
+            _scheduler.start()
+        return _scheduler
@@ -1,6 +1,6 @@
-import bcrypt
-from app.data.db import connect_database
 from app.data.users import User
+from app.services.password_hasher import get_hasher, HasherBusy
+from app.services.session_manager import get_session_manager
 from app.services.database_manager import DatabaseManager
 
 class AuthManager:
@@ -12,22 +12,19 @@ class AuthManager:
     @staticmethod
     def register_user(username, password, role='user'):
         """Register new user with password hashing."""
-        conn = connect_database() 
-        cursor = conn.cursor()
-
         # Check if user already exists
-        cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        if cursor.fetchone():
+        if User.get_user_by_username(username):
             return False, f"Username '{username}' already exists."
         
-        # Hash password
-        password_hash = bcrypt.hashpw(
-            password.encode('utf-8'),
-            bcrypt.gensalt()
-        ).decode('utf-8')
+        # Hash password (on the shared bcrypt worker pool)
+        try:
+            password_hash = get_hasher().hash(password)
+        except HasherBusy as e:
+            return False, str(e)
         
-        # Insert new user into database
-        User.insert_user(username, password_hash, role)
+        # Insert new user into database (fails if someone took the name meanwhile)
+        if not User.insert_user(username, password_hash, role):
+            return False, f"Username '{username}' already exists."
         return True, f"User '{username}' registered successfully."
 
     @staticmethod
@@ -59,14 +56,64 @@ class AuthManager:
     @staticmethod
     def login_user(username, password):
         """Authenticate user."""
+        success, message, _ = AuthManager._authenticate(username, password)
+        return success, message
+
+    @staticmethod
+    def login(username, password):
+        """Authenticate user and start a session.
+        Returns:
+            (success, message, token); token is None when login failed"""
+        success, message, user = AuthManager._authenticate(username, password)
+        if not success:
+            return False, message, None
+        token = get_session_manager().create_session(user[1], user[3])  # username, role columns
+        return True, message, token
+
+    @staticmethod
+    def current_session(token):
+        """Session for a token, or None. No database access."""
+        return get_session_manager().validate(token)
+
+    @staticmethod
+    def logout(token):
+        get_session_manager().revoke(token)
+
+    @staticmethod
+    def _authenticate(username, password):
+        """Returns (success, message, user row or None)."""
         user = User.get_user_by_username(username)
         if not user:
-            return False, "User not found."
+            return False, "User not found.", None
         
-        # Verify password
+        # Verify password (on the shared bcrypt worker pool)
+        hasher = get_hasher()
         stored_hash = user[2]  # password_hash column
-        if bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8')):
-            return True, f"Login successful!"
-        return False, "Incorrect password."
+        try:
+            valid = hasher.verify(password, stored_hash)
+        except HasherBusy as e:
+            return False, str(e), None
+        if not valid:
+            return False, "Incorrect password.", None
+
+        # Upgrade hashes made with an older cost factor in the background
+        if hasher.needs_rehash(stored_hash):
+            AuthManager._rehash_in_background(hasher, username, password)
+        return True, f"Login successful!", user
+
+    @staticmethod
+    def _rehash_in_background(hasher, username, password):
+        """Hash password at the current cost and store it once done.
+        The login doesn't wait; if the pool is busy the upgrade is retried
+        on a later login."""
+        try:
+            future = hasher.hash_async(password)
+        except HasherBusy:
+            return
+
+        def store(done):
+            if done.exception() is None:
+                User.update_password_hash(username, done.result())
+        future.add_done_callback(store)
 
 
@@ -0,0 +1,308 @@
+"""Concurrent AI triage of an incident backlog.
+
+triage_backlog() selects incidents with the listing filters (e.g. every
+open critical incident) and asks the model for a structured triage of
+each: priority, a one-line summary and recommended actions. The requests
+go out together on an AsyncOpenAI client:
+
+- at most `concurrency` requests are in flight (TRIAGE_CONCURRENCY, default 8)
+- rate limits (429), timeouts, connection errors and 5xx answers are
+  retried up to MAX_ATTEMPTS times with exponential backoff and jitter;
+  a Retry-After header is honoured
+- after a 429 every worker waits out the same cool-down instead of
+  hammering the endpoint
+- a malformed answer is asked again
+
+A batch therefore takes roughly (incidents / concurrency) round trips
+instead of one round trip per incident.
+
+Results are written next to the incidents (incident_triage, see
+app/data/triage.py) in one transaction. Incidents whose fields haven't
+changed since their last triage are skipped.
+
+The client is any OpenAI-compatible endpoint: pass base_url (or set
+OPENAI_BASE_URL) to use a local stand-in.
+
+Usage (from DOMAIN_project/):
+    python -m app.services.batch_triage --status open --severity critical [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
+from app.data.db import DB_PATH, borrow_connection
+from app.data.cache import invalidate
+from app.data.pagination import filter_conditions
+from app.data.ai_cache import content_key
+from app.data.triage import PRIORITIES, TriageResult, triaged_hashes, store_triage
+
+TRIAGE_MODEL = "gpt-4.1-mini"
+TRIAGE_CONCURRENCY = int(os.environ.get("TRIAGE_CONCURRENCY", "8"))
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 1.0
+MAX_DELAY_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 60.0
+
+SYSTEM_PROMPT = "You are a cybersecurity incident triage assistant. Answer with a JSON object only."
+TRIAGE_PROMPT = """Triage this cybersecurity incident.
+
+Type: {incident_type}
+Severity: {severity}
+Status: {status}
+Date: {date}
+Description: {description}
+
+Reply with a JSON object:
+{{"priority": "critical" | "high" | "medium" | "low",
+  "summary": "<one sentence>",
+  "actions": ["<recommended next step>", ...]}}"""
+# the incident fields the prompt uses; a change to any of them means a new triage
+TRIAGE_FIELDS = ("incident_type", "severity", "status", "date", "description")
+
+
+class TriageReport:
+    """Outcome of one batch.
+    errors is a list of (incident id, message) for incidents that failed
+    after every retry."""
+    def __init__(self, selected=0, skipped=0, triaged=0, errors=None, requests=0, seconds=0.0):
+        self.selected = selected
+        self.skipped = skipped
+        self.triaged = triaged
+        self.errors = errors or []
+        self.requests = requests
+        self.seconds = seconds
+
+    def __str__(self):
+        return (f"TriageReport(selected={self.selected}, skipped={self.skipped}, triaged={self.triaged}, "
+                f"failed={len(self.errors)}, requests={self.requests}, seconds={self.seconds:.2f})")
+
+
+def parse_triage(text):
+    """Check the model's answer.
+    Returns:
+        (priority, summary, actions)
+    Raises:
+        ValueError if the answer isn't the JSON object the prompt asks for
+        (including an empty answer), so it is asked again"""
+    if not isinstance(text, str):
+        raise ValueError("empty answer")
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("answer is not a JSON object")
+    priority = data.get("priority")
+    summary = data.get("summary")
+    actions = data.get("actions", [])
+    if not isinstance(priority, str) or priority.strip().lower() not in PRIORITIES:
+        raise ValueError(f"unknown priority {priority!r}")
+    if not isinstance(summary, str) or not summary.strip() or not isinstance(actions, list):
+        raise ValueError("summary or actions missing")
+    return priority.strip().lower(), summary.strip(), [str(action) for action in actions]
+
+
+class _RateGate:
+    """Shared cool-down: after a rate limit every request waits until it ends."""
+    def __init__(self):
+        self.resume_at = 0.0
+
+    def hold(self, seconds):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    async def wait(self):
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: the server's Retry-After
+    when it sends one, else exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), MAX_DELAY_SECONDS)
+        except ValueError:
+            pass
+    return min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+def _retryable(error):
+    if isinstance(error, (RateLimitError, APIConnectionError, ValueError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+async def _triage_one(client, incident, model, semaphore, gate, max_attempts, counter):
+    attempt = 0
+    while True:
+        attempt += 1
+        async with semaphore:
+            # checked once a slot is free: a rate limit may have been hit while waiting for it
+            await gate.wait()
+            try:
+                counter[0] += 1
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": TRIAGE_PROMPT.format(**{f: incident[f] for f in TRIAGE_FIELDS})},
+                    ],
+                    response_format={"type": "json_object"},
+                )
+                choices = response.choices or []
+                priority, summary, actions = parse_triage(choices[0].message.content if choices else None)
+                return TriageResult(incident["id"], priority, summary, actions, model,
+                                    incident["content_hash"], attempt)
+            except Exception as e:
+                if not _retryable(e) or attempt >= max_attempts:
+                    raise
+                # a malformed answer is asked again straight away
+                delay = 0.0 if isinstance(e, ValueError) else _retry_delay(e, attempt)
+                if isinstance(e, RateLimitError):
+                    gate.hold(delay)
+        # back off outside the semaphore so other incidents keep going
+        await asyncio.sleep(delay)
+
+
+async def triage_incidents_async(client, incidents, model=TRIAGE_MODEL, concurrency=TRIAGE_CONCURRENCY,
+                                 max_attempts=MAX_ATTEMPTS, on_done=None):
+    """Triage incidents concurrently on an async client.
+    Args:
+        client: AsyncOpenAI (or compatible) client.
+        incidents: dicts with id, content_hash and the TRIAGE_FIELDS.
+        on_done: optional callback(incident, TriageResult or exception), called as each finishes.
+    Returns:
+        (list of (incident, TriageResult or exception), number of requests made)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    gate = _RateGate()
+    counter = [0]
+
+    async def run(incident):
+        try:
+            outcome = await _triage_one(client, incident, model, semaphore, gate, max_attempts, counter)
+        except Exception as e:
+            outcome = e
+        if on_done is not None:
+            on_done(incident, outcome)
+        return incident, outcome
+
+    outcomes = await asyncio.gather(*(run(incident) for incident in incidents))
+    return outcomes, counter[0]
+
+
+def select_incidents(conn, status=None, severity=None, incident_type=None, start_date=None,
+                     end_date=None, limit=None, model=TRIAGE_MODEL):
+    """Incidents matching the filters, as dicts with a content_hash of the
+    fields the triage prompt uses."""
+    where, params = filter_conditions(
+        {"status": status, "severity": severity, "incident_type": incident_type},
+        "date", start_date, end_date,
+    )
+    query = f"SELECT id, {', '.join(TRIAGE_FIELDS)} FROM cyber_incidents"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY id"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    template = SYSTEM_PROMPT + "\n" + TRIAGE_PROMPT
+    incidents = []
+    for row in conn.execute(query, params):
+        incident = dict(zip(("id",) + TRIAGE_FIELDS, row))
+        incident["content_hash"] = content_key({f: incident[f] for f in TRIAGE_FIELDS}, template, model)
+        incidents.append(incident)
+    return incidents
+
+
+async def _run_batch(incidents, client, api_key, base_url, **kwargs):
+    if client is not None:
+        return await triage_incidents_async(client, incidents, **kwargs)
+    # retries are handled here, so the SDK's own are turned off
+    async with AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                           timeout=REQUEST_TIMEOUT_SECONDS) as client:
+        return await triage_incidents_async(client, incidents, **kwargs)
+
+
+def triage_backlog(api_key=None, status="open", severity="critical", incident_type=None, start_date=None,
+                   end_date=None, limit=None, model=TRIAGE_MODEL, concurrency=TRIAGE_CONCURRENCY,
+                   max_attempts=MAX_ATTEMPTS, skip_unchanged=True, progress=None, client=None,
+                   base_url=None, db_path=DB_PATH):
+    """Triage every incident matching the filters and store the results.
+    Args:
+        api_key (str): OpenAI API key (ignored when client is given).
+        status / severity / incident_type / start_date / end_date: filters, as in list_incidents.
+        limit (int): triage at most this many incidents.
+        concurrency (int): requests in flight at once.
+        skip_unchanged (bool): skip incidents already triaged in their current state.
+        progress: optional callback(done, total), called as each incident finishes.
+        client: an async OpenAI-compatible client to use instead of creating one.
+        base_url (str): endpoint for the client created here.
+    Returns:
+        TriageReport"""
+    started = time.perf_counter()
+    with borrow_connection(db_path) as conn:
+        incidents = select_incidents(conn, status, severity, incident_type, start_date, end_date, limit, model)
+        stored = triaged_hashes(conn, [i["id"] for i in incidents]) if skip_unchanged else {}
+    todo = [i for i in incidents if stored.get(i["id"]) != i["content_hash"]]
+    report = TriageReport(selected=len(incidents), skipped=len(incidents) - len(todo))
+
+    if todo:
+        done = [0]
+
+        def on_done(incident, outcome):
+            done[0] += 1
+            if progress is not None:
+                progress(done[0], len(todo))
+
+        outcomes, report.requests = asyncio.run(_run_batch(
+            todo, client, api_key, base_url, model=model, concurrency=concurrency,
+            max_attempts=max_attempts, on_done=on_done,
+        ))
+        results = []
+        for incident, outcome in outcomes:
+            if isinstance(outcome, TriageResult):
+                results.append(outcome)
+            else:
+                report.errors.append((incident["id"], f"{type(outcome).__name__}: {outcome}"))
+        with borrow_connection(db_path) as conn:
+            report.triaged = store_triage(conn, results)
+        invalidate("incident_triage")
+
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI triage of the incidents matching the filters.")
+    parser.add_argument("--status", default="open", help="status filter ('all' for any)")
+    parser.add_argument("--severity", default="critical", help="severity filter ('all' for any)")
+    parser.add_argument("--type", dest="incident_type", default=None, help="incident type filter")
+    parser.add_argument("--limit", type=int, default=None, help="triage at most this many incidents")
+    parser.add_argument("--concurrency", type=int, default=TRIAGE_CONCURRENCY, help="requests in flight")
+    parser.add_argument("--all", action="store_true", help="also re-triage unchanged incidents")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("set OPENAI_API_KEY")
+    report = triage_backlog(
+        api_key,
+        status=None if args.status == "all" else args.status,
+        severity=None if args.severity == "all" else args.severity,
+        incident_type=args.incident_type,
+        limit=args.limit,
+        concurrency=args.concurrency,
+        skip_unchanged=not args.all,
+        progress=lambda done, total: print(f"\r⏳ {done}/{total}", end="", flush=True),
+    )
+    print(f"\n✅ Triaged {report.triaged} incidents in {report.seconds:.1f}s "
+          f"({report.skipped} unchanged skipped, {len(report.errors)} failed, {report.requests} requests)")
+    for incident_id, message in report.errors:
+        print(f"   incident {incident_id}: {message}")
+
+
+if __name__ == "__main__":
+    main()
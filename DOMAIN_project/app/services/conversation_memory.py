@@ -0,0 +1,162 @@
+"""Token-budgeted memory for the chat assistants.
+
+The assistants used to send the whole history on every turn, so cost,
+latency and session memory grew with every message. ConversationMemory
+keeps the conversation in the database (app/data/conversations.py) and
+sends at most `budget` tokens per request (CHAT_TOKEN_BUDGET, default 4000):
+
+    system prompt + rolling summary of older turns + newest turns that fit
+
+When the turns that aren't summarized yet no longer fit, compact() asks
+the model to fold the oldest of them into the summary, keeping about half
+the budget of recent turns word for word. That is one extra call every
+few turns rather than one per turn. If summarising fails, the sliding
+window still keeps requests within the budget.
+
+Tokens are counted with tiktoken when it is installed, otherwise
+estimated at four characters per token. Each message is counted once,
+when it is stored.
+"""
+import os
+from app.data.db import DB_PATH, borrow_connection
+from app.data.conversations import (get_conversation, add_message, get_messages, save_summary,
+                                    clear_conversation, turn_tokens)
+
+try:
+    import tiktoken
+except ImportError:  # optional: without it token counts are estimated
+    tiktoken = None
+
+CHAT_TOKEN_BUDGET = int(os.environ.get("CHAT_TOKEN_BUDGET", "4000"))
+SUMMARY_MODEL = "gpt-4.1-mini"
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators the API adds to every message
+DISPLAY_LIMIT = 100
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a user and an assistant.
+Merge the new messages into the current summary. Keep facts, decisions, open questions and
+anything the user asked to remember; drop small talk. Answer with the updated summary only,
+in at most 200 words."""
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Tokens a message with this content costs in a request."""
+    global _encoding
+    if tiktoken is None:
+        return len(text) // 4 + 1 + MESSAGE_OVERHEAD_TOKENS
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")  # the GPT-4o / GPT-4.1 encoding
+    return len(_encoding.encode(text)) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationMemory:
+    """A user's conversation with one assistant, sent within a token budget."""
+
+    def __init__(self, owner, assistant, system_prompt, budget=CHAT_TOKEN_BUDGET,
+                 summary_model=SUMMARY_MODEL, db_path=DB_PATH):
+        self.system_prompt = system_prompt
+        self.system_tokens = count_tokens(system_prompt)
+        self.budget = budget
+        self.summary_model = summary_model
+        self.db_path = db_path
+        with borrow_connection(db_path) as conn:
+            self.conversation = get_conversation(conn, owner, assistant)
+
+    def add(self, role, content, sent_tokens=None):
+        """Store a message.
+        Args:
+            role (str): 'user' or 'assistant'.
+            sent_tokens (int): for an answer, the tokens sent to get it.
+        Returns:
+            The message id"""
+        with borrow_connection(self.db_path) as conn:
+            return add_message(conn, self.conversation.id, role, content, count_tokens(content), sent_tokens)
+
+    def _unsummarized(self):
+        with borrow_connection(self.db_path) as conn:
+            return get_messages(conn, self.conversation.id, after_id=self.conversation.summarized_through)
+
+    def _summary_message(self):
+        return {"role": "system", "content": f"Summary of the earlier conversation:\n{self.conversation.summary}"}
+
+    def context(self):
+        """The messages to send: system prompt, rolling summary and as many
+        of the newest turns as fit in the budget (the newest always goes).
+        Returns:
+            (list of chat messages, their token count)"""
+        tokens = self.system_tokens
+        head = [{"role": "system", "content": self.system_prompt}]
+        if self.conversation.summary:
+            head.append(self._summary_message())
+            tokens += self.conversation.summary_tokens
+        window = []
+        for message in reversed(self._unsummarized()):
+            if window and tokens + message.tokens > self.budget:
+                break
+            window.append(message)
+            tokens += message.tokens
+        return head + [m.as_chat() for m in reversed(window)], tokens
+
+    def compact(self, client):
+        """Fold the oldest unsummarized turns into the rolling summary once
+        they no longer fit in the budget.
+        Returns:
+            Number of messages folded into the summary"""
+        messages = self._unsummarized()
+        available = self.budget - self.system_tokens - self.conversation.summary_tokens
+        if sum(m.tokens for m in messages) <= available:
+            return 0
+        # keep roughly half the budget of recent turns word for word
+        kept = 0
+        keep = 0
+        for message in reversed(messages):
+            if keep and kept + message.tokens > available // 2:
+                break
+            kept += message.tokens
+            keep += 1
+        fold = messages[:len(messages) - keep]
+        if not fold:
+            return 0
+        try:
+            summary = self._summarize(client, fold)
+        except Exception as e:
+            print(f"⚠️ Could not summarise conversation {self.conversation.id}: {e}")
+            return 0
+        summary_tokens = count_tokens(summary)
+        with borrow_connection(self.db_path) as conn:
+            save_summary(conn, self.conversation.id, summary, summary_tokens, fold[-1].id)
+        self.conversation.summary = summary
+        self.conversation.summary_tokens = summary_tokens
+        self.conversation.summarized_through = fold[-1].id
+        return len(fold)
+
+    def _summarize(self, client, messages):
+        transcript = "\n".join(f"{m.role}: {m.content}" for m in messages)
+        response = client.chat.completions.create(
+            model=self.summary_model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": f"Current summary:\n{self.conversation.summary or '(none)'}\n\n"
+                                            f"New messages:\n{transcript}"},
+            ],
+            max_tokens=max(64, self.budget // 4),
+        )
+        return response.choices[0].message.content.strip()
+
+    def recent(self, limit=DISPLAY_LIMIT):
+        """The newest messages for display, summarized or not."""
+        with borrow_connection(self.db_path) as conn:
+            return get_messages(conn, self.conversation.id, limit=limit)
+
+    def turn_tokens(self, limit=50):
+        """Tokens sent for each of the last answers, oldest first."""
+        with borrow_connection(self.db_path) as conn:
+            return [sent for _, sent in turn_tokens(conn, self.conversation.id, limit)]
+
+    def clear(self):
+        """Forget the conversation."""
+        with borrow_connection(self.db_path) as conn:
+            clear_conversation(conn, self.conversation.id)
+        self.conversation.summary = ""
+        self.conversation.summary_tokens = 0
+        self.conversation.summarized_through = 0
@@ -1,9 +1,18 @@
 from app.data.db import connect_database
 from app.data.schema import create_all_tables
+from app.data.migrations import apply_migrations
 from app.data.db import DATA_DIR, DB_PATH
-import pandas as pd
+from app.data.ingest import stream_csv_to_table, incremental_csv_to_table, DEFAULT_CHUNK_SIZE
+from app.data.parallel_ingest import parallel_load_csvs
 from pathlib import Path
 
+# CSV files in DATA/ and the tables they load into
+CSV_SOURCES = {
+    "cyber-operations-incidents.csv": "cyber_incidents",
+    "datasets_metadata.csv": "datasets_metadata",
+    "it_tickets.csv": "it_tickets"
+}
+
 class DatabaseManager:
     """Database management service."""
     def __init__(self):
@@ -15,7 +24,13 @@ class DatabaseManager:
         Migrate users from DATA/users.txt into the users table.
         Expected file format:
             username,password_hash,role
+        Plaintext passwords, CSV files with a header and JSONL files are
+        accepted too (see app.services.user_provisioning). Users that
+        already exist are left alone.
         """
+        # imported here: user_provisioning imports AuthManager, which imports this module
+        from app.services.user_provisioning import provision_users, print_report
+
         users_file = DATA_DIR / filename
 
         if not users_file.exists():
@@ -23,61 +38,62 @@ class DatabaseManager:
             print("No users migrated.")
             return 0
 
-        cursor = conn.cursor()
-        migrated = 0
-
-        with open(users_file, "r", encoding="utf-8") as file:
-            for line in file:
-                line = line.strip()
-                if not line:
-                    continue
-
-                try:
-                    username, password_hash, role = line.split(",")
-
-                    cursor.execute(
-                        """
-                        INSERT OR IGNORE INTO users (username, password_hash, role)
-                        VALUES (?, ?, ?)
-                        """,
-                        (username.strip(), password_hash.strip(), role.strip())
-                    )
-
-                    if cursor.rowcount > 0:
-                        migrated += 1
-
-                except Exception as e:
-                    print(f"Error processing line '{line}': {e}")
-
-        conn.commit()
-        print(f"✅ Migrated {migrated} users from {users_file}")
-        return migrated
+        db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+        result = provision_users(users_file, skip_existing=True, db_path=db_path)
+        print_report(result)
+        return result.created
 
     # LOAD CSV INTO TABLE
-    def load_csv_to_table(conn, csv_path, table_name):
-
+    def load_csv_to_table(conn, csv_path, table_name, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+        """
+        Stream a CSV into table_name in chunks, upserting on the natural key
+        (id, or ticket_id for it_tickets). Safe to re-run: existing rows are
+        updated instead of duplicated.
+        With incremental=True, unchanged files are skipped and appended files
+        only have their new rows read (see ingest_state).
+        Returns:
+            Number of rows written, or False if the file does not exist
+        """
         if not Path(csv_path).exists():
             print(f"File not found: {csv_path}")
             return False
 
-        df = pd.read_csv(csv_path)
-        df.to_sql(table_name, con=conn, if_exists="append", index=False)
-        print(f"✅ Loaded {len(df)} rows from {csv_path} into table '{table_name}'.")
-        return len(df)
-
-
-    def load_all_csv_data(conn):
-        csv_map = {
-            "cyber-operations-incidents.csv": "cyber_incidents",
-            "datasets_metadata.csv": "datasets_metadata",
-            "it_tickets.csv": "it_tickets"
-        }
+        if incremental:
+            result = incremental_csv_to_table(conn, csv_path, table_name, chunk_size=chunk_size)
+            if result.mode == "unchanged":
+                print(f"⏭️ {csv_path} unchanged since last load, skipped.")
+                return 0
+        else:
+            result = stream_csv_to_table(conn, csv_path, table_name, chunk_size=chunk_size)
+        print(f"✅ Loaded {result.rows} rows from {csv_path} into table '{table_name}' "
+              f"in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s).")
+        if result.skipped:
+            print(f"⚠️ Skipped {result.skipped} malformed rows.")
+        return result.rows
+
+
+    def load_all_csv_data(conn, incremental=False, parallel=False, workers=None):
+        """
+        Load every file in CSV_SOURCES.
+        parallel=True parses the files in a process pool with this connection
+        as the single writer (full loads only; incremental loads are serial).
+        Returns:
+            Total number of rows written
+        """
+        if parallel and not incremental:
+            sources = [(DATA_DIR / file, table) for file, table in CSV_SOURCES.items()
+                       if (DATA_DIR / file).exists()]
+            results = parallel_load_csvs(conn, sources, workers=workers)
+            for result in results:
+                print(f"✅ Loaded {result.rows} rows into table '{result.table}' "
+                      f"in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s).")
+            return sum(result.rows for result in results)
 
         total_rows = 0
 
-        for file, table in csv_map.items():
+        for file, table in CSV_SOURCES.items():
             csv_path = DATA_DIR / file
-            rows = DatabaseManager.load_csv_to_table(conn, csv_path, table)
+            rows = DatabaseManager.load_csv_to_table(conn, csv_path, table, incremental=incremental)
             total_rows += rows if rows else 0
 
         return total_rows
@@ -104,6 +120,8 @@ def setup_database_complete():
     # Step 2: Create tables
     print("\n[2/5] Creating database tables...")
     create_all_tables(conn)
+    applied = apply_migrations(conn)
+    print(f"       Applied {len(applied)} schema migration(s)")
     
     # Step 3: Migrate users
     print("\n[3/5] Migrating users from users.txt...")
@@ -137,4 +155,17 @@ def setup_database_complete():
     print(f"\n Database location: {DB_PATH.resolve()}")
 
     # Run the complete setup
-    setup_database_complete()
\ No newline at end of file
+    setup_database_complete()
+
+
+def refresh_csv_data():
+    """
+    Nightly refresh: load only new or changed rows from the CSV feeds in DATA/.
+    Cost is proportional to the appended data, not the whole history.
+    """
+    conn = connect_database()
+    apply_migrations(conn)
+    total_rows = DatabaseManager.load_all_csv_data(conn, incremental=True)
+    conn.close()
+    print(f"Refreshed {total_rows} rows")
+    return total_rows
\ No newline at end of file
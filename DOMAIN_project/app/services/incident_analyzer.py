@@ -0,0 +1,109 @@
+"""AI analysis of cyber incidents, with a persistent cache.
+
+analyze_incident() looks the incident up in the ai_analyses cache
+(app/data/ai_cache.py) before calling the model. The key covers the
+incident fields sent to the model, the prompt, the model name and the
+incident id, so a repeat view of an unchanged incident returns at once and
+costs no tokens, while an edited incident is analysed afresh.
+
+The client is any OpenAI-compatible client; a local stand-in endpoint can
+be used by setting OPENAI_BASE_URL.
+"""
+import time
+from app.data.db import DB_PATH, borrow_connection
+from app.data.ai_cache import content_key, get_analysis, put_analysis, invalidate_analyses
+
+ANALYSIS_MODEL = "gpt-4.1-mini"
+SYSTEM_PROMPT = "You are a cybersecurity expert."
+ANALYSIS_PROMPT = """Analyze this cybersecurity incident:
+
+Type: {incident_type}
+Severity: {severity}
+Description: {description}
+Status: {status}
+
+Provide:
+1. Root cause analysis
+2. Immediate actions needed
+3. Long-term prevention measures
+4. Risk assessment"""
+# the incident fields the prompt uses; only these (and the id) take part in the cache key
+ANALYSIS_FIELDS = ("incident_type", "severity", "description", "status")
+
+
+class AnalysisResult:
+    """An analysis and where it came from."""
+    def __init__(self, text, from_cache, seconds, created_at=None):
+        self.text = text
+        self.from_cache = from_cache
+        self.seconds = seconds
+        self.created_at = created_at
+
+    def __str__(self):
+        source = "cache" if self.from_cache else "model"
+        return f"AnalysisResult({len(self.text)} chars from {source} in {self.seconds:.2f}s)"
+
+
+def _subject(incident):
+    return f"incident:{incident['id']}"
+
+
+def _cache_key(incident, model):
+    fields = {field: incident[field] for field in ANALYSIS_FIELDS}
+    return content_key(fields, SYSTEM_PROMPT + "\n" + ANALYSIS_PROMPT, model, _subject(incident))
+
+
+def cached_analysis(incident, model=ANALYSIS_MODEL, db_path=DB_PATH, count_hit=False):
+    """The stored analysis of an incident, or None (never calls the model).
+    Args:
+        incident: row with id and the ANALYSIS_FIELDS (dict, Series or sqlite3.Row)
+        count_hit (bool): record the hit; off for lookups made on every page render.
+    Returns:
+        AnalysisResult or None"""
+    started = time.perf_counter()
+    with borrow_connection(db_path) as conn:
+        cached = get_analysis(conn, _cache_key(incident, model), count_hit=count_hit)
+    if cached is None:
+        return None
+    return AnalysisResult(cached.analysis, True, time.perf_counter() - started, cached.created_at)
+
+
+def analyze_incident(client, incident, model=ANALYSIS_MODEL, refresh=False, db_path=DB_PATH):
+    """Analyse an incident, from the cache when possible.
+    Args:
+        client: OpenAI client.
+        incident: row with id and the ANALYSIS_FIELDS (dict, Series or sqlite3.Row)
+        model (str): chat model to use.
+        refresh (bool): ignore the stored analysis and ask the model again.
+    Returns:
+        AnalysisResult"""
+    if not refresh:
+        result = cached_analysis(incident, model, db_path, count_hit=True)
+        if result is not None:
+            return result
+
+    started = time.perf_counter()
+    # no pooled connection is held while waiting for the model
+    response = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": ANALYSIS_PROMPT.format(**{f: incident[f] for f in ANALYSIS_FIELDS})},
+        ]
+    )
+    text = response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    with borrow_connection(db_path) as conn:
+        put_analysis(
+            conn, _cache_key(incident, model), _subject(incident), model, text,
+            getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None),
+        )
+    return AnalysisResult(text, False, time.perf_counter() - started, time.time())
+
+
+def forget_incident_analyses(incident_id, db_path=DB_PATH):
+    """Drop every stored analysis of one incident.
+    Returns:
+        Number of analyses deleted"""
+    with borrow_connection(db_path) as conn:
+        return invalidate_analyses(conn, f"incident:{incident_id}")
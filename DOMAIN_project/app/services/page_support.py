@@ -0,0 +1,207 @@
+"""Shared pieces for the dashboard pages.
+
+- get_openai_client(): one OpenAI client per API key for the whole
+  server (st.cache_resource), instead of a new client on every rerun.
+- section_selector(): a horizontal radio standing in for st.tabs. Streamlit
+  runs the body of every tab on each rerun; with the selector only the
+  chosen section's code runs.
+- timed_section(): times a page section. Sections are wrapped in
+  st.fragment, so a widget inside one reruns only that section. The
+  caption shows how long this run took and roughly how much work the
+  rest of the page would have cost if it had rerun too (from the last
+  time each section ran).
+- precomputed_bundle(): the latest analytics bundle from the background
+  scheduler (app/services/analytics_scheduler.py), with its age.
+- chat_assistant(): the chat assistant of a page, with its conversation
+  kept in the database under a token budget (ConversationMemory).
+- bulk_selection() / finish_bulk_action(): the shared part of the bulk
+  action panels (pick rows on this page, or every row matching the
+  filters; report how many rows the action changed).
+"""
+import time
+from contextlib import contextmanager
+import streamlit as st
+from openai import OpenAI
+from app.services.analytics_scheduler import get_analytics_scheduler
+from app.services.conversation_memory import ConversationMemory
+
+TIMINGS_KEY = "_section_timings"
+
+
+@st.cache_resource(show_spinner=False)
+def get_openai_client(api_key):
+    """Shared OpenAI client for api_key (the client is thread-safe)."""
+    return OpenAI(api_key=api_key)
+
+
+def section_selector(sections, key):
+    """Pick which section of a page to render.
+    Returns:
+        The selected section name"""
+    return st.radio("Section", sections, horizontal=True, key=key, label_visibility="collapsed")
+
+
+@contextmanager
+def timed_section(page, name):
+    """Time the code inside the block and show it with the work skipped
+    by not rerunning the other sections of the page."""
+    placeholder = st.empty()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        sections = st.session_state.setdefault(TIMINGS_KEY, {}).setdefault(page, {})
+        stats = sections.setdefault(name, {"runs": 0, "last_ms": 0.0, "total_ms": 0.0})
+        stats["runs"] += 1
+        stats["last_ms"] = elapsed_ms
+        stats["total_ms"] += elapsed_ms
+        skipped_ms = sum(s["last_ms"] for other, s in sections.items() if other != name)
+        placeholder.caption(
+            f"⏱️ {name}: {elapsed_ms:.0f} ms"
+            + (f" · ~{skipped_ms:.0f} ms of other sections not rerun" if skipped_ms else "")
+        )
+
+
+def section_timings(page):
+    """Runs and timings of every section of a page in this session.
+    Returns:
+        List of (section, runs, last_ms, mean_ms)"""
+    sections = st.session_state.get(TIMINGS_KEY, {}).get(page, {})
+    return [
+        (name, s["runs"], round(s["last_ms"], 1), round(s["total_ms"] / s["runs"], 1))
+        for name, s in sections.items()
+    ]
+
+
+def precomputed_bundle(name):
+    """Latest result of the analytics job `name`, with a caption saying
+    when it was computed. The page doesn't run the queries itself."""
+    scheduler = get_analytics_scheduler()
+    bundle = scheduler.latest(name)
+    status = scheduler.status(name)
+    st.caption(
+        f"🕒 Precomputed {status.age:.0f}s ago in {status.seconds * 1000:.0f} ms"
+        + (" · refreshing after recent changes" if status.stale else "")
+    )
+    return bundle
+
+
+def scheduler_status():
+    """Runs, last duration and age of every analytics job."""
+    return get_analytics_scheduler().status_rows()
+
+
+def bulk_selection(key, noun, page_ids, filters, count_matching, id_arg):
+    """Let the user choose the rows a bulk action applies to: rows picked
+    from the current page, or every row matching the listing filters.
+    Args:
+        key: widget key prefix, e.g. "incident"
+        noun: plural shown to the user, e.g. "incidents"
+        page_ids: ids of the rows on the current page
+        filters: dict of filter name -> value (None when not filtering)
+        count_matching: function(**filters) returning the number of matches
+        id_arg: name of the model's id-list argument, e.g. "incident_ids"
+    Returns:
+        (keyword arguments for the model's bulk method or None, number of rows)"""
+    message = st.session_state.pop(f"{key}_bulk_message", None)
+    if message:
+        st.success(message)
+    scope = st.radio("Apply to", ["Selected", "All matching the filters"], horizontal=True,
+                     key=f"{key}_bulk_scope")
+    if scope == "Selected":
+        selected = st.multiselect(f"Select {noun} on this page", page_ids, key=f"{key}_bulk_ids")
+        return {id_arg: selected}, len(selected)
+    active = {name: value for name, value in filters.items() if value is not None}
+    if not active:
+        st.caption(f"Choose at least one filter above to act on all matching {noun}.")
+        return None, 0
+    return active, count_matching(**active)
+
+
+def finish_bulk_action(key, message):
+    """Keep the result message for the next run, clear the selection and
+    rerun the section."""
+    st.session_state[f"{key}_bulk_message"] = message
+    for widget in ("ids", "confirm"):
+        st.session_state.pop(f"{key}_bulk_{widget}", None)
+    st.rerun(scope="fragment")
+
+
+def chat_assistant(assistant, title, system_prompt, owner):
+    """A page's chat assistant. The conversation is stored per user and
+    assistant, and each request sends at most the memory's token budget.
+    Not usable inside a fragment (it writes to the sidebar and uses st.chat_input)."""
+    #	Initialize	OpenAI	client
+    api_key = st.text_input("Your OpenAI API key", type="password")
+    # Get user input
+    prompt = st.chat_input("Enter your message here...")
+
+    if not api_key:
+        st.info("Enter your OpenAI API key to start chatting.")
+        return
+    client = get_openai_client(api_key)
+
+    # Page title
+    st.title(title)
+    st.caption("Powered by GPT-4.1-mini")
+
+    memory = ConversationMemory(owner, assistant, system_prompt)
+    messages = memory.recent()
+    turns = memory.turn_tokens()
+
+    # Sidebar with controls
+    with st.sidebar:
+        st.subheader("Chat controls")
+        st.metric("Messages", len(messages))
+        st.metric("Tokens sent last turn", turns[-1] if turns else 0,
+                  help=f"Each request is kept under {memory.budget} tokens")
+        if turns:
+            st.caption("Tokens sent per turn")
+            st.line_chart(turns, height=150)
+
+        # Clear chat button
+        if st.button("🗑 Clear	Chat", use_container_width=True):
+            memory.clear()
+            st.rerun()
+
+    # Display previous messages (older turns reach the model as a summary)
+    if memory.conversation.summary:
+        st.caption("🗂️ Earlier turns are sent to the assistant as a summary.")
+    for message in messages:
+        with st.chat_message(message.role):
+            st.markdown(message.content)
+
+    if prompt:
+        #	Display	user	message
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        memory.add("user", prompt)
+
+        # Call OpenAI API (with streaming) with the budgeted context
+        with st.spinner("Thinking..."):
+            memory.compact(client)
+            request, estimated_tokens = memory.context()
+            completion = client.chat.completions.create(
+                model="gpt-4.1-mini",
+                messages=request,
+                stream=True,  # response appears word by word
+                stream_options={"include_usage": True},  # the last chunk reports the tokens used
+            )
+
+        # Display streaming response
+        with st.chat_message("assistant"):
+            container = st.empty()
+            full_reply = ""
+            usage = None
+            for chunk in completion:
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    full_reply += chunk.choices[0].delta.content
+                    container.markdown(full_reply + "▌")
+            container.markdown(full_reply)
+
+        sent_tokens = usage.prompt_tokens if usage else estimated_tokens
+        memory.add("assistant", full_reply, sent_tokens=sent_tokens)
+        st.caption(f"🧮 {sent_tokens} tokens sent this turn (budget {memory.budget})")
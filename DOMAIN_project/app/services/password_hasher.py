@@ -0,0 +1,97 @@
+"""bcrypt hashing and verification on a bounded worker pool.
+
+Every hash and check runs on a small shared thread pool instead of the
+caller's thread (bcrypt releases the GIL while it works). At most
+`workers` hashes use the CPU at once, however many sessions log in
+together, and at most `max_pending` are running or waiting. A request
+that finds no free slot within `timeout` seconds raises HasherBusy instead
+of piling up.
+
+The cost factor comes from the BCRYPT_ROUNDS environment variable
+(default 12). needs_rehash() reports hashes made with a different cost,
+so AuthManager can upgrade them on the next successful login.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.environ.get("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+class HasherBusy(RuntimeError):
+    """Raised when too many hashes are already queued."""
+
+
+class PasswordHasher:
+    """bcrypt on a bounded ThreadPoolExecutor."""
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=HASH_WORKERS, max_pending=None, timeout=5.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # running + queued jobs
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 8)
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy("Too many logins in progress, please try again.")
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    @staticmethod
+    def _hash(password, rounds):
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+    @staticmethod
+    def _verify(password, stored_hash):
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+        except ValueError:  # malformed stored hash
+            return False
+
+    def hash_async(self, password, rounds=None):
+        """Start hashing password; returns a Future of the hash string."""
+        return self._submit(self._hash, password, rounds or self.rounds)
+
+    def hash(self, password, rounds=None):
+        """Hash password at the configured cost (waits for a worker)."""
+        return self.hash_async(password, rounds).result()
+
+    def verify_async(self, password, stored_hash):
+        """Start checking password against stored_hash; returns a Future of bool."""
+        return self._submit(self._verify, password, stored_hash)
+
+    def verify(self, password, stored_hash):
+        """Check password against stored_hash (waits for a worker)."""
+        return self.verify_async(password, stored_hash).result()
+
+    def needs_rehash(self, stored_hash):
+        """True if stored_hash was made with a different cost than the current one."""
+        try:
+            return int(stored_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    """Return the shared PasswordHasher, creating it on first use."""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+        return _hasher
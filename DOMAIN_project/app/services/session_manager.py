@@ -0,0 +1,134 @@
+"""Signed session tokens with a server-side session store.
+
+A token is "<payload>.<signature>". The payload is the base64url JSON
+{sid, username, role, exp}, and the signature is HMAC-SHA256 over it with
+SESSION_SECRET. A session is valid while its token verifies, it has not
+expired, and its sid is still in the store. Revoking a session removes it
+from the store, which makes the token useless even before it expires.
+
+validate() is an HMAC check and a dict lookup. Dashboard guards call it
+on every rerun without touching the users table.
+
+SESSION_SECRET should be set in production. Without it a random secret is
+generated per process, so sessions don't survive a restart (neither does
+the in-memory store).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", str(8 * 60 * 60)))
+MAX_SESSIONS = 10_000
+
+
+class Session:
+    """An active login."""
+    def __init__(self, sid, username, role, expires_at):
+        self.sid = sid
+        self.username = username
+        self.role = role
+        self.expires_at = expires_at
+
+    def __str__(self):
+        return f"Session(username={self.username}, role={self.role}, expires_at={self.expires_at:.0f})"
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionManager:
+    """Issues, validates and revokes session tokens."""
+
+    def __init__(self, secret=None, ttl=SESSION_TTL_SECONDS, max_sessions=MAX_SESSIONS):
+        secret = secret or os.environ.get("SESSION_SECRET")
+        self._secret = secret.encode("utf-8") if isinstance(secret, str) else (secret or secrets.token_bytes(32))
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # sid -> Session, oldest first
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64encode(hmac.new(self._secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+    def create_session(self, username, role):
+        """Start a session for an authenticated user.
+        Returns:
+            The token to keep in st.session_state"""
+        session = Session(secrets.token_urlsafe(16), username, role, time.time() + self.ttl)
+        payload = _b64encode(json.dumps({
+            "sid": session.sid, "username": username, "role": role, "exp": int(session.expires_at),
+        }).encode("utf-8"))
+        with self._lock:
+            self._sessions[session.sid] = session
+            self._purge()
+        return f"{payload}.{self._sign(payload)}"
+
+    def validate(self, token):
+        """Return the Session a token belongs to, or None if the token is
+        missing, forged, expired or revoked."""
+        if not token or token.count(".") != 1:
+            return None
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            sid = json.loads(_b64decode(payload))["sid"]
+        except (ValueError, KeyError):
+            return None
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                return None
+            if session.expires_at <= time.time():
+                del self._sessions[sid]
+                return None
+            return session
+
+    def revoke(self, token):
+        """End the session a token belongs to (logout)."""
+        session = self.validate(token)
+        if session is not None:
+            with self._lock:
+                self._sessions.pop(session.sid, None)
+
+    def revoke_user(self, username):
+        """End every session of a user, e.g. after a password change."""
+        with self._lock:
+            for sid in [sid for sid, s in self._sessions.items() if s.username == username]:
+                del self._sessions[sid]
+
+    def _purge(self):
+        """Drop expired sessions, then the oldest ones beyond max_sessions."""
+        now = time.time()
+        for sid in [sid for sid, s in self._sessions.items() if s.expires_at <= now]:
+            del self._sessions[sid]
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def active_sessions(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_session_manager():
+    """Return the shared SessionManager, creating it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SessionManager()
+        return _manager
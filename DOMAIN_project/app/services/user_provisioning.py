@@ -0,0 +1,241 @@
+"""Bulk user provisioning from CSV or JSONL files.
+
+Accepted input:
+- CSV with a header: username, password or password_hash, role
+- CSV without a header: username,<password or bcrypt hash>,role
+  (the users.txt format; a bcrypt hash is recognised by its $2b$ prefix)
+- JSONL: one {"username": ..., "password" or "password_hash": ..., "role": ...}
+  object per line
+
+Every row is checked with AuthManager.validate_username and
+validate_password (for plaintext), its role must be one of ROLES, and
+usernames must be new. Plaintext passwords are hashed in parallel on a
+process pool at BCRYPT_ROUNDS. The valid rows are then inserted with one
+executemany in one transaction. Rows that fail are reported with their
+line number and never stop the rest of the file.
+
+Usage (from DOMAIN_project/):
+    python -m app.services.user_provisioning new_staff.csv [--workers 8] [--dry-run]
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import bcrypt
+from app.data.db import DB_PATH, borrow_connection
+from app.data.users import invalidate_users
+from app.services.auth_manager import AuthManager
+from app.services.password_hasher import BCRYPT_ROUNDS
+
+ROLES = ("user", "admin", "analyst")
+BCRYPT_HASH = re.compile(r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$")
+HASH_CHUNK_SIZE = 16
+
+
+class ProvisionResult:
+    """Outcome of one provisioning run.
+    valid counts rows that passed validation and don't exist yet;
+    errors is a list of (line number, username, message)."""
+    def __init__(self, valid=0, created=0, skipped=0, errors=None, hashed=0, seconds=0.0):
+        self.valid = valid
+        self.created = created
+        self.skipped = skipped
+        self.errors = errors or []
+        self.hashed = hashed
+        self.seconds = seconds
+
+    def __str__(self):
+        return f"ProvisionResult(valid={self.valid}, created={self.created}, skipped={self.skipped}, errors={len(self.errors)}, hashed={self.hashed}, seconds={self.seconds:.2f})"
+
+
+def _row(line_no, username, secret, role, secret_is_hash=None):
+    secret = (secret or "").strip()
+    if secret_is_hash is None:
+        secret_is_hash = bool(BCRYPT_HASH.match(secret))
+    return {
+        "line": line_no,
+        "username": (username or "").strip(),
+        "password": None if secret_is_hash else secret,
+        "password_hash": secret if secret_is_hash else None,
+        "role": (role or "user").strip() or "user",
+    }
+
+
+def read_user_file(path):
+    """Yield one dict per user in a CSV or JSONL file (see module docstring).
+    Rows that can't be parsed are yielded with an 'error' key."""
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line_no, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    is_hash = "password_hash" in record
+                    yield _row(line_no, record.get("username"),
+                               record.get("password_hash" if is_hash else "password"),
+                               record.get("role"), is_hash)
+                except (ValueError, AttributeError) as e:
+                    yield {"line": line_no, "username": "", "error": f"Invalid JSON: {e}"}
+            return
+
+        reader = csv.reader(file)
+        header = None
+        for record in reader:
+            line_no = reader.line_num
+            if not record or not any(field.strip() for field in record):
+                continue
+            if header is None and line_no == 1 and record[0].strip().lower() == "username":
+                header = [field.strip().lower() for field in record]
+                continue
+            if header:
+                values = dict(zip(header, record))
+                is_hash = "password_hash" in values
+                yield _row(line_no, values.get("username"),
+                           values.get("password_hash" if is_hash else "password"),
+                           values.get("role"), is_hash)
+            elif len(record) in (2, 3):
+                yield _row(line_no, *record)
+            else:
+                yield {"line": line_no, "username": record[0].strip(),
+                       "error": f"Expected username,password,role; got {len(record)} fields"}
+
+
+def validate_row(row):
+    """Error message for a row, or None if it can be provisioned."""
+    if "error" in row:
+        return row["error"]
+    ok, message = AuthManager.validate_username(row["username"])
+    if not ok:
+        return message
+    if row["role"] not in ROLES:
+        return f"Unknown role '{row['role']}'; use one of {', '.join(ROLES)}."
+    if row["password_hash"] is not None:
+        return None if BCRYPT_HASH.match(row["password_hash"]) else "password_hash is not a bcrypt hash."
+    ok, message = AuthManager.validate_password(row["password"])
+    return None if ok else message
+
+
+def _hash_password(args):
+    """Process-pool worker: bcrypt one password."""
+    password, rounds = args
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _existing_usernames(conn, usernames):
+    existing = set()
+    usernames = list(usernames)
+    for start in range(0, len(usernames), 500):
+        batch = usernames[start:start + 500]
+        placeholders = ", ".join("?" * len(batch))
+        existing.update(r[0] for r in conn.execute(
+            f"SELECT username FROM users WHERE username IN ({placeholders})", batch
+        ))
+    return existing
+
+
+def provision_users(path, workers=None, rounds=BCRYPT_ROUNDS, skip_existing=False,
+                    dry_run=False, db_path=DB_PATH):
+    """Create the users listed in a CSV or JSONL file.
+    Args:
+        path: the user file.
+        workers (int): hashing processes (default: one per CPU).
+        rounds (int): bcrypt cost for plaintext passwords.
+        skip_existing (bool): count usernames that already exist as skipped
+            instead of as errors.
+        dry_run (bool): validate and report without hashing or inserting.
+        db_path: database to write to.
+    Returns:
+        ProvisionResult"""
+    started = time.perf_counter()
+    result = ProvisionResult()
+
+    # 1. parse and validate every row, including duplicates within the file
+    valid = []
+    seen = set()
+    for row in read_user_file(path):
+        error = validate_row(row)
+        if error is None and row["username"] in seen:
+            error = "Duplicate username in file."
+        if error:
+            result.errors.append((row["line"], row["username"], error))
+            continue
+        seen.add(row["username"])
+        valid.append(row)
+
+    # 2. drop users that already exist (one lookup per 500 names, before any hashing)
+    with borrow_connection(db_path) as conn:
+        existing = _existing_usernames(conn, seen)
+    if existing:
+        for row in valid:
+            if row["username"] in existing:
+                if skip_existing:
+                    result.skipped += 1
+                else:
+                    result.errors.append((row["line"], row["username"], "Username already exists."))
+        valid = [row for row in valid if row["username"] not in existing]
+    result.valid = len(valid)
+
+    if dry_run:
+        result.seconds = time.perf_counter() - started
+        return result
+
+    # 3. hash plaintext passwords in parallel
+    to_hash = [row for row in valid if row["password_hash"] is None]
+    if to_hash:
+        workers = min(workers or os.cpu_count() or 1, len(to_hash))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hashes = pool.map(_hash_password, [(row["password"], rounds) for row in to_hash],
+                              chunksize=HASH_CHUNK_SIZE)
+            for row, password_hash in zip(to_hash, hashes):
+                row["password_hash"] = password_hash
+        result.hashed = len(to_hash)
+
+    # 4. insert everything in one transaction
+    if valid:
+        with borrow_connection(db_path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                [(row["username"], row["password_hash"], row["role"]) for row in valid]
+            )
+            result.created = conn.total_changes - before
+        # rows created by someone else since the existence check
+        result.skipped += len(valid) - result.created
+        invalidate_users()
+
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def print_report(result, dry_run=False):
+    if dry_run:
+        print(f"🔎 Dry run: {result.valid} users would be created; "
+              f"{result.skipped} skipped, {len(result.errors)} errors")
+    else:
+        print(f"✅ Created {result.created} users ({result.hashed} passwords hashed) "
+              f"in {result.seconds:.2f}s; {result.skipped} skipped, {len(result.errors)} errors")
+    for line, username, message in result.errors:
+        print(f"   line {line} ({username or '?'}): {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create users in bulk from a CSV or JSONL file.")
+    parser.add_argument("path", help="user file (.csv, .txt or .jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes")
+    parser.add_argument("--rounds", type=int, default=BCRYPT_ROUNDS, help="bcrypt cost factor")
+    parser.add_argument("--skip-existing", action="store_true", help="don't report existing usernames as errors")
+    parser.add_argument("--dry-run", action="store_true", help="validate only")
+    args = parser.parse_args()
+    result = provision_users(args.path, args.workers, args.rounds, args.skip_existing, args.dry_run)
+    print_report(result, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
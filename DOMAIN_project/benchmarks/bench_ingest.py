@@ -0,0 +1,85 @@
+"""Benchmark: serial vs parallel CSV ingest.
+
+Builds synthetic copies of the three CSV feeds in a temp directory, loads
+them into fresh databases with the serial path (stream_csv_to_table, one
+file after another) and the parallel pipeline (parallel_load_csvs), and
+prints the timings.
+
+Usage (from DOMAIN_project/):
+    python benchmarks/bench_ingest.py --rows 200000 --workers 4
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# project root to python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.data.db import DATA_DIR, connect_database
+from app.data.migrations import apply_migrations
+from app.data.ingest import stream_csv_to_table
+from app.data.parallel_ingest import parallel_load_csvs
+from app.services.database_manager import CSV_SOURCES
+
+
+def make_csv(template, target, rows):
+    """Write `rows` data rows to target by cycling template's rows with fresh ids."""
+    lines = template.read_text(encoding="utf-8").splitlines()
+    header, body = lines[0], lines[1:]
+    with open(target, "w", encoding="utf-8", newline="") as file:
+        file.write(header + "\n")
+        for i in range(rows):
+            fields = body[i % len(body)].split(",")
+            fields[0] = str(i + 1)
+            if fields[1].startswith("TCK-"):
+                fields[1] = f"TCK-{i + 1}"
+            file.write(",".join(fields) + "\n")
+
+
+def fresh_database(path):
+    conn = connect_database(path)
+    apply_migrations(conn)
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000, help="rows per CSV file")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        sources = []
+        for file, table in CSV_SOURCES.items():
+            target = tmp / file
+            make_csv(DATA_DIR / file, target, args.rows)
+            sources.append((target, table))
+        total = args.rows * len(sources)
+        print(f"{len(sources)} files x {args.rows:,} rows")
+
+        conn = fresh_database(tmp / "serial.db")
+        started = time.perf_counter()
+        for csv_path, table in sources:
+            stream_csv_to_table(conn, csv_path, table, progress=None)
+        serial = time.perf_counter() - started
+        conn.close()
+
+        conn = fresh_database(tmp / "parallel.db")
+        started = time.perf_counter()
+        parallel_load_csvs(conn, sources, workers=args.workers, range_bytes=2 * 1024 * 1024,
+                           progress=None)
+        parallel = time.perf_counter() - started
+        conn.close()
+
+    print(f"{'Path':<10} {'Seconds':>10} {'Rows/s':>12}")
+    print("-" * 34)
+    print(f"{'serial':<10} {serial:>10.2f} {total / serial:>12,.0f}")
+    print(f"{'parallel':<10} {parallel:>10.2f} {total / parallel:>12,.0f}")
+    print(f"Speed-up: {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark: concurrent logins, inline bcrypt vs the bounded hasher pool.
+
+Simulates a login storm: --sessions threads (one per Streamlit session)
+each verify --logins passwords. The inline path calls bcrypt.checkpw in
+the session thread, as AuthManager used to; the pooled path goes through
+PasswordHasher. Prints throughput and per-login latency for both.
+
+Usage (from DOMAIN_project/):
+    python benchmarks/bench_login.py --sessions 32 --logins 4 --rounds 12 --workers 4
+"""
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# project root to python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import bcrypt
+from app.services.password_hasher import PasswordHasher
+
+PASSWORD = "SecurePass123!"
+
+
+def run_storm(sessions, logins, check):
+    """Run sessions x logins checks concurrently.
+    Returns:
+        (seconds, list of per-login latencies)"""
+    def session(_):
+        latencies = []
+        for _ in range(logins):
+            started = time.perf_counter()
+            assert check()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        latencies = [l for result in pool.map(session, range(sessions)) for l in result]
+    return time.perf_counter() - started, latencies
+
+
+def report(name, seconds, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(f"{name:<8} {seconds:>9.2f} {len(latencies) / seconds:>10.1f} "
+          f"{statistics.median(ordered) * 1000:>9.0f} {p95 * 1000:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=32, help="concurrent sessions")
+    parser.add_argument("--logins", type=int, default=4, help="logins per session")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=None, help="hasher pool size")
+    args = parser.parse_args()
+
+    stored = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(args.rounds))
+    hasher = PasswordHasher(rounds=args.rounds, max_pending=args.sessions,
+                            timeout=600, **({"workers": args.workers} if args.workers else {}))
+    print(f"{args.sessions} sessions x {args.logins} logins, cost {args.rounds}, "
+          f"{hasher.workers} hasher workers")
+
+    print(f"{'Path':<8} {'Seconds':>9} {'Logins/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    print("-" * 49)
+    report("inline", *run_storm(args.sessions, args.logins,
+                                lambda: bcrypt.checkpw(PASSWORD.encode("utf-8"), stored)))
+    report("pooled", *run_storm(args.sessions, args.logins,
+                                lambda: hasher.verify(PASSWORD, stored.decode("utf-8"))))
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
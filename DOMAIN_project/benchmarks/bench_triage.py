@@ -0,0 +1,104 @@
+"""Benchmark: batch AI triage, serial vs concurrent, against a local mock endpoint.
+
+Starts an OpenAI-compatible mock server on localhost that answers every
+chat completion with a valid triage after --latency seconds, and rejects
+every --rate-limit-every'th request with a 429 (Retry-After: 1). Then
+triages the same incidents on a temporary copy of the database, once with
+concurrency 1 (one request after another, as the analyzer page works
+today) and once with --concurrency requests in flight.
+
+Usage (from DOMAIN_project/):
+    python benchmarks/bench_triage.py --incidents 200 --latency 0.5 --concurrency 32
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# project root to python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.data.db import DB_PATH
+from app.services.batch_triage import triage_backlog
+
+
+def make_handler(latency, rate_limit_every):
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class MockCompletions(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body, headers=()):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                counter["requests"] += 1
+                number = counter["requests"]
+            if rate_limit_every and number % rate_limit_every == 0:
+                self._reply(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                            [("Retry-After", "1")])
+                return
+            time.sleep(latency)
+            answer = {"priority": "high", "summary": "Contain the affected host.",
+                      "actions": ["Isolate the host", "Reset credentials"]}
+            self._reply(200, {
+                "id": f"chatcmpl-{number}", "object": "chat.completion", "created": int(time.time()),
+                "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": json.dumps(answer)}}],
+                "usage": {"prompt_tokens": 120, "completion_tokens": 40, "total_tokens": 160},
+            })
+
+    return MockCompletions
+
+
+def run(db_path, base_url, incidents, concurrency):
+    report = triage_backlog("mock-key", status=None, severity=None, limit=incidents,
+                            concurrency=concurrency, skip_unchanged=False,
+                            base_url=base_url, db_path=db_path)
+    print(f"{concurrency:>11} {report.seconds:>9.2f} {report.triaged / report.seconds:>12.1f} "
+          f"{report.requests:>9} {len(report.errors):>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--incidents", type=int, default=200, help="incidents to triage")
+    parser.add_argument("--latency", type=float, default=0.5, help="mock response time in seconds")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight for the concurrent run")
+    parser.add_argument("--rate-limit-every", type=int, default=50, help="answer every Nth request with 429 (0: never)")
+    parser.add_argument("--serial-incidents", type=int, default=10, help="incidents for the serial run")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency, args.rate_limit_every))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        shutil.copy(DB_PATH, db_path)
+        print(f"mock latency {args.latency}s, 429 every {args.rate_limit_every} requests")
+        print(f"{'Concurrency':>11} {'Seconds':>9} {'Incidents/s':>12} {'Requests':>9} {'Failed':>7}")
+        print("-" * 52)
+        run(db_path, base_url, args.serial_incidents, 1)
+        run(db_path, base_url, args.incidents, args.concurrency)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
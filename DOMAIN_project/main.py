@@ -1,5 +1,6 @@
 from app.data.db import connect_database
 from app.data.schema import create_all_tables
+from app.data.migrations import apply_migrations
 from app.services.auth_manager import register_user, login_user
 from app.services.database_manager import DatabaseManager
 from app.data.incidents import Incident
@@ -12,6 +13,7 @@ def main():
     # 1. Setup database
     conn = connect_database()
     create_all_tables(conn)
+    apply_migrations(conn)
 
     
     # 2. Migrate users
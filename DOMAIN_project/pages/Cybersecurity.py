@@ -1,8 +1,13 @@
 import streamlit as st
-from app.data.db import connect_database
-from app.data.incidents import Incident
+from app.services.auth_manager import AuthManager
+from app.services.page_support import (get_openai_client, section_selector, timed_section, section_timings,
+                                       bulk_selection, finish_bulk_action, precomputed_bundle, scheduler_status)
+from app.services.incident_analyzer import analyze_incident, cached_analysis
+from app.services.batch_triage import triage_backlog, TRIAGE_CONCURRENCY
+from app.data.triage import PRIORITIES
+from app.data.db import borrow_connection
+from app.data.incidents import Incident, INCIDENT_SORT_COLUMNS
 import datetime
-from openai import OpenAI
 
 st.set_page_config(
     page_title="Cyber Incidents Dashboard",
@@ -16,8 +21,11 @@ if "logged_in" not in st.session_state:
 if "username" not in st.session_state:
     st.session_state.username = ""
 
-# Guard: if not logged in, send user back
-if not st.session_state.logged_in:
+# Guard: if the session token is missing, expired or revoked, send user back
+# (an HMAC check and a dict lookup; no database access)
+session = AuthManager.current_session(st.session_state.get("session_token"))
+st.session_state.logged_in = session is not None
+if not session:
      st.error("You must be logged in to view the dashboard.")
      if st.button("Go to login page"):
         st.switch_page("Home.py") # back to the first page
@@ -25,17 +33,115 @@ if not st.session_state.logged_in:
 
 # If logged in, show dashboard content
 st.title("👾 Cyber Incidents Dashboard")
-st.success(f"Hello, **{st.session_state.username}**!")
+st.success(f"Hello, **{session.username}**!")
 
-incident_tab, analytics_tab, AI_tab = st.tabs(["Incidents", "Analytics", "AI Incident Analyzer"])
+PAGE = "cybersecurity"
 
-with incident_tab:
-    conn = connect_database('DATA/intelligence_platform.db')
+# Only the selected section runs (st.tabs would run all three on every rerun).
+# Each section is a fragment: its widgets rerun just that section.
+section = section_selector(["Incidents", "Analytics", "AI Incident Analyzer", "AI Batch Triage"], key="cyber_section")
 
-    # Read and display the database as a table
-    incidents = Incident.get_all_incidents()
+
+@st.fragment
+def incident_search():
+    with timed_section(PAGE, "Search"), borrow_connection() as conn:
+        # Full-text search over incident descriptions
+        search_text = st.text_input("🔍 Search incident descriptions", placeholder="e.g. suspicious login")
+        if search_text.strip():
+            hits = Incident.search_incidents(conn, search_text, limit=20)
+            st.caption(f"{len(hits)} best matches")
+            st.dataframe(hits, use_container_width=True)
+
+
+@st.fragment
+def incident_listing():
+    with timed_section(PAGE, "Incidents"), borrow_connection() as conn:
+        incident_table(conn)
+
+
+def incident_table(conn):
+    # Filters and sorting run in SQL; only one page of incidents is loaded
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    with filter_col1:
+        status_filter = st.selectbox("Status filter", ["all", "open", "in progress", "investigating", "resolved", "closed"])
+    with filter_col2:
+        severity_filter = st.selectbox("Severity filter", ["all", "low", "medium", "high", "critical"])
+    with filter_col3:
+        type_filter = st.selectbox("Type filter", ["all", "data_breach", "phishing", "ddos", "malware", "unauthorized_access", "ransomware"])
+    with filter_col4:
+        date_range = st.date_input("Date range", value=(), max_value=datetime.date.today())
+
+    sort_col1, sort_col2, sort_col3 = st.columns(3)
+    with sort_col1:
+        sort_by = st.selectbox("Sort by", INCIDENT_SORT_COLUMNS)
+    with sort_col2:
+        descending = st.toggle("Newest / highest first", value=True)
+    with sort_col3:
+        page_size = st.selectbox("Rows per page", [25, 50, 100], index=1)
+
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+    view = (status_filter, severity_filter, type_filter, start_date, end_date, sort_by, descending, page_size)
+
+    # Go back to the first page whenever the filters change
+    if st.session_state.get("incident_view") != view:
+        st.session_state.incident_view = view
+        st.session_state.incident_cursors = [None]
+    cursors = st.session_state.incident_cursors
+
+    filters = {
+        "status": None if status_filter == "all" else status_filter,
+        "severity": None if severity_filter == "all" else severity_filter,
+        "incident_type": None if type_filter == "all" else type_filter,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    page = Incident.list_incidents(
+        conn,
+        page_size=page_size,
+        cursor=cursors[-1],
+        sort_by=sort_by,
+        descending=descending,
+        **filters,
+    )
+    incidents = page.rows
+    # the AI section analyses incidents from the page shown here
+    st.session_state.incident_page_rows = incidents
     st.dataframe(incidents, use_container_width=True)
 
+    # Page controls
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("◀ Previous", disabled=len(cursors) == 1, key="incidents_prev"):
+            cursors.pop()
+            st.rerun(scope="fragment")
+    with page_col:
+        st.caption(f"Page {len(cursors)}")
+    with next_col:
+        if st.button("Next ▶", disabled=not page.has_more, key="incidents_next"):
+            cursors.append(page.next_cursor)
+            st.rerun(scope="fragment")
+
+    # Bulk actions: change or delete many incidents in one transaction
+    with st.expander("Bulk actions"):
+        target, count = bulk_selection(
+            "incident", "incidents", incidents["id"].tolist(), filters,
+            lambda **f: Incident.count_incidents(conn, **f), "incident_ids",
+        )
+        st.caption(f"{count} incidents selected")
+        bulk_col1, bulk_col2 = st.columns(2)
+        with bulk_col1:
+            bulk_status = st.selectbox("New status", ["open", "in progress", "investigating", "resolved", "closed"],
+                                       key="incident_bulk_status")
+            if st.button("Set status", disabled=not count, key="incident_bulk_update"):
+                changed = Incident.bulk_update_status(conn, bulk_status, **target)
+                finish_bulk_action("incident", f"Status set to '{bulk_status}' on {changed} incidents "
+                                               f"({count - changed} already had it).")
+        with bulk_col2:
+            confirm = st.checkbox(f"Yes, delete {count} incidents", key="incident_bulk_confirm")
+            if st.button("Delete selected", type="primary", disabled=not (count and confirm), key="incident_bulk_delete"):
+                deleted = Incident.bulk_delete_incidents(conn, **target)
+                finish_bulk_action("incident", f"Deleted {deleted} incidents.")
+
     # Add new incidents to the database with a form
     with st.form("new_incident"):
         # Form inputs
@@ -57,7 +163,7 @@ with incident_tab:
     if submitted:
         if incident_date and description and severity and status and incident_type and reported_by:  # Check all required fields
             Incident(
-                date=incident_date.strftime("%m/%d/%Y"), 
+                date=incident_date, 
                 severity=severity, 
                 incident_type=incident_type, 
                 status=status, 
@@ -65,7 +171,7 @@ with incident_tab:
                 reported_by=reported_by
             ).insert_incident()
             st.success("New incident added.")
-            st.rerun()
+            st.rerun(scope="fragment")
         else:
             st.error("You must fill in all the fields")
 
@@ -80,7 +186,8 @@ with incident_tab:
     if update_button:
         if incident_id:
             Incident.update_incident_status(incident_id, new_status)
-            st.rerun()
+            # only this section shows incident rows; analytics reload when opened
+            st.rerun(scope="fragment")
         else:
             st.error("You must select an Incident ID.")
 
@@ -97,99 +204,174 @@ with incident_tab:
         if st.button("Delete", type="primary"):
             Incident.delete_incident(selected_id)
             st.success("Incident deleted.")
-            st.rerun()
+            st.rerun(scope="fragment")
 
-with analytics_tab:
-    total, open_count, critical, phishing_total = Incident.compute_incident_metrics(conn)
-    col1, col2, col3 = st.columns(3)
 
-    with col1:
-        st.metric("Total Incidents", total)
+@st.fragment
+def incident_analytics():
+    with timed_section(PAGE, "Analytics"):
+        # Precomputed in the background (one snapshot of the database); no queries run here
+        bundle = precomputed_bundle("cybersecurity_analytics")
+        total, open_count, critical, phishing_total = bundle.metrics
+        col1, col2, col3 = st.columns(3)
 
-    with col2:
-        st.metric("Open Incidents", open_count)
+        with col1:
+            st.metric("Total Incidents", total)
 
-    with col3:
-        st.metric("Critical Incidents", critical)
+        with col2:
+            st.metric("Open Incidents", open_count)
 
+        with col3:
+            st.metric("Critical Incidents", critical)
 
-    st.subheader("Attack Types Overview")
-    cyber_attacks =Incident.get_incidents_by_type_count(conn)
-    st.bar_chart(
-        cyber_attacks,
-        x="incident_type",
-        y="count",
-    )
 
-    st.subheader("Time Series Analysis of Phishing Attacks")
-    df_trends = Incident.get_daily_phishing_count(conn)
-    st.line_chart(df_trends, x="date", y="count")
+        st.subheader("Attack Types Overview")
+        cyber_attacks = bundle.by_type
+        st.bar_chart(
+            cyber_attacks,
+            x="incident_type",
+            y="count",
+        )
+
+        st.subheader("Time Series Analysis of Phishing Attacks")
+        df_trends = bundle.phishing_trend
+        st.line_chart(df_trends, x="date", y="count")
+
+        # Instrumentation: how long the last precompute's queries took
+        with st.expander("Query timings"):
+            st.dataframe(bundle.timing_frame(), use_container_width=True)
 
-with AI_tab:
-    #	Initialize	OpenAI	client
-    api_key = st.text_input("Your OpenAI API key", type="password")
+        with st.expander("Background refresh jobs"):
+            st.dataframe(scheduler_status(), use_container_width=True)
 
-    client = OpenAI(api_key=api_key)
+        with st.expander("Section timings this session"):
+            st.dataframe(section_timings(PAGE), use_container_width=True)
 
-    st.title("🔍 AI Incident Analyzer")
 
-    #Fetch incident from database
-    incidents = Incident.get_all_incidents()
+@st.fragment
+def incident_ai():
+    with timed_section(PAGE, "AI Incident Analyzer"):
+        #	Initialize	OpenAI	client (shared across reruns and sessions)
+        api_key = st.text_input("Your OpenAI API key", type="password")
 
-    if not incidents.empty:
-        # Let user select an incident
-        incident_options = [
-            f"{inc['id']}: {inc['incident_type']} - {inc['severity']}"for _, row in incidents.iterrows() for inc in [row.to_dict()]
-        ]
+        client = get_openai_client(api_key) if api_key else None
+
+        st.title("🔍 AI Incident Analyzer")
+
+        # Incidents on the current page of the Incidents section
+        incidents = st.session_state.get("incident_page_rows")
+        if incidents is None:
+            with borrow_connection() as conn:
+                incidents = Incident.list_incidents(conn).rows
+
+        if not incidents.empty:
+            # Let user select an incident
+            incident_options = [
+                f"{inc['id']}: {inc['incident_type']} - {inc['severity']}"for _, row in incidents.iterrows() for inc in [row.to_dict()]
+            ]
         
-        selected_idx = st.selectbox(
-            "Select incident to analyze:",
-            range(len(incidents)),
-            format_func=lambda i: incident_options[i]
-        )
+            selected_idx = st.selectbox(
+                "Select incident to analyze:",
+                range(len(incidents)),
+                format_func=lambda i: incident_options[i]
+            )
         
-        incident = incidents.iloc[selected_idx] #.iloc to get row by index
+            incident = incidents.iloc[selected_idx] #.iloc to get row by index
         
-        # Display incident details
-        st.subheader("📋 Incident Details")
-        st.write(f"**Type:** {incident['incident_type']}")
-        st.write(f"**Severity:** {incident['severity']}")
-        st.write(f"**Description:** {incident['description']}")
-        st.write(f"**Status:** {incident['status']}")
+            # Display incident details
+            st.subheader("📋 Incident Details")
+            st.write(f"**Type:** {incident['incident_type']}")
+            st.write(f"**Severity:** {incident['severity']}")
+            st.write(f"**Description:** {incident['description']}")
+            st.write(f"**Status:** {incident['status']}")
     
-    # Analyze with AI
-    if st.button("🤖 Analyze with AI", type="primary"):
-        with st.spinner("AI analyzing incident..."):
-            
-            # Create analysis prompt
-            analysis_prompt = f"""Analyze this cybersecurity incident:
-
-                                Type: {incident['incident_type']}
-                                Severity: {incident['severity']}
-                                Description: {incident['description']}
-                                Status: {incident['status']}
-
-                                Provide:
-                                1. Root cause analysis
-                                2. Immediate actions needed
-                                3. Long-term prevention measures
-                                4. Risk assessment"""
-            # Call ChatGPT API
-            response = client.chat.completions.create(
-                model="gpt-4.1-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a cybersecurity expert."
-                    },
-                    {
-                        "role": "user",
-                        "content": analysis_prompt
-                    }
-                ]
-            )
-            
+        # Analyze with AI. A stored analysis is shown straight away while the
+        # incident is unchanged; only a new or edited incident calls the model.
+        if incidents.empty:
+            return
+        result = cached_analysis(incident)
+        if client is None:
+            if result is None:
+                st.info("Enter your OpenAI API key to analyze incidents.")
+        elif st.button("🔄 Re-analyze" if result else "🤖 Analyze with AI", type="primary"):
+            with st.spinner("AI analyzing incident..."):
+                result = analyze_incident(client, incident, refresh=result is not None)
+
+        if result is not None:
             # Display AI analysis
             st.subheader("🧠 AI Analysis")
-            st.write(response.choices[0].message.content)
-            
+            if result.from_cache:
+                analysed = datetime.datetime.fromtimestamp(result.created_at)
+                st.caption(f"⚡ Stored analysis from {analysed:%Y-%m-%d %H:%M}, loaded in {result.seconds * 1000:.0f} ms")
+            else:
+                st.caption(f"🤖 Analysed in {result.seconds:.1f}s and stored for next time")
+            st.write(result.text)
+
+
+
+@st.fragment
+def incident_triage():
+    with timed_section(PAGE, "AI Batch Triage"):
+        st.title("🚨 AI Batch Triage")
+        st.caption("Triage every incident matching the filters at once; results are stored with the incidents.")
+        api_key = st.text_input("Your OpenAI API key", type="password", key="triage_api_key")
+
+        filter_col1, filter_col2, filter_col3 = st.columns(3)
+        with filter_col1:
+            status_filter = st.selectbox("Status", ["all", "open", "in progress", "investigating", "resolved", "closed"],
+                                         index=1, key="triage_status")
+        with filter_col2:
+            severity_filter = st.selectbox("Severity", ["all", "low", "medium", "high", "critical"],
+                                           index=4, key="triage_severity")
+        with filter_col3:
+            type_filter = st.selectbox("Type", ["all", "data_breach", "phishing", "ddos", "malware", "unauthorized_access", "ransomware"],
+                                       key="triage_type")
+        filters = {
+            "status": None if status_filter == "all" else status_filter,
+            "severity": None if severity_filter == "all" else severity_filter,
+            "incident_type": None if type_filter == "all" else type_filter,
+        }
+
+        option_col1, option_col2 = st.columns(2)
+        with option_col1:
+            concurrency = st.slider("Requests in flight", 1, 32, TRIAGE_CONCURRENCY, key="triage_concurrency")
+        with option_col2:
+            retriage = st.checkbox("Re-triage incidents that haven't changed", key="triage_all")
+
+        with borrow_connection() as conn:
+            matching = Incident.count_incidents(conn, **filters)
+        st.caption(f"{matching} incidents match")
+
+        if not api_key:
+            st.info("Enter your OpenAI API key to run a triage.")
+        elif st.button("🚨 Triage matching incidents", type="primary", disabled=not matching):
+            bar = st.progress(0.0, text="Starting…")
+            report = triage_backlog(
+                api_key, concurrency=concurrency, skip_unchanged=not retriage,
+                progress=lambda done, total: bar.progress(done / total, text=f"{done}/{total} incidents"),
+                **filters,
+            )
+            bar.empty()
+            st.success(f"Triaged {report.triaged} incidents in {report.seconds:.1f}s "
+                       f"({report.skipped} unchanged skipped, {report.requests} requests).")
+            if report.errors:
+                st.warning(f"{len(report.errors)} incidents failed after retries.")
+                st.dataframe([{"incident": i, "error": e} for i, e in report.errors], use_container_width=True)
+
+        # Stored results, most urgent first
+        st.subheader("📋 Triage results")
+        priority = st.selectbox("Priority", ["all", *PRIORITIES], key="triage_priority")
+        with borrow_connection() as conn:
+            results = Incident.get_triage_results(conn, None if priority == "all" else priority)
+        st.dataframe(results, use_container_width=True)
+
+
+if section == "Incidents":
+    incident_search()
+    incident_listing()
+elif section == "Analytics":
+    incident_analytics()
+elif section == "AI Incident Analyzer":
+    incident_ai()
+else:
+    incident_triage()
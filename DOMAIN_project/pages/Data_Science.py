@@ -1,7 +1,10 @@
 import streamlit as st
-from app.data.dataset import Dataset
-from app.data.db import connect_database
-from openai import OpenAI
+from app.services.auth_manager import AuthManager
+from app.data.dataset import Dataset, DATASET_SORT_COLUMNS
+from app.services.page_support import (section_selector, timed_section, section_timings,
+                                       bulk_selection, finish_bulk_action, precomputed_bundle, scheduler_status,
+                                       chat_assistant)
+from app.data.db import borrow_connection
 import plotly.express as px
 import datetime
 
@@ -17,8 +20,11 @@ if "logged_in" not in st.session_state:
 if "username" not in st.session_state:
     st.session_state.username = ""
 
-# Guard: if not logged in, send user back
-if not st.session_state.logged_in:
+# Guard: if the session token is missing, expired or revoked, send user back
+# (an HMAC check and a dict lookup; no database access)
+session = AuthManager.current_session(st.session_state.get("session_token"))
+st.session_state.logged_in = session is not None
+if not session:
      st.error("You must be logged in to view the dashboard.")
      if st.button("Go to login page"):
         st.switch_page("Home.py") # back to the first page
@@ -26,17 +32,99 @@ if not st.session_state.logged_in:
 
 # If logged in, show dashboard content
 st.title("📈 Data Science Dashboard")
-st.success(f"Hello, **{st.session_state.username}**!")
-
-dataset_tab, analytics_tab, AI_tab = st.tabs(["Datasets", "Analytics", "AI Assistant"])
-
-with dataset_tab:
-    conn = connect_database('DATA/intelligence_platform.db')
-
-    # Display datasets in a table
-    datasets = Dataset.get_all_datasets(conn)
+st.success(f"Hello, **{session.username}**!")
+
+PAGE = "data_science"
+
+# Only the selected section runs (st.tabs would run all three on every rerun).
+# Datasets and Analytics are fragments: their widgets rerun just that section.
+section = section_selector(["Datasets", "Analytics", "AI Assistant"], key="ds_section")
+
+
+@st.fragment
+def dataset_listing():
+    with timed_section(PAGE, "Datasets"), borrow_connection() as conn:
+        dataset_table(conn)
+
+
+def dataset_table(conn):
+    # Filters and sorting run in SQL; only one page of datasets is loaded
+    filter_col1, filter_col2, filter_col3 = st.columns(3)
+    with filter_col1:
+        category_filter = st.selectbox("Category filter", ["all", "security", "operations", "marketing", "finance", "hr", "sales"])
+    with filter_col2:
+        source_filter = st.selectbox("Source filter", ["all", "internal", "external", "public", "partner"])
+    with filter_col3:
+        date_range = st.date_input("Last updated between", value=(), max_value=datetime.date.today())
+
+    sort_col1, sort_col2, sort_col3 = st.columns(3)
+    with sort_col1:
+        sort_by = st.selectbox("Sort by", DATASET_SORT_COLUMNS)
+    with sort_col2:
+        descending = st.toggle("Descending", value=True)
+    with sort_col3:
+        page_size = st.selectbox("Rows per page", [25, 50, 100], index=1)
+
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+    view = (category_filter, source_filter, start_date, end_date, sort_by, descending, page_size)
+
+    # Go back to the first page whenever the filters change
+    if st.session_state.get("dataset_view") != view:
+        st.session_state.dataset_view = view
+        st.session_state.dataset_cursors = [None]
+    cursors = st.session_state.dataset_cursors
+
+    filters = {
+        "category": None if category_filter == "all" else category_filter,
+        "source": None if source_filter == "all" else source_filter,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    page = Dataset.list_datasets(
+        conn,
+        page_size=page_size,
+        cursor=cursors[-1],
+        sort_by=sort_by,
+        descending=descending,
+        **filters,
+    )
+    datasets = page.rows
     st.dataframe(datasets, use_container_width=True)
 
+    # Page controls
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("◀ Previous", disabled=len(cursors) == 1, key="datasets_prev"):
+            cursors.pop()
+            st.rerun(scope="fragment")
+    with page_col:
+        st.caption(f"Page {len(cursors)}")
+    with next_col:
+        if st.button("Next ▶", disabled=not page.has_more, key="datasets_next"):
+            cursors.append(page.next_cursor)
+            st.rerun(scope="fragment")
+
+    # Bulk actions: change or delete many datasets in one transaction
+    with st.expander("Bulk actions"):
+        target, count = bulk_selection(
+            "dataset", "datasets", datasets["id"].tolist(), filters,
+            lambda **f: Dataset.count_datasets(conn, **f), "dataset_ids",
+        )
+        st.caption(f"{count} datasets selected")
+        bulk_col1, bulk_col2 = st.columns(2)
+        with bulk_col1:
+            bulk_date = st.date_input("New last updated date", value=datetime.date.today(),
+                                      max_value=datetime.date.today(), key="dataset_bulk_date")
+            if st.button("Set date", disabled=not count, key="dataset_bulk_update"):
+                changed = Dataset.bulk_update_last_updated(conn, bulk_date, **target)
+                finish_bulk_action("dataset", f"Last updated set to {bulk_date} on {changed} datasets "
+                                              f"({count - changed} already had it).")
+        with bulk_col2:
+            confirm = st.checkbox(f"Yes, delete {count} datasets", key="dataset_bulk_confirm")
+            if st.button("Delete selected", type="primary", disabled=not (count and confirm), key="dataset_bulk_delete"):
+                deleted = Dataset.bulk_delete_datasets(conn, **target)
+                finish_bulk_action("dataset", f"Deleted {deleted} datasets.")
+
     #Add new dataset with a form
     with st.form("new_dataset"):
         # Form inputs (Streamlit widgets)
@@ -58,26 +146,26 @@ with dataset_tab:
         if dataset_name and category and source and last_updated and record_count >= 0 and file_size_mb >= 0:
             # Format dataset name
             formatted_name = dataset_name.lower()  # Convert to lowercase
-            
+
             # Remove any existing "dataset_" prefix to avoid duplication
             if formatted_name.startswith("dataset_"):
                 formatted_name = formatted_name.removeprefix("dataset_")
-            
+
             # Add the correct prefix
             formatted_name = f"dataset_{formatted_name}"
-            
+
             new_dataset = Dataset(
                 dataset_name=formatted_name,  # Use the formatted name
                 category=category,
                 source=source,
-                last_updated=last_updated.strftime("%m/%d/%Y"),
+                last_updated=last_updated,
                 record_count=record_count,
                 file_size_mb=file_size_mb
             )
 
             new_id = new_dataset.insert_dataset()
             st.success(f"Successfully added dataset with ID {new_id}")
-            st.rerun()  # Refresh the page to show the new dataset
+            st.rerun(scope="fragment")  # Refresh this section to show the new dataset
         else:
             st.error("You must fill in all the fields")
 
@@ -97,9 +185,9 @@ with dataset_tab:
             Dataset.update_last_updated_date(
                 conn,
                 int(selected_id),
-                last_updated_date.strftime("%m/%d/%Y")
+                last_updated_date
             )
-            st.rerun()
+            st.rerun(scope="fragment")
         else:
             st.error("You must fill in all fields.")
 
@@ -115,135 +203,73 @@ with dataset_tab:
         if st.button("Delete", type="primary"):
             Dataset.delete_dataset(conn, selected_id)  # your DB function
             st.success("Dataset deleted.")
-            st.rerun()
-
-with analytics_tab:    
-    conn = connect_database()
-    
-    # Graph 1: Resource Consumption by Category 
-    st.subheader("Resource Consumption by Category")
-    st.write("Shows which departments consume the most storage resources.")
-    
-    df_resource = Dataset.get_resource_consumption_by_category(conn)
-    
-    # Create pie chart using Plotly
-    fig1 = px.pie(df_resource, 
-                  values='total_size_mb', 
-                  names='category',
-                  title='Storage Distribution by Category')
-    st.plotly_chart(fig1, use_container_width=True)
-    
-    # Show data table
-    st.dataframe(df_resource, use_container_width=True)
-
-    
-    # Graph 2: Data Source Dependency
-    st.subheader("Data Source Dependency")
-    st.write("Understanding data source dependency to manage external vendor risks.")
-    
-    df_source = Dataset.get_datasets_by_source_count(conn)
-    
-    # Create bar chart for dataset count by source
-    st.bar_chart(df_source.set_index('source')['count'])
-    st.caption("Number of Datasets by Source")
-    
-    # Show the data table below the chart
-    st.dataframe(df_source, use_container_width=True)
-    
-    conn.close()
-
-
-with AI_tab:
-    #	Initialize	OpenAI	client
-    api_key = st.text_input("Your OpenAI API key", type="password")
-    # Get user input
-    prompt = st.chat_input("Enter your message here...")
-
-    if api_key:
-        # Create OpenAI client from the key STRING
-        client = OpenAI(api_key=api_key)
-
-        # Page title
-        st.title("🤖 Datascience AI Assistant")
-        st.caption("Powered by GPT-4.1-mini")
-
-        # Initialize session state for messages
-        DATASET_KEY = "dataset_key"
-
-        #	Initialize	session	state	for	messages
-        if DATASET_KEY not in st.session_state:
-            st.session_state[DATASET_KEY]= [
-                {
-                    "role": "system",
-                    "content": """You are a data science expert. 
-                    Help with data analysis, visualization, statistical methods, and machine learning. 
-                    Explain concepts clearly and suggest appropriate techniques.
-                    Tone: Professional, technical
-                    Format: Clear, structured responses"""
-                }
-            ]
-        messages = st.session_state[DATASET_KEY]
-
-        # Sidebar with controls
-        with st.sidebar:
-            st.subheader("Chat controls")
-
-            #	Display	message	count
-            message_count = len([m for m in messages if m["role"] != "system"])
-            st.metric("Messages", message_count)
-
-            # Clear chat button
-            if st.button("🗑 Clear	Chat", use_container_width=True):
-                st.session_state[DATASET_KEY] = []
-                st.rerun()
-
-
-        # Display all previous messages
-        for message in messages:
-            if message["role"] != "system":  # Don't display system prompt
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
-
-        if prompt:
-            #	Display	user	message
-            with st.chat_message("user"):
-                st.markdown(prompt)
-
-            # Add user message to session state
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-
-            # Call OpenAI API (with streaming)
-            with st.spinner("Thinking..."):
-                completion = client.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=messages,
-                    stream=True  # Enable streaming (response appears word by word)
-                    # Returns a generator instead of complete response
-                )
-
-            # Display streaming response
-            with st.chat_message("assistant"):
-                container = st.empty()  # Create empty container(placeholder) to update
-                full_reply = ""  # string to accumulate the full response
-
-                # Process each chunk as it arrives
-                for chunk in completion:  # Loop through each chunk of response
-                    delta = chunk.choices[0].delta  # Get the new content
-                    if delta.content:  # Check if chunk has content
-                        full_reply += delta.content  # Add to full response (connects the new text in each chunk)
-                        container.markdown(full_reply + "▌")  # Update display with current text
-
-                    # Remove cursor and show final response
-                    container.markdown(full_reply)
-
-            # save complete response to session state
-            messages.append({
-                "role": "assistant",
-                "content": full_reply
-            })
-
-    else:
-        st.info("Enter your OpenAI API key to start chatting.")
\ No newline at end of file
+            st.rerun(scope="fragment")
+
+
+@st.fragment
+def dataset_analytics():
+    with timed_section(PAGE, "Analytics"):
+        # Precomputed in the background (one snapshot of the database); no queries run here
+        bundle = precomputed_bundle("data_science_analytics")
+
+        # Graph 1: Resource Consumption by Category 
+        st.subheader("Resource Consumption by Category")
+        st.write("Shows which departments consume the most storage resources.")
+
+        df_resource = bundle.resource_by_category
+
+        # Create pie chart using Plotly
+        fig1 = px.pie(df_resource, 
+                      values='total_size_mb', 
+                      names='category',
+                      title='Storage Distribution by Category')
+        st.plotly_chart(fig1, use_container_width=True)
+
+        # Show data table
+        st.dataframe(df_resource, use_container_width=True)
+
+
+        # Graph 2: Data Source Dependency
+        st.subheader("Data Source Dependency")
+        st.write("Understanding data source dependency to manage external vendor risks.")
+
+        df_source = bundle.by_source
+
+        # Create bar chart for dataset count by source
+        st.bar_chart(df_source.set_index('source')['count'])
+        st.caption("Number of Datasets by Source")
+
+        # Show the data table below the chart
+        st.dataframe(df_source, use_container_width=True)
+
+        # Instrumentation: how long the last precompute's queries took
+        with st.expander("Query timings"):
+            st.dataframe(bundle.timing_frame(), use_container_width=True)
+
+        with st.expander("Background refresh jobs"):
+            st.dataframe(scheduler_status(), use_container_width=True)
+
+        with st.expander("Section timings this session"):
+            st.dataframe(section_timings(PAGE), use_container_width=True)
+
+
+ASSISTANT_PROMPT = """You are a data science expert.
+Help with data analysis, visualization, statistical methods, and machine learning.
+Explain concepts clearly and suggest appropriate techniques.
+Tone: Professional, technical
+Format: Clear, structured responses"""
+
+
+# Not a fragment: the chat writes to the sidebar and uses st.chat_input,
+# which fragments can't do. The conversation is kept in the database and
+# sent within a token budget (app/services/conversation_memory.py).
+def dataset_assistant():
+    chat_assistant("data_science", "🤖 Datascience AI Assistant", ASSISTANT_PROMPT, session.username)
+
+
+if section == "Datasets":
+    dataset_listing()
+elif section == "Analytics":
+    dataset_analytics()
+else:
+    dataset_assistant()
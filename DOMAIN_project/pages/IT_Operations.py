@@ -1,7 +1,10 @@
 import streamlit as st
-from app.data.db import connect_database
-from openai import OpenAI
-from app.data.it_operations import Tickets
+from app.services.auth_manager import AuthManager
+from app.services.page_support import (section_selector, timed_section, section_timings,
+                                       bulk_selection, finish_bulk_action, precomputed_bundle, scheduler_status,
+                                       chat_assistant)
+from app.data.db import borrow_connection
+from app.data.it_operations import Tickets, TICKET_SORT_COLUMNS
 import datetime
 
 st.set_page_config(
@@ -15,8 +18,11 @@ if "logged_in" not in st.session_state:
 if "username" not in st.session_state:
     st.session_state.username = ""
 
-# Guard: if not logged in, send user back
-if not st.session_state.logged_in:
+# Guard: if the session token is missing, expired or revoked, send user back
+# (an HMAC check and a dict lookup; no database access)
+session = AuthManager.current_session(st.session_state.get("session_token"))
+st.session_state.logged_in = session is not None
+if not session:
      st.error("You must be logged in to view the dashboard.")
      if st.button("Go to login page"):
         st.switch_page("Home.py") # back to the first page
@@ -24,17 +30,114 @@ if not st.session_state.logged_in:
 
 # If logged in, show dashboard content
 st.title("🖥️ IT Operations Dashboard")
-st.success(f"Hello, **{st.session_state.username}**!")
-
-tickets_tab, analytics_tab, AI_tab = st.tabs(["Tickets", "Analytics", "AI Assistant"])
-
-with tickets_tab:
-    conn = connect_database('DATA/intelligence_platform.db')
-
-    # Display tickets in a table
-    tickets = Tickets.get_all_tickets(conn)
+st.success(f"Hello, **{session.username}**!")
+
+PAGE = "it_operations"
+
+# Only the selected section runs (st.tabs would run all three on every rerun).
+# Tickets and Analytics are fragments: their widgets rerun just that section.
+section = section_selector(["Tickets", "Analytics", "AI Assistant"], key="it_section")
+
+
+@st.fragment
+def ticket_search():
+    with timed_section(PAGE, "Search"), borrow_connection() as conn:
+        # Full-text search over ticket subjects and descriptions
+        search_text = st.text_input("🔍 Search tickets", placeholder="e.g. vpn password")
+        if search_text.strip():
+            hits = Tickets.search_tickets(conn, search_text, limit=20)
+            st.caption(f"{len(hits)} best matches")
+            st.dataframe(hits, use_container_width=True)
+
+
+@st.fragment
+def ticket_listing():
+    with timed_section(PAGE, "Tickets"), borrow_connection() as conn:
+        ticket_table(conn)
+
+
+def ticket_table(conn):
+    # Filters and sorting run in SQL; only one page of tickets is loaded
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    with filter_col1:
+        status_filter = st.selectbox("Status filter", ["all", "open", "in_progress", "resolved", "closed"])
+    with filter_col2:
+        category_filter = st.selectbox("Category filter", ["all", "hardware", "software", "network", "other", "access"])
+    with filter_col3:
+        assignee_filter = st.text_input("Assigned to filter")
+    with filter_col4:
+        date_range = st.date_input("Created between", value=(), max_value=datetime.date.today())
+
+    sort_col1, sort_col2, sort_col3 = st.columns(3)
+    with sort_col1:
+        sort_by = st.selectbox("Sort by", TICKET_SORT_COLUMNS, index=TICKET_SORT_COLUMNS.index("ticket_id"))
+    with sort_col2:
+        descending = st.toggle("Descending", value=True)
+    with sort_col3:
+        page_size = st.selectbox("Rows per page", [25, 50, 100], index=1)
+
+    start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+    assignee_filter = assignee_filter.strip() or None
+    view = (status_filter, category_filter, assignee_filter, start_date, end_date, sort_by, descending, page_size)
+
+    # Go back to the first page whenever the filters change
+    if st.session_state.get("ticket_view") != view:
+        st.session_state.ticket_view = view
+        st.session_state.ticket_cursors = [None]
+    cursors = st.session_state.ticket_cursors
+
+    filters = {
+        "status": None if status_filter == "all" else status_filter,
+        "category": None if category_filter == "all" else category_filter,
+        "assigned_to": assignee_filter,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    page = Tickets.list_tickets(
+        conn,
+        page_size=page_size,
+        cursor=cursors[-1],
+        sort_by=sort_by,
+        descending=descending,
+        **filters,
+    )
+    tickets = page.rows
     st.dataframe(tickets, use_container_width=True)
 
+    # Page controls
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    with prev_col:
+        if st.button("◀ Previous", disabled=len(cursors) == 1, key="tickets_prev"):
+            cursors.pop()
+            st.rerun(scope="fragment")
+    with page_col:
+        st.caption(f"Page {len(cursors)}")
+    with next_col:
+        if st.button("Next ▶", disabled=not page.has_more, key="tickets_next"):
+            cursors.append(page.next_cursor)
+            st.rerun(scope="fragment")
+
+    # Bulk actions: change or delete many tickets in one transaction
+    with st.expander("Bulk actions"):
+        target, count = bulk_selection(
+            "ticket", "tickets", tickets["ticket_id"].tolist(), filters,
+            lambda **f: Tickets.count_tickets(conn, **f), "ticket_ids",
+        )
+        st.caption(f"{count} tickets selected")
+        bulk_col1, bulk_col2 = st.columns(2)
+        with bulk_col1:
+            bulk_status = st.selectbox("New status", ["open", "in_progress", "resolved", "closed"],
+                                       key="ticket_bulk_status")
+            if st.button("Set status", disabled=not count, key="ticket_bulk_update"):
+                changed = Tickets.bulk_update_status(conn, bulk_status, **target)
+                finish_bulk_action("ticket", f"Status set to '{bulk_status}' on {changed} tickets "
+                                             f"({count - changed} already had it).")
+        with bulk_col2:
+            confirm = st.checkbox(f"Yes, delete {count} tickets", key="ticket_bulk_confirm")
+            if st.button("Delete selected", type="primary", disabled=not (count and confirm), key="ticket_bulk_delete"):
+                deleted = Tickets.bulk_delete_tickets(conn, **target)
+                finish_bulk_action("ticket", f"Deleted {deleted} tickets.")
+
     # Add new ticket form
     with st.form("new_ticket"):
         ticket_id = st.text_input("Ticket ID")
@@ -66,23 +169,26 @@ with tickets_tab:
             # Remove any existing "TCK-" prefix to avoid duplication
             if ticket_id_upper.startswith("TCK-"):
                 ticket_id_upper = ticket_id_upper.removeprefix("TCK-")
-            
+
             # Add the correct prefix
             formatted_ticket_id = f"TCK-{ticket_id_upper}"
-            
-            # Insert with formatted ticket ID
-            Tickets(
+
+            # Insert with formatted ticket ID (fails if the ID is already taken)
+            inserted = Tickets(
                 ticket_id=formatted_ticket_id,  
                 status=status,
                 category=category,
                 subject=subject,
                 description=description,
-                created_date=created_date.strftime("%m/%d/%Y"),
-                resolved_date=resolved_date.strftime("%m/%d/%Y"),
+                created_date=created_date,
+                resolved_date=resolved_date,
                 assigned_to=assigned_to,
             ).insert_ticket()
-            st.success(f"Ticket {formatted_ticket_id} added successfully!")
-            st.rerun()
+            if inserted:
+                st.success(f"Ticket {formatted_ticket_id} added successfully!")
+                st.rerun(scope="fragment")
+            else:
+                st.error(f"Ticket {formatted_ticket_id} already exists.")
         else:
             st.error("You must fill in Ticket ID and Subject.")
 
@@ -99,7 +205,7 @@ with tickets_tab:
     if update_button:
         if ticket_id and new_status:
             Tickets.update_ticket_status(conn, ticket_id, new_status)
-            st.rerun()
+            st.rerun(scope="fragment")
         else:
             st.error("You must fill in all the fields.")
 
@@ -115,124 +221,93 @@ with tickets_tab:
         if st.button("Delete", type="primary"):
             Tickets.delete_ticket(conn, selected_id)  # Delete ticket
             st.success("Incident deleted.")
-            st.rerun()
-
-with analytics_tab:
-    conn = connect_database()
-    # Performance chart
-    total, open_tickets, unresolved = Tickets.get_ticket_kpis(conn)
-    
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Total Tickets", total)
-    with col2:
-        st.metric("Open Tickets", open_tickets, delta=f"{open_tickets} pending")
-    with col3:
-        st.metric("Unresolved Tickets", unresolved)
-
-    st.divider()
-    st.subheader("Staff Resolution Performance")
-    st.markdown("##### Identify top performers and areas for improvement.")
-    staff_performance = Tickets.get_tickets_resolved_by_staff(conn)
-    st.dataframe(staff_performance, use_container_width=True)
-    st.bar_chart(
-        staff_performance,
-        x="assigned_to",
-        y="resolved_tickets",
-        height=400
-    )
+            st.rerun(scope="fragment")
+
+
+@st.fragment
+def ticket_analytics():
+    with timed_section(PAGE, "Analytics"):
+        breakdown = st.radio("Break down resolution times by", ["assigned_to", "category"], horizontal=True,
+                             format_func=lambda c: "Staff member" if c == "assigned_to" else "Category")
+        # Precomputed in the background (one snapshot of the database); no queries run here
+        bundle = precomputed_bundle(f"it_operations_analytics:{breakdown}")
+
+        # Performance chart
+        total, open_tickets, unresolved = bundle.kpis
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Tickets", total)
+        with col2:
+            st.metric("Open Tickets", open_tickets, delta=f"{open_tickets} pending")
+        with col3:
+            st.metric("Unresolved Tickets", unresolved)
+
+        st.divider()
+        st.subheader("Staff Resolution Performance")
+        st.markdown("##### Identify top performers and areas for improvement.")
+        staff_performance = bundle.staff_performance
+        st.dataframe(staff_performance, use_container_width=True)
+        st.bar_chart(
+            staff_performance,
+            x="assigned_to",
+            y="resolved_tickets",
+            height=400
+        )
 
-with AI_tab:
-    #	Initialize	OpenAI	client
-    api_key = st.text_input("Your OpenAI API key", type="password")
-    # Get user input
-    prompt = st.chat_input("Enter your message here...")
-
-    if api_key:
-        # Create OpenAI client from the key STRING
-        client = OpenAI(api_key=api_key)
-
-        # Page title
-        st.title("🤖 IT Operations Assistant")
-        st.caption("Powered by GPT-4.1-mini")
-
-        # Initialize session state for messages
-        TICKET_KEY = "tickets_key"
-
-        #	Initialize	session	state	for	messages
-        if TICKET_KEY not in st.session_state:
-            st.session_state[TICKET_KEY]= [
-                {
-                    "role": "system",
-                    "content": """You are an IT operations expert. 
-                    Help with IT ticket management, ticket resolution stratergies, and best practices. 
-                    Explain concepts clearly and suggest appropriate techniques.
-                    Tone: Professional, technical
-                    Format: Clear, structured responses"""
-                }
-            ]
-        messages = st.session_state[TICKET_KEY]
-
-        # Sidebar with controls
-        with st.sidebar:
-            st.subheader("Chat controls")
-
-            #	Display	message	count
-            message_count = len([m for m in messages if m["role"] != "system"])
-            st.metric("Messages", message_count)
-
-            # Clear chat button
-            if st.button("🗑 Clear	Chat", use_container_width=True):
-                st.session_state[TICKET_KEY] = []
-                st.rerun()
-
-
-        # Display all previous messages
-        for message in messages:
-            if message["role"] != "system":  # Don't display system prompt
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
-
-        if prompt:
-            #	Display	user	message
-            with st.chat_message("user"):
-                st.markdown(prompt)
-
-            # Add user message to session state
-            messages.append({
-                "role": "user",
-                "content": prompt
-            })
-
-            # Call OpenAI API (with streaming)
-            with st.spinner("Thinking..."):
-                completion = client.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=messages,
-                    stream=True  # Enable streaming (response appears word by word)
-                    # Returns a generator instead of complete response
-                )
-
-            # Display streaming response
-            with st.chat_message("assistant"):
-                container = st.empty()  # Create empty container(placeholder) to update
-                full_reply = ""  # string to accumulate the full response
-
-                # Process each chunk as it arrives
-                for chunk in completion:  # Loop through each chunk of response
-                    delta = chunk.choices[0].delta  # Get the new content
-                    if delta.content:  # Check if chunk has content
-                        full_reply += delta.content  # Add to full response (connects the new text in each chunk)
-                        container.markdown(full_reply + "▌")  # Update display with current text
-
-                    # Remove cursor and show final response
-                    container.markdown(full_reply)
-
-            # save complete response to session state
-            messages.append({
-                "role": "assistant",
-                "content": full_reply
-            })
-
-    else:
-        st.info("Enter your OpenAI API key to start chatting.")
\ No newline at end of file
+        # Resolution-time distributions (aggregated in SQL, no full rows loaded)
+        st.divider()
+        st.subheader("Resolution Times")
+        resolution = bundle.resolution
+        overall = bundle.overall_resolution
+        if len(overall):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Median (p50)", f"{overall['p50_days'].iloc[0]} days")
+            with col2:
+                st.metric("p90", f"{overall['p90_days'].iloc[0]} days")
+            with col3:
+                st.metric("p99", f"{overall['p99_days'].iloc[0]} days")
+        st.dataframe(resolution, use_container_width=True)
+        st.bar_chart(resolution, x=breakdown, y="p90_days", height=350)
+
+        st.subheader("Backlog Age")
+        st.markdown("##### How long unresolved tickets have been waiting.")
+        st.dataframe(bundle.backlog, use_container_width=True)
+
+        st.subheader("Weekly Throughput")
+        throughput = bundle.throughput
+        st.line_chart(throughput, x="week", y=["created", "resolved"])
+
+        # Instrumentation: how long the last precompute's queries took
+        with st.expander("Query timings"):
+            st.dataframe(bundle.timing_frame(), use_container_width=True)
+
+        with st.expander("Background refresh jobs"):
+            st.dataframe(scheduler_status(), use_container_width=True)
+
+        with st.expander("Section timings this session"):
+            st.dataframe(section_timings(PAGE), use_container_width=True)
+
+
+ASSISTANT_PROMPT = """You are an IT operations expert.
+Help with IT ticket management, ticket resolution stratergies, and best practices.
+Explain concepts clearly and suggest appropriate techniques.
+Tone: Professional, technical
+Format: Clear, structured responses"""
+
+
+# Not a fragment: the chat writes to the sidebar and uses st.chat_input,
+# which fragments can't do. The conversation is kept in the database and
+# sent within a token budget (app/services/conversation_memory.py).
+def ticket_assistant():
+    chat_assistant("it_operations", "🤖 IT Operations Assistant", ASSISTANT_PROMPT, session.username)
+
+
+if section == "Tickets":
+    ticket_search()
+    ticket_listing()
+elif section == "Analytics":
+    ticket_analytics()
+else:
+    ticket_assistant()
@@ -0,0 +1,125 @@
+"""Shared fixtures: a fresh database and a local OpenAI-compatible endpoint.
+
+Run from DOMAIN_project/:
+    python -m pytest -q tests
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# project root to python path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.data import db
+
+
+def completion(content, model="test-model", prompt_tokens=100, completion_tokens=50):
+    """Body of a chat completion answering with content."""
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class FakeOpenAI:
+    """Local stand-in for the chat completions endpoint.
+
+    `reply` is called with (request body, request number) and returns
+    (status, body, headers); body is a dict sent as JSON. By default every
+    request gets a 200 answer with `default_content`. The requests received
+    and the highest number handled at once are recorded."""
+
+    def __init__(self):
+        self.reply = lambda request, number: (200, completion(self.default_content), {})
+        self.default_content = "Analysis"
+        self.latency = 0.0
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(request)
+                    number = len(fake.requests)
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    time.sleep(fake.latency)
+                    status, body, headers = fake.reply(request, number)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def fake_openai():
+    fake = FakeOpenAI().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of an empty, fully migrated database."""
+    path = tmp_path / "test.db"
+    db.get_pool(path)
+    yield path
+    pool = db._pools.pop(str(path.resolve()), None)
+    if pool is not None:
+        pool.close_all()
+
+
+def add_incident(db_path, incident_type="Phishing", severity="critical", status="open",
+                 description="Suspicious login", date="2024-05-01"):
+    """Insert an incident and return it as a dict with every column."""
+    with db.borrow_connection(db_path) as conn:
+        cursor = conn.execute(
+            "INSERT INTO cyber_incidents (date, incident_type, severity, status, description) VALUES (?, ?, ?, ?, ?)",
+            (date, incident_type, severity, status, description)
+        )
+        conn.commit()
+        return get_incident(conn, cursor.lastrowid)
+
+
+def get_incident(conn, incident_id):
+    cursor = conn.execute("SELECT * FROM cyber_incidents WHERE id = ?", (incident_id,))
+    names = [column[0] for column in cursor.description]
+    return dict(zip(names, cursor.fetchone()))
@@ -0,0 +1,180 @@
+"""Concurrent batch triage, against a local mock of the OpenAI endpoint."""
+import json
+import time
+
+from app.data import db
+from app.services.batch_triage import triage_backlog
+from conftest import add_incident, completion
+
+TRIAGE = {"priority": "high", "summary": "Contain the affected host.", "actions": ["Isolate the host"]}
+
+
+def answer(content=json.dumps(TRIAGE)):
+    return 200, completion(content), {}
+
+
+def described(request):
+    """The incident description in a triage request."""
+    prompt = request["messages"][1]["content"]
+    return prompt.split("Description: ", 1)[1].split("\n", 1)[0]
+
+
+def run(db_path, fake_openai, **kwargs):
+    kwargs.setdefault("concurrency", 4)
+    return triage_backlog("test", status=None, severity=None, base_url=fake_openai.base_url,
+                          db_path=db_path, **kwargs)
+
+
+def stored(db_path):
+    with db.borrow_connection(db_path) as conn:
+        return {row[0]: row[1:] for row in conn.execute(
+            "SELECT incident_id, priority, summary, actions, attempts FROM incident_triage")}
+
+
+def test_requests_in_flight_never_exceed_concurrency(db_path, fake_openai):
+    for n in range(20):
+        add_incident(db_path, description=f"Incident {n}")
+    fake_openai.latency = 0.05
+    fake_openai.reply = lambda request, number: answer()
+
+    report = run(db_path, fake_openai, concurrency=4)
+
+    assert report.triaged == 20 and not report.errors
+    assert report.requests == 20
+    assert 1 < fake_openai.max_in_flight <= 4
+
+
+def test_results_are_stored_next_to_the_incidents(db_path, fake_openai):
+    first = add_incident(db_path, description="First")
+    second = add_incident(db_path, description="Second")
+    fake_openai.reply = lambda request, number: answer()
+
+    report = run(db_path, fake_openai)
+
+    assert (report.selected, report.skipped, report.triaged) == (2, 0, 2)
+    expected = ("high", "Contain the affected host.", json.dumps(["Isolate the host"]), 1)
+    assert stored(db_path) == {first["id"]: expected, second["id"]: expected}
+
+
+def test_filters_select_the_incidents(db_path, fake_openai):
+    critical = add_incident(db_path, severity="critical", status="open")
+    add_incident(db_path, severity="low", status="open")
+    add_incident(db_path, severity="critical", status="closed")
+    fake_openai.reply = lambda request, number: answer()
+
+    report = triage_backlog("test", status="open", severity="critical", base_url=fake_openai.base_url,
+                            db_path=db_path)
+
+    assert report.selected == 1
+    assert list(stored(db_path)) == [critical["id"]]
+
+
+def test_rate_limit_waits_for_retry_after_then_retries(db_path, fake_openai):
+    incident = add_incident(db_path)
+    sent = []
+
+    def reply(request, number):
+        sent.append(time.monotonic())
+        if number == 1:
+            return 429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}}, {"Retry-After": "0.5"}
+        return answer()
+
+    fake_openai.reply = reply
+
+    report = run(db_path, fake_openai)
+
+    assert report.triaged == 1 and not report.errors
+    assert report.requests == 2
+    assert sent[1] - sent[0] >= 0.5
+    assert stored(db_path)[incident["id"]][-1] == 2  # attempts
+
+
+def test_rate_limit_holds_back_every_worker(db_path, fake_openai):
+    for n in range(4):
+        add_incident(db_path, description=f"Incident {n}")
+    sent = []
+
+    def reply(request, number):
+        sent.append(time.monotonic())
+        if number == 1:
+            return 429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "0.5"}
+        return answer()
+
+    fake_openai.latency = 0.05
+    fake_openai.reply = reply
+
+    report = run(db_path, fake_openai, concurrency=1)
+
+    assert report.triaged == 4 and not report.errors
+    # nothing else went out during the cool-down
+    assert sent[1] - sent[0] >= 0.5
+
+
+def test_malformed_answers_are_asked_again(db_path, fake_openai):
+    incident = add_incident(db_path)
+    answers = iter(["not json", None, json.dumps({"priority": "urgent", "summary": "x"}), json.dumps(TRIAGE)])
+    fake_openai.reply = lambda request, number: answer(next(answers))
+
+    report = run(db_path, fake_openai)
+
+    assert report.triaged == 1 and not report.errors
+    assert report.requests == 4
+    assert stored(db_path)[incident["id"]] == ("high", "Contain the affected host.",
+                                               json.dumps(["Isolate the host"]), 4)
+
+
+def test_malformed_answers_fail_after_max_attempts(db_path, fake_openai):
+    incident = add_incident(db_path)
+    fake_openai.reply = lambda request, number: answer("not json")
+
+    report = run(db_path, fake_openai, max_attempts=3)
+
+    assert report.triaged == 0
+    assert report.requests == 3
+    assert [incident_id for incident_id, _ in report.errors] == [incident["id"]]
+    assert stored(db_path) == {}
+
+
+def test_non_retryable_errors_are_reported(db_path, fake_openai):
+    good = add_incident(db_path, description="Good")
+    bad = add_incident(db_path, description="Bad")
+
+    def reply(request, number):
+        if described(request) == "Bad":
+            return 400, {"error": {"message": "Invalid request", "type": "invalid_request_error"}}, {}
+        return answer()
+
+    fake_openai.reply = reply
+
+    report = run(db_path, fake_openai)
+
+    assert report.triaged == 1
+    assert report.requests == 2  # the bad request is not retried
+    assert len(report.errors) == 1
+    incident_id, message = report.errors[0]
+    assert incident_id == bad["id"]
+    assert message.startswith("BadRequestError")
+    assert list(stored(db_path)) == [good["id"]]
+
+
+def test_unchanged_incidents_are_skipped_on_the_next_run(db_path, fake_openai):
+    first = add_incident(db_path, description="First")
+    add_incident(db_path, description="Second")
+    fake_openai.reply = lambda request, number: answer()
+    run(db_path, fake_openai)
+
+    again = run(db_path, fake_openai)
+
+    assert (again.selected, again.skipped, again.triaged, again.requests) == (2, 2, 0, 0)
+    assert len(fake_openai.requests) == 2
+
+    with db.borrow_connection(db_path) as conn:
+        conn.execute("UPDATE cyber_incidents SET status = 'contained' WHERE id = ?", (first["id"],))
+        conn.commit()
+    changed = run(db_path, fake_openai)
+
+    assert (changed.skipped, changed.triaged, changed.requests) == (1, 1, 1)
+    assert described(fake_openai.requests[-1]) == "First"
+
+    everything = run(db_path, fake_openai, skip_unchanged=False)
+    assert (everything.skipped, everything.triaged) == (0, 2)
@@ -0,0 +1,166 @@
+"""AI incident analysis cache, against a local stand-in for the OpenAI endpoint."""
+import time
+
+import pytest
+from openai import OpenAI
+
+from app.data import db
+from app.data.ai_cache import evict_analyses, put_analysis, get_analysis, cache_stats
+from app.services.incident_analyzer import (analyze_incident, cached_analysis, forget_incident_analyses,
+                                            _cache_key, ANALYSIS_MODEL)
+from conftest import add_incident, get_incident
+
+
+@pytest.fixture
+def client(fake_openai):
+    with OpenAI(api_key="test", base_url=fake_openai.base_url, max_retries=0) as client:
+        yield client
+
+
+def stored(db_path):
+    with db.borrow_connection(db_path) as conn:
+        return conn.execute("SELECT subject, hits FROM ai_analyses ORDER BY subject").fetchall()
+
+
+def test_miss_calls_the_model_and_stores_the_answer(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    fake_openai.default_content = "Reset the user's password."
+
+    result = analyze_incident(client, incident, db_path=db_path)
+
+    assert not result.from_cache
+    assert result.text == "Reset the user's password."
+    assert len(fake_openai.requests) == 1
+    assert "Suspicious login" in fake_openai.requests[0]["messages"][1]["content"]
+    assert stored(db_path) == [(f"incident:{incident['id']}", 0)]
+
+
+def test_hit_returns_the_stored_answer_without_a_request(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    first = analyze_incident(client, incident, db_path=db_path)
+
+    second = analyze_incident(client, incident, db_path=db_path)
+
+    assert second.from_cache
+    assert second.text == first.text
+    assert len(fake_openai.requests) == 1
+    assert stored(db_path) == [(f"incident:{incident['id']}", 1)]
+    with db.borrow_connection(db_path) as conn:
+        assert cache_stats(conn) == {"entries": 1, "hits": 1, "tokens_saved": 150}
+
+
+def test_display_lookup_does_not_count_hits(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    assert cached_analysis(incident, db_path=db_path) is None
+    analyze_incident(client, incident, db_path=db_path)
+
+    for _ in range(3):
+        assert cached_analysis(incident, db_path=db_path).from_cache
+
+    assert stored(db_path) == [(f"incident:{incident['id']}", 0)]
+
+
+def test_changed_incident_is_analysed_again(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    analyze_incident(client, incident, db_path=db_path)
+    with db.borrow_connection(db_path) as conn:
+        conn.execute("UPDATE cyber_incidents SET status = 'closed' WHERE id = ?", (incident["id"],))
+        conn.commit()
+        changed = get_incident(conn, incident["id"])
+    fake_openai.default_content = "Closed: review the lessons learned."
+
+    assert cached_analysis(changed, db_path=db_path) is None
+    result = analyze_incident(client, changed, db_path=db_path)
+
+    assert not result.from_cache
+    assert result.text == "Closed: review the lessons learned."
+    assert len(fake_openai.requests) == 2
+    # the analysis of the unchanged incident is still there under its own key
+    assert analyze_incident(client, incident, db_path=db_path).from_cache
+
+
+def test_fields_outside_the_prompt_do_not_change_the_key(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    analyze_incident(client, incident, db_path=db_path)
+
+    assert analyze_incident(client, dict(incident, reported_by="someone else"), db_path=db_path).from_cache
+    assert len(fake_openai.requests) == 1
+
+
+def test_refresh_asks_the_model_again(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    analyze_incident(client, incident, db_path=db_path)
+    fake_openai.default_content = "Second opinion"
+
+    result = analyze_incident(client, incident, refresh=True, db_path=db_path)
+
+    assert not result.from_cache
+    assert cached_analysis(incident, db_path=db_path).text == "Second opinion"
+
+
+def test_least_recently_used_entries_are_evicted(db_path):
+    with db.borrow_connection(db_path) as conn:
+        for n in range(3):
+            put_analysis(conn, f"key{n}", f"incident:{n}", "m", f"analysis {n}", max_entries=10)
+            time.sleep(0.01)
+        get_analysis(conn, "key0", count_hit=True)  # key0 becomes the most recently used
+
+        put_analysis(conn, "key3", "incident:3", "m", "analysis 3", max_entries=3)
+
+        keys = {row[0] for row in conn.execute("SELECT cache_key FROM ai_analyses")}
+    assert keys == {"key0", "key2", "key3"}
+
+
+def test_expired_entries_are_not_served_and_are_evicted(db_path):
+    with db.borrow_connection(db_path) as conn:
+        put_analysis(conn, "old", "incident:1", "m", "old analysis")
+        put_analysis(conn, "new", "incident:2", "m", "new analysis")
+        conn.execute("UPDATE ai_analyses SET created_at = ? WHERE cache_key = 'old'", (time.time() - 40 * 86400,))
+        conn.commit()
+
+        assert get_analysis(conn, "old", ttl_days=30) is None
+        assert evict_analyses(conn, ttl_days=30) == 1
+        assert [row[0] for row in conn.execute("SELECT cache_key FROM ai_analyses")] == ["new"]
+
+
+def test_deleting_the_incident_deletes_its_analyses(db_path, fake_openai, client):
+    kept = add_incident(db_path, description="Malware on a laptop")
+    deleted = add_incident(db_path)
+    analyze_incident(client, kept, db_path=db_path)
+    analyze_incident(client, deleted, db_path=db_path)
+
+    with db.borrow_connection(db_path) as conn:
+        conn.execute("DELETE FROM cyber_incidents WHERE id = ?", (deleted["id"],))
+        conn.commit()
+
+    assert stored(db_path) == [(f"incident:{kept['id']}", 0)]
+    assert cached_analysis(deleted, db_path=db_path) is None
+
+
+def test_forget_drops_every_analysis_of_one_incident(db_path, fake_openai, client):
+    incident = add_incident(db_path)
+    analyze_incident(client, incident, db_path=db_path)
+    analyze_incident(client, incident, model="other-model", db_path=db_path)
+
+    assert forget_incident_analyses(incident["id"], db_path=db_path) == 2
+    assert stored(db_path) == []
+    assert _cache_key(incident, ANALYSIS_MODEL) != _cache_key(incident, "other-model")
+
+
+def test_identical_incidents_keep_their_own_analyses(db_path, fake_openai, client):
+    first = add_incident(db_path)
+    twin = add_incident(db_path)
+    analyze_incident(client, first, db_path=db_path)
+    analyze_incident(client, twin, db_path=db_path)
+
+    assert len(fake_openai.requests) == 2
+    assert stored(db_path) == [(f"incident:{first['id']}", 0), (f"incident:{twin['id']}", 0)]
+
+    with db.borrow_connection(db_path) as conn:
+        conn.execute("DELETE FROM cyber_incidents WHERE id = ?", (first["id"],))
+        conn.commit()
+    assert forget_incident_analyses(first["id"], db_path=db_path) == 0
+
+    assert cached_analysis(twin, db_path=db_path).from_cache
+    assert analyze_incident(client, twin, db_path=db_path).from_cache
+    assert len(fake_openai.requests) == 2
@@ -0,0 +1,69 @@
+"""Incremental CSV loads of a file that is still being appended to."""
+from app.data import db
+from app.data.ingest import incremental_csv_to_table, stream_csv_to_table
+
+HEADER = "ticket_id,status,category,subject,descripton,created_date,resolved_date,assigned_to\n"
+
+
+def write(path, text):
+    with open(path, "a", newline="") as file:
+        file.write(text)
+
+
+def tickets(db_path):
+    with db.borrow_connection(db_path) as conn:
+        return dict(conn.execute("SELECT ticket_id, category FROM it_tickets ORDER BY ticket_id").fetchall())
+
+
+def load(db_path, csv_path):
+    with db.borrow_connection(db_path) as conn:
+        return incremental_csv_to_table(conn, csv_path, "it_tickets", progress=None)
+
+
+def test_half_written_last_line_is_loaded_once_it_is_finished(db_path, tmp_path):
+    csv_path = tmp_path / "tickets.csv"
+    write(csv_path, HEADER + "TCK-0001,Open,Network,VPN down,,2024-05-01,,alice\n")
+    write(csv_path, "TCK-9999,Open,Netw")
+
+    first = load(db_path, csv_path)
+
+    assert (first.rows, first.skipped) == (1, 0)
+    assert first.end_offset == csv_path.stat().st_size - len("TCK-9999,Open,Netw")
+    assert tickets(db_path) == {"TCK-0001": "Network"}
+
+    write(csv_path, "ork,Printer jam,,2024-05-02,,bob\n")
+    second = load(db_path, csv_path)
+
+    assert second.mode == "append"
+    assert (second.rows, second.skipped) == (1, 0)
+    assert second.end_offset == csv_path.stat().st_size
+    assert tickets(db_path) == {"TCK-0001": "Network", "TCK-9999": "Network"}
+
+
+def test_open_quoted_field_at_the_end_waits_for_the_rest(db_path, tmp_path):
+    csv_path = tmp_path / "tickets.csv"
+    write(csv_path, HEADER + 'TCK-0001,Open,Network,"VPN down\nsince this morning\n')
+
+    first = load(db_path, csv_path)
+
+    assert (first.rows, first.skipped) == (0, 0)
+    assert tickets(db_path) == {}
+
+    write(csv_path, 'for everyone",,2024-05-01,,alice\n')
+    second = load(db_path, csv_path)
+
+    assert (second.rows, second.skipped) == (1, 0)
+    with db.borrow_connection(db_path) as conn:
+        subject = conn.execute("SELECT subject FROM it_tickets WHERE ticket_id = 'TCK-0001'").fetchone()[0]
+    assert subject == "VPN down\nsince this morning\nfor everyone"
+
+
+def test_full_load_still_reads_a_last_line_without_newline(db_path, tmp_path):
+    csv_path = tmp_path / "tickets.csv"
+    write(csv_path, HEADER + "TCK-0001,Open,Network,VPN down,,2024-05-01,,alice")
+
+    with db.borrow_connection(db_path) as conn:
+        result = stream_csv_to_table(conn, csv_path, "it_tickets", progress=None)
+
+    assert result.rows == 1
+    assert tickets(db_path) == {"TCK-0001": "Network"}
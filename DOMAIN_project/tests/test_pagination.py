@@ -0,0 +1,41 @@
+"""Keyset pagination returns every row of the unpaginated query, in its order."""
+import pandas as pd
+import pytest
+
+from app.data import db
+from app.data.frames import compact_frame
+from app.data.pagination import keyset_page
+from conftest import add_incident
+
+
+def all_pages(conn, **kwargs):
+    ids, cursor = [], None
+    for _ in range(100):  # a cursor that doesn't move would otherwise loop forever
+        page = keyset_page(conn, "cyber_incidents", "id, date, status", sortable=("id", "date"),
+                           cursor=cursor, page_size=3, **kwargs)
+        ids += [int(i) for i in page.rows["id"]]
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids
+    raise AssertionError(f"paging did not finish: {ids}")
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_unparseable_and_missing_dates_are_paged(db_path, descending):
+    for date in ["2024-01-03", "13/45/2024", None, "2024-01-01", "2024-01-02", None, "not a date", "2024-01-02"]:
+        add_incident(db_path, date=date)
+    direction = "DESC" if descending else "ASC"
+
+    with db.borrow_connection(db_path) as conn:
+        expected = [row[0] for row in conn.execute(
+            f"SELECT id FROM cyber_incidents ORDER BY date {direction}, id {direction}")]
+        assert all_pages(conn, sort_by="date", descending=descending) == expected
+
+
+def test_date_column_with_an_unparseable_value_stays_text():
+    df = compact_frame(pd.DataFrame({"date": ["2024-01-01", "13/45/2024", None]}))
+    assert df["date"].tolist()[:2] == ["2024-01-01", "13/45/2024"]
+    assert pd.isna(df["date"].iloc[2])
+
+    df = compact_frame(pd.DataFrame({"date": ["2024-01-01", None]}))
+    assert pd.api.types.is_datetime64_any_dtype(df["date"])